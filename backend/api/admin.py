@@ -0,0 +1,175 @@
+from flask import g
+from sqlalchemy import literal, text
+from sqlalchemy.orm import lazyload, load_only
+
+from api.models import db, Usuario, Empresa, Cliente, Instalacion, Mantenimiento, Pendiente, Presupuesto, Componente
+
+
+# Desde este tamaño (según las estadísticas de Postgres) el listado muestra un
+# total estimado en vez de hacer COUNT(*) sobre toda la tabla
+UMBRAL_CONTEO_ESTIMADO = 10000
+RESULTADOS_AJAX = 20
+
+
+def _filas_estimadas(session, tabla):
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    filas = session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:tabla)"),
+        {"tabla": tabla},
+    ).scalar()
+    return filas if filas is not None and filas >= UMBRAL_CONTEO_ESTIMADO else None
+
+
+def _etiqueta(obj):
+    if isinstance(obj, (Usuario, Cliente, Empresa)):
+        return f"{obj.nombre} (#{obj.id})"
+    if isinstance(obj, Instalacion):
+        return f"#{obj.id} {obj.tipo_sistema or ''} (cliente #{obj.cliente_id})"
+    if isinstance(obj, Presupuesto):
+        return f"#{obj.id} {obj.cliente_nombre or ''}"
+    return f"#{obj.id}"
+
+
+def init_admin(app):
+    """Panel de Flask-Admin. Solo en instancias con ADMIN_HABILITADO (el import pesa ~0,3 s)."""
+    if not app.config.get("ADMIN_HABILITADO"):
+        return None
+
+    from flask_admin import Admin
+    from flask_admin.contrib.sqla import ModelView
+    from flask_admin.contrib.sqla.ajax import QueryAjaxModelLoader
+
+    class BusquedaAjax(QueryAjaxModelLoader):
+        """<select> con búsqueda en el servidor: trae de a RESULTADOS_AJAX filas."""
+
+        def __init__(self, nombre, model, campos):
+            super().__init__(nombre, db.session, model, fields=campos, page_size=RESULTADOS_AJAX, order_by=model.id)
+
+        def format(self, model):
+            return None if model is None else (getattr(model, self.pk), _etiqueta(model))
+
+    class VistaAdmin(ModelView):
+        """
+        Listados paginados en el servidor con columnas explícitas: la consulta
+        trae solo las columnas listadas y ninguna relación; las claves foráneas
+        de los formularios se eligen con búsqueda ajax.
+        """
+
+        page_size = 50
+        can_set_page_size = True
+        page_size_options = (20, 50, 100)
+        column_default_sort = ("id", True)
+        column_display_pk = True
+        can_export = False
+
+        def get_query(self):
+            columnas = [getattr(self.model, c) for c in self.column_list]
+            return super().get_query().options(load_only(*columnas), lazyload("*"))
+
+        def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+            # get_count_query no recibe la búsqueda: el estimado solo vale sin filtros
+            g.admin_sin_filtros = not search and not filters
+            return super().get_list(page, sort_column, sort_desc, search, filters, execute, page_size)
+
+        def get_count_query(self):
+            if g.get("admin_sin_filtros"):
+                filas = _filas_estimadas(self.session, self.model.__tablename__)
+                if filas is not None:
+                    return self.session.query(literal(filas))
+            return super().get_count_query()
+
+    # Búsqueda y filtros solo sobre columnas con índice (btree o trigram)
+    class EmpresaAdmin(VistaAdmin):
+        column_list = ("id", "nombre", "plan", "max_usuarios", "activa")
+        column_searchable_list = ("nombre",)
+        column_sortable_list = ("id", "nombre")
+        form_columns = ("nombre", "plan", "max_usuarios", "activa")
+
+    class UsuarioAdmin(VistaAdmin):
+        column_list = ("id", "empresa_id", "nombre", "username", "email", "rol", "activo")
+        column_searchable_list = ("nombre", "email")
+        column_sortable_list = ("id", "nombre")
+        column_filters = (Usuario.empresa_id,)
+        form_columns = ("empresa", "nombre", "username", "email", "password", "rol", "activo")
+        form_ajax_refs = {"empresa": BusquedaAjax("empresa", Empresa, ("nombre",))}
+
+    class ClienteAdmin(VistaAdmin):
+        column_list = ("id", "empresa_id", "nombre", "telefono", "email", "direccion", "activo")
+        column_searchable_list = ("nombre", "telefono", "email")
+        column_sortable_list = ("id", "nombre")
+        column_filters = (Cliente.empresa_id,)
+        form_columns = ("empresa", "nombre", "telefono", "email", "direccion", "lat", "lng", "observaciones", "activo")
+        form_ajax_refs = {"empresa": BusquedaAjax("empresa", Empresa, ("nombre",))}
+
+    class InstalacionAdmin(VistaAdmin):
+        column_list = (
+            "id", "empresa_id", "cliente_id", "instalador_id", "tipo_sistema",
+            "fecha_instalacion", "frecuencia_meses", "proximo_mantenimiento", "activa",
+        )
+        column_sortable_list = ("id", "proximo_mantenimiento")
+        column_filters = (Instalacion.empresa_id, Instalacion.proximo_mantenimiento)
+        form_columns = (
+            "empresa", "cliente", "instalador", "tipo_sistema",
+            "fecha_instalacion", "frecuencia_meses", "activa",
+        )
+        form_ajax_refs = {
+            "empresa": BusquedaAjax("empresa", Empresa, ("nombre",)),
+            "cliente": BusquedaAjax("cliente", Cliente, ("nombre", "telefono")),
+            "instalador": BusquedaAjax("instalador", Usuario, ("nombre", "email")),
+        }
+
+    class MantenimientoAdmin(VistaAdmin):
+        column_list = ("id", "empresa_id", "instalacion_id", "realizado_por", "fecha", "notas")
+        column_sortable_list = ("id", "fecha")
+        column_filters = (Mantenimiento.empresa_id, Mantenimiento.instalacion_id, Mantenimiento.fecha)
+        form_columns = ("empresa", "instalacion", "tecnico", "fecha", "notas")
+        form_ajax_refs = {
+            "empresa": BusquedaAjax("empresa", Empresa, ("nombre",)),
+            "instalacion": BusquedaAjax("instalacion", Instalacion, ("tipo_sistema",)),
+            "tecnico": BusquedaAjax("tecnico", Usuario, ("nombre", "email")),
+        }
+
+    class PendienteAdmin(VistaAdmin):
+        column_list = ("id", "empresa_id", "cliente_id", "instalacion_id", "fecha", "notas")
+        column_sortable_list = ("id", "fecha")
+        column_filters = (Pendiente.empresa_id, Pendiente.cliente_id, Pendiente.instalacion_id, Pendiente.fecha)
+        form_columns = ("empresa", "cliente", "instalacion", "fecha", "notas")
+        form_ajax_refs = {
+            "empresa": BusquedaAjax("empresa", Empresa, ("nombre",)),
+            "cliente": BusquedaAjax("cliente", Cliente, ("nombre", "telefono")),
+            "instalacion": BusquedaAjax("instalacion", Instalacion, ("tipo_sistema",)),
+        }
+
+    class PresupuestoAdmin(VistaAdmin):
+        column_list = ("id", "empresa_id", "cliente_id", "cliente_nombre", "tipo_sistema", "total", "estado")
+        column_searchable_list = ("cliente_nombre",)
+        column_sortable_list = ("id",)
+        column_filters = (Presupuesto.empresa_id, Presupuesto.estado)
+        # El total lo mantienen las líneas (api/utils/presupuestos.py)
+        form_columns = (
+            "empresa", "cliente", "cliente_nombre", "cliente_telefono", "cliente_direccion",
+            "cliente_email", "tipo_sistema", "descripcion", "estado",
+        )
+        form_ajax_refs = {
+            "empresa": BusquedaAjax("empresa", Empresa, ("nombre",)),
+            "cliente": BusquedaAjax("cliente", Cliente, ("nombre", "telefono")),
+        }
+
+    class ComponenteAdmin(VistaAdmin):
+        column_list = ("id", "presupuesto_id", "nombre", "cantidad", "precio")
+        column_sortable_list = ("id",)
+        column_filters = (Componente.presupuesto_id,)
+        form_columns = ("presupuesto", "nombre", "cantidad", "precio")
+        form_ajax_refs = {"presupuesto": BusquedaAjax("presupuesto", Presupuesto, ("cliente_nombre",))}
+
+    admin = Admin(app, name='Panel Admin')
+    admin.add_view(UsuarioAdmin(Usuario, db.session))
+    admin.add_view(EmpresaAdmin(Empresa, db.session))
+    admin.add_view(ClienteAdmin(Cliente, db.session))
+    admin.add_view(InstalacionAdmin(Instalacion, db.session))
+    admin.add_view(MantenimientoAdmin(Mantenimiento, db.session))
+    admin.add_view(PendienteAdmin(Pendiente, db.session))
+    admin.add_view(PresupuestoAdmin(Presupuesto, db.session))
+    admin.add_view(ComponenteAdmin(Componente, db.session))
+    return admin
@@ -0,0 +1,49 @@
+import click
+
+from api.models import db
+from api.utils.agenda import recalcular_todo
+from api.utils.busqueda import crear_fts
+from api.utils.cambios import purgar_borrados
+from api.utils.email_utils import LOTE, enviar_pendientes, procesar_outbox
+
+
+def init_commands(app):
+    @app.cli.command("recalcular-agenda")
+    @click.option("--empresa", "empresa_id", type=int, default=None, help="Solo esta empresa")
+    def recalcular_agenda(empresa_id):
+        """Recalcula proximo_mantenimiento de todas las instalaciones (un único UPDATE)."""
+        filas = recalcular_todo(empresa_id)
+        click.echo(f"Instalaciones actualizadas: {filas}")
+
+    @app.cli.command("enviar-emails")
+    @click.option("--loop", is_flag=True, help="Quedarse procesando la outbox")
+    @click.option("--intervalo", type=int, default=5, help="Segundos entre lotes (con --loop)")
+    def enviar_emails(loop, intervalo):
+        """Envía los emails pendientes de la outbox."""
+        if loop:
+            procesar_outbox(app, intervalo)
+            return
+        total = 0
+        while True:
+            procesados = enviar_pendientes()
+            total += procesados
+            if procesados < LOTE:
+                break
+        click.echo(f"Emails procesados: {total}")
+
+    @app.cli.command("purgar-borrados")
+    @click.option("--dias", type=int, default=None, help="Retención (default: CAMBIOS_RETENCION_DIAS)")
+    def purgar(dias):
+        """Borra los tombstones de /cambios más viejos que la retención."""
+        filas = purgar_borrados(dias if dias is not None else app.config["CAMBIOS_RETENCION_DIAS"])
+        click.echo(f"Borrados purgados: {filas}")
+
+    @app.cli.command("crear-busqueda")
+    def crear_busqueda():
+        """SQLite: crea la tabla FTS5 de /buscar y sus triggers (Postgres usa la migración)."""
+        if db.engine.dialect.name != "sqlite":
+            click.echo("Solo aplica a SQLite: en Postgres la crea 'flask db upgrade'")
+            return
+        with db.engine.begin() as conn:
+            creada = crear_fts(conn)
+        click.echo("Índice de búsqueda creado" if creada else "El índice de búsqueda ya existía")
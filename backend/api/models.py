@@ -1,14 +1,68 @@
 from flask_sqlalchemy import SQLAlchemy  # type: ignore
 from config import Config
 
-db = SQLAlchemy(engine_options=Config.SQLALCHEMY_ENGINE_OPTIONS)
+# Las opciones del engine (perfil del pool) las arma init_pool antes de db.init_app
+db = SQLAlchemy()
+
+# Ninguna relación se carga por defecto: cada endpoint pide con
+# selectinload/joinedload lo que va a serializar. En modo test
+# (SQLALCHEMY_RAISE_ON_LAZYLOAD) un lazy load no planificado lanza una
+# excepción en vez de disparar un SELECT silencioso.
+LAZY = "raise_on_sql" if Config.SQLALCHEMY_RAISE_ON_LAZYLOAD else "select"
+
+
+# =========================
+# SERIALIZACION
+# =========================
+# to_dict devuelve los valores tal cual (date, datetime, Decimal): los
+# convierte el proveedor JSON de la app en una sola pasada (api/utils/respuestas.py)
+
+
+class Serializable:
+    """
+    to_dict() devuelve por defecto solo las columnas propias (representación
+    plana). Las relaciones se incluyen únicamente si se piden:
+
+        cliente.to_dict(fields={"id", "nombre", "instalaciones.id"},
+                        expand={"instalaciones": {}})
+
+    - fields: columnas a incluir; "rel.col" limita las columnas de una
+      relación expandida. None = todas.
+    - expand: árbol de relaciones a embeber ({"instalaciones": {"mantenimientos": {}}}).
+    """
+
+    __campos__ = ()
+    __expandibles__ = ()
+
+    def to_dict(self, fields=None, expand=None):
+        propios = {f for f in fields if "." not in f} if fields else None
+
+        data = {}
+        for campo in self.__campos__:
+            if not propios or campo in propios:
+                data[campo] = getattr(self, campo)
+
+        for nombre, sub_expand in (expand or {}).items():
+            sub_fields = None
+            if fields:
+                prefijo = nombre + "."
+                sub_fields = {f[len(prefijo):] for f in fields if f.startswith(prefijo)} or None
+
+            valor = getattr(self, nombre)
+            if isinstance(valor, list):
+                data[nombre] = [v.to_dict(sub_fields, sub_expand) for v in valor]
+            else:
+                data[nombre] = valor.to_dict(sub_fields, sub_expand) if valor is not None else None
+
+        return data
 
 
 # =========================
 # EMPRESA
 # =========================
-class Empresa(db.Model):
+class Empresa(Serializable, db.Model):
     __tablename__ = "empresas"
+    __campos__ = ("id", "nombre", "plan", "max_usuarios", "activa")
 
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(120), nullable=False)
@@ -23,50 +77,43 @@ class Empresa(db.Model):
     usuarios = db.relationship(
         "Usuario",
         back_populates="empresa",
-        lazy="selectin",
+        lazy=LAZY,
         cascade="all, delete-orphan",
     )
 
     clientes = db.relationship(
         "Cliente",
         back_populates="empresa",
-        lazy="selectin",
+        lazy=LAZY,
         cascade="all, delete-orphan",
     )
 
     instalaciones = db.relationship(
         "Instalacion",
         back_populates="empresa",
-        lazy="selectin",
+        lazy=LAZY,
         cascade="all, delete-orphan",
     )
 
     mantenimientos = db.relationship(
         "Mantenimiento",
         back_populates="empresa",
-        lazy="selectin",
+        lazy=LAZY,
         cascade="all, delete-orphan",
     )
 
-    pendientes = db.relationship("Pendiente", back_populates="empresa", lazy="selectin", cascade="all, delete-orphan")
-
-    presupuestos = db.relationship("Presupuesto", back_populates="empresa", lazy="selectin", cascade="all, delete-orphan")
+    pendientes = db.relationship("Pendiente", back_populates="empresa", lazy=LAZY, cascade="all, delete-orphan")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "nombre": self.nombre,
-            "plan": self.plan,
-            "max_usuarios": self.max_usuarios,
-            "activa": self.activa,
-        }
+    presupuestos = db.relationship("Presupuesto", back_populates="empresa", lazy=LAZY, cascade="all, delete-orphan")
 
 
 # =========================
 # USUARIO
 # =========================
-class Usuario(db.Model):
+class Usuario(Serializable, db.Model):
     __tablename__ = "usuarios"
+    __campos__ = ("id", "empresa_id", "nombre", "username", "email", "rol", "activo")
+    __expandibles__ = ("empresa",)
 
     id = db.Column(db.Integer, primary_key=True)
     empresa_id = db.Column(db.Integer, db.ForeignKey("empresas.id"), nullable=False)
@@ -83,37 +130,31 @@ class Usuario(db.Model):
     created_at = db.Column(db.DateTime, default=db.func.now())
 
     # RELACIONES
-    empresa = db.relationship("Empresa", back_populates="usuarios")
+    empresa = db.relationship("Empresa", back_populates="usuarios", lazy=LAZY)
 
     instalaciones = db.relationship(
         "Instalacion",
         back_populates="instalador",
-        lazy="selectin",
+        lazy=LAZY,
     )
 
     mantenimientos = db.relationship(
         "Mantenimiento",
         back_populates="tecnico",
-        lazy="selectin",
+        lazy=LAZY,
     )
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "empresa_id": self.empresa_id,
-            "nombre": self.nombre,
-            "username": self.username,
-            "email": self.email,
-            "rol": self.rol,
-            "activo": self.activo,
-        }
-
 
 # =========================
 # CLIENTE
 # =========================
-class Cliente(db.Model):
+class Cliente(Serializable, db.Model):
     __tablename__ = "clientes"
+    __campos__ = (
+        "id", "empresa_id", "nombre", "telefono", "email", "direccion",
+        "lat", "lng", "observaciones", "activo",
+    )
+    __expandibles__ = ("instalaciones", "pendientes", "presupuestos")
 
     id = db.Column(db.Integer, primary_key=True)
     empresa_id = db.Column(db.Integer, db.ForeignKey("empresas.id"), nullable=False)
@@ -125,49 +166,41 @@ class Cliente(db.Model):
 
     lat = db.Column(db.Float)
     lng = db.Column(db.Float)
+    # Celda de la grilla geográfica (api/utils/geo.py), para búsquedas por zona
+    celda = db.Column(db.BigInteger)
 
     observaciones = db.Column(db.Text)
     activo = db.Column(db.Boolean, default=True)
 
     created_at = db.Column(db.DateTime, default=db.func.now())
+    # La mantiene el ORM/Core (onupdate) en cada escritura: feed de /cambios
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
 
     # RELACIONES
-    empresa = db.relationship("Empresa", back_populates="clientes")
+    empresa = db.relationship("Empresa", back_populates="clientes", lazy=LAZY)
 
     instalaciones = db.relationship(
         "Instalacion",
         back_populates="cliente",
-        lazy="selectin",
+        lazy=LAZY,
         cascade="all, delete-orphan",
     )
 
-    pendientes = db.relationship("Pendiente", back_populates="cliente", lazy="selectin", cascade="all, delete-orphan")
+    pendientes = db.relationship("Pendiente", back_populates="cliente", lazy=LAZY, cascade="all, delete-orphan")
 
-    presupuestos = db.relationship("Presupuesto", back_populates="cliente", lazy="selectin", cascade="all, delete-orphan")
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "empresa_id": self.empresa_id,
-            "nombre": self.nombre,
-            "telefono": self.telefono,
-            "email": self.email,
-            "direccion": self.direccion,
-            "lat": self.lat,
-            "lng": self.lng,
-            "observaciones": self.observaciones,
-            "activo": self.activo,
-            "instalaciones": [i.to_dict() for i in self.instalaciones],
-            "pendientes": [p.to_dict() for p in self.pendientes],
-            "presupuestos": [p.to_dict() for p in self.presupuestos],
-        }
+    presupuestos = db.relationship("Presupuesto", back_populates="cliente", lazy=LAZY, cascade="all, delete-orphan")
 
 
 # =========================
 # INSTALACION
 # =========================
-class Instalacion(db.Model):
+class Instalacion(Serializable, db.Model):
     __tablename__ = "instalaciones"
+    __campos__ = (
+        "id", "empresa_id", "cliente_id", "instalador_id", "tipo_sistema",
+        "fecha_instalacion", "frecuencia_meses", "proximo_mantenimiento", "activa",
+    )
+    __expandibles__ = ("mantenimientos", "pendientes", "cliente", "instalador")
 
     id = db.Column(db.Integer, primary_key=True)
     empresa_id = db.Column(db.Integer, db.ForeignKey("empresas.id"), nullable=False)
@@ -183,48 +216,33 @@ class Instalacion(db.Model):
 
     activa = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=db.func.now())
+    # La mantiene el ORM/Core (onupdate) en cada escritura: feed de /cambios
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
 
     # RELACIONES
-    empresa = db.relationship("Empresa", back_populates="instalaciones")
+    empresa = db.relationship("Empresa", back_populates="instalaciones", lazy=LAZY)
 
-    cliente = db.relationship("Cliente", back_populates="instalaciones")
+    cliente = db.relationship("Cliente", back_populates="instalaciones", lazy=LAZY)
 
-    instalador = db.relationship("Usuario", back_populates="instalaciones")
+    instalador = db.relationship("Usuario", back_populates="instalaciones", lazy=LAZY)
 
     mantenimientos = db.relationship(
         "Mantenimiento",
         back_populates="instalacion",
-        lazy="selectin",
+        lazy=LAZY,
         cascade="all, delete-orphan",
     )
 
-    pendientes = db.relationship("Pendiente", back_populates="instalacion", lazy="selectin", cascade="all, delete-orphan")
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "empresa_id": self.empresa_id,
-            "cliente_id": self.cliente_id,
-            "instalador_id": self.instalador_id,
-            "tipo_sistema": self.tipo_sistema,
-            "fecha_instalacion": self.fecha_instalacion.isoformat(),
-            "frecuencia_meses": self.frecuencia_meses,
-            "proximo_mantenimiento": (
-                self.proximo_mantenimiento.isoformat()
-                if self.proximo_mantenimiento
-                else None
-            ),
-            "activa": self.activa,
-            "mantenimientos": [m.to_dict() for m in self.mantenimientos],
-            "pendientes": [p.to_dict() for p in self.pendientes],
-        }
+    pendientes = db.relationship("Pendiente", back_populates="instalacion", lazy=LAZY, cascade="all, delete-orphan")
 
 
 # =========================
 # MANTENIMIENTO
 # =========================
-class Mantenimiento(db.Model):
+class Mantenimiento(Serializable, db.Model):
     __tablename__ = "mantenimientos"
+    __campos__ = ("id", "empresa_id", "instalacion_id", "realizado_por", "fecha", "notas")
+    __expandibles__ = ("instalacion", "tecnico")
 
     id = db.Column(db.Integer, primary_key=True)
     empresa_id = db.Column(db.Integer, db.ForeignKey("empresas.id"), nullable=False)
@@ -237,30 +255,26 @@ class Mantenimiento(db.Model):
     notas = db.Column(db.Text)
 
     created_at = db.Column(db.DateTime, default=db.func.now())
+    # La mantiene el ORM/Core (onupdate) en cada escritura: feed de /cambios
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
 
     # RELACIONES
-    empresa = db.relationship("Empresa", back_populates="mantenimientos")
+    empresa = db.relationship("Empresa", back_populates="mantenimientos", lazy=LAZY)
 
-    instalacion = db.relationship("Instalacion", back_populates="mantenimientos")
+    instalacion = db.relationship("Instalacion", back_populates="mantenimientos", lazy=LAZY)
+
+    tecnico = db.relationship("Usuario", back_populates="mantenimientos", lazy=LAZY)
 
-    tecnico = db.relationship("Usuario", back_populates="mantenimientos")
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "empresa_id": self.empresa_id,
-            "instalacion_id": self.instalacion_id,
-            "realizado_por": self.realizado_por,
-            "fecha": self.fecha.isoformat(),
-            "notas": self.notas,
-        }
-    
 # =========================
 # PENDIENTES
 # =========================
 
-class Pendiente(db.Model):
+class Pendiente(Serializable, db.Model):
     __tablename__ = "pendientes"
+    __campos__ = ("id", "empresa_id", "cliente_id", "instalacion_id", "fecha", "notas")
+    __expandibles__ = ("cliente", "instalacion")
+
     id = db.Column(db.Integer, primary_key=True)
     empresa_id = db.Column(db.Integer, db.ForeignKey("empresas.id"), nullable=False)
     cliente_id = db.Column(db.Integer, db.ForeignKey("clientes.id"), nullable=False)
@@ -268,30 +282,28 @@ class Pendiente(db.Model):
     fecha = db.Column(db.Date, nullable=False)
     notas = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=db.func.now())
+    # La mantiene el ORM/Core (onupdate) en cada escritura: feed de /cambios
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
 
 
     # RELACIONES
-    empresa = db.relationship("Empresa", back_populates="pendientes")
-
-    cliente = db.relationship("Cliente", back_populates="pendientes")
+    empresa = db.relationship("Empresa", back_populates="pendientes", lazy=LAZY)
 
-    instalacion = db.relationship("Instalacion", back_populates="pendientes")
+    cliente = db.relationship("Cliente", back_populates="pendientes", lazy=LAZY)
 
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "empresa_id": self.empresa_id,
-            "cliente_id": self.cliente_id,
-            "instalacion_id": self.instalacion_id,
-            "fecha": self.fecha.isoformat(),
-            "notas": self.notas,
-        }
+    instalacion = db.relationship("Instalacion", back_populates="pendientes", lazy=LAZY)
 
 # =========================
 # PRESUPUESTOS
 # =========================
-class Presupuesto(db.Model):
+class Presupuesto(Serializable, db.Model):
     __tablename__ = "presupuestos"
+    __campos__ = (
+        "id", "empresa_id", "cliente_id", "cliente_nombre", "cliente_telefono",
+        "cliente_direccion", "cliente_email", "tipo_sistema", "descripcion",
+        "total", "estado", "creado_por",
+    )
+    __expandibles__ = ("componentes", "cliente")
 
     id = db.Column(db.Integer, primary_key=True)
     empresa_id = db.Column(db.Integer, db.ForeignKey("empresas.id"), nullable=False)
@@ -303,57 +315,119 @@ class Presupuesto(db.Model):
 
     tipo_sistema = db.Column(db.String(50))
     descripcion = db.Column(db.Text)
-    total = db.Column(db.Float)
+    # Suma de cantidad * precio de los componentes; la mantiene el servidor
+    total = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default="0")
 
     estado = db.Column(db.String(50), default="pendiente")
     creado_por = db.Column(db.Integer, db.ForeignKey("usuarios.id"))
+    # También se toca cuando cambian sus componentes (api/utils/cambios.py)
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
 
     # RELACIONES
-    empresa = db.relationship("Empresa", back_populates="presupuestos")
-
-    cliente = db.relationship("Cliente", back_populates="presupuestos")
-
-    componentes = db.relationship("Componente", back_populates="presupuesto")
-
-    def to_dict(self):
-        return {
-            "id": self.id,
-            "empresa_id": self.empresa_id,
-            "cliente_id": self.cliente_id,
-            "cliente_nombre": self.cliente_nombre,
-            "cliente_telefono": self.cliente_telefono,
-            "cliente_direccion": self.cliente_direccion,
-            "cliente_email": self.cliente_email,
-            "tipo_sistema": self.tipo_sistema,
-            "descripcion": self.descripcion,
-            "total": self.total,
-            "estado": self.estado,
-            "creado_por": self.creado_por,
-            "componentes": [c.to_dict() for c in self.componentes],
-        }
-    
+    empresa = db.relationship("Empresa", back_populates="presupuestos", lazy=LAZY)
+
+    cliente = db.relationship("Cliente", back_populates="presupuestos", lazy=LAZY)
+
+    componentes = db.relationship(
+        "Componente",
+        back_populates="presupuesto",
+        lazy=LAZY,
+        cascade="all, delete-orphan",
+    )
+
+
 # =========================
 # COMPONENTES
 # =========================
-class Componente(db.Model):
-    __tablename__ = "componentes"    
+class Componente(Serializable, db.Model):
+    __tablename__ = "componentes"
+    __campos__ = ("id", "presupuesto_id", "nombre", "cantidad", "precio")
     id = db.Column(db.Integer, primary_key=True)
     presupuesto_id = db.Column(db.Integer, db.ForeignKey("presupuestos.id"), nullable=False)
     nombre = db.Column(db.String(120), nullable=False)
     cantidad = db.Column(db.Integer, nullable=False)
-    precio = db.Column(db.Float, nullable=False)
+    precio = db.Column(db.Numeric(12, 2), nullable=False)
     
     # RELACIONES
-    presupuesto = db.relationship("Presupuesto", back_populates="componentes")
+    presupuesto = db.relationship("Presupuesto", back_populates="componentes", lazy=LAZY)
+
+# =========================
+# VERSIONES (ETag por tenant y entidad)
+# =========================
+class Version(db.Model):
+    __tablename__ = "versiones"
+
+    empresa_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    entidad = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+# =========================
+# BORRADOS (tombstones para /cambios)
+# =========================
+class Borrado(db.Model):
+    __tablename__ = "borrados"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Sin FK (como versiones): los de una empresa borrada los limpia la purga
+    empresa_id = db.Column(db.Integer, nullable=False)
+    entidad = db.Column(db.String(50), nullable=False)
+    entidad_id = db.Column(db.Integer, nullable=False)
+    borrado_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+
+# =========================
+# EMAIL OUTBOX
+# =========================
+class EmailOutbox(db.Model):
+    __tablename__ = "email_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    asunto = db.Column(db.String(255), nullable=False)
+    cuerpo = db.Column(db.Text)
+
+    estado = db.Column(db.String(20), nullable=False, default="PENDIENTE")
+    # PENDIENTE | ENVIADO | ERROR
+
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    proximo_intento = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    ultimo_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    enviado_at = db.Column(db.DateTime)
+
 
 # =========================
 # INDICES
 # =========================
 db.Index("idx_usuario_empresa", Usuario.empresa_id)
+# Login: búsqueda por email/username normalizados
+db.Index("idx_usuario_email_lower", db.func.lower(Usuario.email))
+db.Index("idx_usuario_username_lower", db.func.lower(Usuario.username))
 db.Index("idx_cliente_empresa", Cliente.empresa_id)
 db.Index("idx_instalacion_empresa", Instalacion.empresa_id)
 db.Index("idx_mantenimiento_empresa", Mantenimiento.empresa_id)
-db.Index("idx_mantenimiento_instalacion", Mantenimiento.instalacion_id)
+db.Index("idx_mantenimiento_instalacion_fecha", Mantenimiento.instalacion_id, Mantenimiento.fecha)
 db.Index("idx_pendiente_empresa", Pendiente.empresa_id)
 db.Index("idx_pendiente_cliente", Pendiente.cliente_id)
 db.Index("idx_pendiente_instalacion", Pendiente.instalacion_id)
+
+# Compuestos para listados filtrados por tenant (range scans por empresa)
+db.Index("idx_cliente_empresa_nombre", Cliente.empresa_id, Cliente.nombre)
+db.Index("idx_cliente_empresa_celda", Cliente.empresa_id, Cliente.celda)
+db.Index("idx_instalacion_empresa_proximo", Instalacion.empresa_id, Instalacion.proximo_mantenimiento)
+db.Index("idx_mantenimiento_empresa_fecha", Mantenimiento.empresa_id, Mantenimiento.fecha)
+db.Index("idx_pendiente_empresa_fecha", Pendiente.empresa_id, Pendiente.fecha)
+db.Index("idx_presupuesto_empresa", Presupuesto.empresa_id)
+db.Index("idx_presupuesto_empresa_estado", Presupuesto.empresa_id, Presupuesto.estado)
+db.Index("idx_componente_presupuesto", Componente.presupuesto_id)
+db.Index("idx_email_outbox_estado", EmailOutbox.estado, EmailOutbox.proximo_intento)
+
+# Feed incremental de /cambios: keyset por (updated_at, id) dentro del tenant
+db.Index("idx_cliente_empresa_updated", Cliente.empresa_id, Cliente.updated_at, Cliente.id)
+db.Index("idx_instalacion_empresa_updated", Instalacion.empresa_id, Instalacion.updated_at, Instalacion.id)
+db.Index("idx_mantenimiento_empresa_updated", Mantenimiento.empresa_id, Mantenimiento.updated_at, Mantenimiento.id)
+db.Index("idx_pendiente_empresa_updated", Pendiente.empresa_id, Pendiente.updated_at, Pendiente.id)
+db.Index("idx_presupuesto_empresa_updated", Presupuesto.empresa_id, Presupuesto.updated_at, Presupuesto.id)
+db.Index("idx_borrado_empresa_fecha", Borrado.empresa_id, Borrado.borrado_at, Borrado.id)
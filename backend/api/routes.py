@@ -1,11 +1,14 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import or_
+from datetime import date, timedelta
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from flask_jwt_extended import (
     create_access_token,
+    create_refresh_token,
     jwt_required,
     get_jwt_identity,
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from api.models import (
     db,
@@ -18,22 +21,139 @@ from api.models import (
     Presupuesto,
     Componente,
 )
+from api.utils.pagination import Listado, ParametroInvalido, parse_entero, parse_fecha, parse_real
+from api.utils.agenda import query_agenda
+from api.utils.email_utils import estado_outbox
+from api.utils.importador import ImportacionInvalida, importar, leer_filas
+from api.utils import busqueda, cambios, dashboard, exportador, geo, lote, parcial
+from api.utils.tenancy import empresa_actual
+from api.utils.versiones import con_etag
+from api.utils.cache import cache, cacheado
+from api.utils.query_stats import max_queries
+from api.utils.serializacion import Vista, opciones_carga
+from api.utils.passwords import hashear, verificar
+from api.utils.pool import metricas as metricas_pool
+from api.utils.principal import cargar_principal, principales
+from api.utils.presupuestos import (
+    ComponentesInvalidos,
+    insertar_lineas,
+    reemplazar_componentes,
+    total_lineas,
+    validar_lineas,
+)
 
 api = Blueprint("api", __name__)
 
 
+@api.errorhandler(ParametroInvalido)
+@api.errorhandler(ImportacionInvalida)
+@api.errorhandler(cambios.CursorInvalido)
+def parametro_invalido(e):
+    return jsonify({"message": str(e)}), 400
+
+
+@api.errorhandler(lote.LoteInvalido)
+def lote_invalido(e):
+    db.session.rollback()
+    detalle = e.args[0] if e.args else None
+    if isinstance(detalle, list):
+        return jsonify({"message": "Operaciones inválidas: no se aplicó ninguna", "errores": detalle}), 400
+    return jsonify({"message": str(e)}), 400
+
+
+@api.errorhandler(cambios.CursorVencido)
+def cursor_vencido(e):
+    return jsonify({"message": str(e), "resincronizar": True}), 410
+
+
+@api.errorhandler(busqueda.IndiceNoCreado)
+def indice_no_creado(e):
+    return jsonify({"message": str(e)}), 503
+
+
+@api.errorhandler(parcial.CambiosInvalidos)
+def cambios_invalidos(e):
+    return jsonify({"message": "Campos inválidos", "errores": e.args[0]}), 400
+
+
+@api.errorhandler(ComponentesInvalidos)
+def componentes_invalidos(e):
+    detalle = e.args[0] if e.args else None
+    if isinstance(detalle, list):
+        return jsonify({"message": "Componentes inválidos", "errores": detalle}), 400
+    return jsonify({"message": str(e)}), 400
+
+
+# ======================
+# LISTADOS (filtros / orden / paginación)
+# ======================
+LISTADO_USUARIOS = Listado(Usuario, filtros=("empresa_id", "rol", "activo"), orden=("id", "nombre"))
+LISTADO_EMPRESAS = Listado(Empresa, filtros=("plan", "activa"), orden=("id", "nombre"))
+LISTADO_CLIENTES = Listado(Cliente, filtros=("empresa_id", "activo"), orden=("id", "nombre"))
+MAX_CERCANOS = 500
+LISTADO_INSTALACIONES = Listado(
+    Instalacion,
+    filtros=("empresa_id", "cliente_id", "instalador_id", "tipo_sistema", "activa"),
+    rangos=("fecha_instalacion", "proximo_mantenimiento"),
+    orden=("id", "fecha_instalacion"),
+)
+LISTADO_MANTENIMIENTOS = Listado(
+    Mantenimiento,
+    filtros=("empresa_id", "instalacion_id", "realizado_por"),
+    rangos=("fecha",),
+    orden=("id", "fecha"),
+)
+LISTADO_PENDIENTES = Listado(
+    Pendiente,
+    filtros=("empresa_id", "cliente_id", "instalacion_id"),
+    rangos=("fecha",),
+    orden=("id", "fecha"),
+)
+LISTADO_PRESUPUESTOS = Listado(
+    Presupuesto,
+    filtros=("empresa_id", "cliente_id", "estado", "tipo_sistema", "creado_por"),
+    orden=("id",),
+)
+LISTADO_COMPONENTES = Listado(Componente, filtros=("presupuesto_id",), orden=("id", "nombre"))
+
+# Relaciones que recorre el cascade de cada delete: se cargan de una vez
+# con selectinload en vez de un lazy load por fila.
+CASCADE_INSTALACION = {"mantenimientos": {}, "pendientes": {}}
+# Al borrar un usuario sus instalaciones/mantenimientos quedan sin asignar
+CASCADE_USUARIO = {"instalaciones": {}, "mantenimientos": {}}
+CASCADE_PRESUPUESTO = {"componentes": {}}
+CASCADE_CLIENTE = {"instalaciones": CASCADE_INSTALACION, "pendientes": {}, "presupuestos": CASCADE_PRESUPUESTO}
+CASCADE_EMPRESA = {
+    "usuarios": {"instalaciones": {}, "mantenimientos": {}},
+    "clientes": CASCADE_CLIENTE,
+    "instalaciones": CASCADE_INSTALACION,
+    "mantenimientos": {},
+    "pendientes": {},
+    "presupuestos": CASCADE_PRESUPUESTO,
+}
+
+
 # ======================
 # HEALTH
 # ======================
 @api.route("/hello", methods=["GET"])
+@max_queries(1)
 def hello():
     return jsonify({"message": "API OK"})
 
 
+@api.route("/emails/estado", methods=["GET"])
+@jwt_required()
+@max_queries(3)
+def get_estado_emails():
+    return jsonify(estado_outbox())
+
+
 # ======================
 # SETUP (ONE SHOT)
 # ======================
 @api.route("/auth/setup", methods=["POST"])
+@max_queries(2)
 def setup():
     if Usuario.query.first():
         return jsonify({"message": "Setup already completed"}), 403
@@ -45,7 +165,7 @@ def setup():
     user = Usuario(
         nombre=data.get("nombre", "Admin"),
         email=data["email"],
-        password=generate_password_hash(data["password"]),
+        password=hashear(data["password"]),
         rol="ADMIN",
     )
 
@@ -58,7 +178,17 @@ def setup():
 # ======================
 # LOGIN
 # ======================
+def _buscar_login(identificador):
+    # Dos búsquedas por índice (lower(email) y lower(username)) en vez de un OR
+    identificador = identificador.strip().lower()
+    usuario = Usuario.query.filter(func.lower(Usuario.email) == identificador).first()
+    if usuario is None:
+        usuario = Usuario.query.filter(func.lower(Usuario.username) == identificador).first()
+    return usuario
+
+
 @api.route("/auth/login", methods=["POST"])
+@max_queries(4)
 def login():
     data = request.get_json()
 
@@ -68,52 +198,72 @@ def login():
     if not email or not password:
         return {"error": "Datos incompletos"}, 400
 
-    usuario = Usuario.query.filter(
-        or_(
-            Usuario.email == email,
-            Usuario.username == email
-        )
-    ).first()
+    usuario = _buscar_login(email)
+    if not usuario:
+        return {"error": "Credenciales inválidas"}, 401
 
-    if not usuario or not check_password_hash(usuario.password, password):
+    ok, hash_nuevo = verificar(usuario.password, password)
+    if not ok:
         return {"error": "Credenciales inválidas"}, 401
 
     if not usuario.activo:
         return {"error": "Usuario inactivo"}, 403
 
-    token = create_access_token(identity=usuario.id)
-
-    return {
-        "token": token,
+    respuesta = {
+        "token": create_access_token(identity=usuario.id),
+        "refresh_token": create_refresh_token(identity=usuario.id),
         "usuario": usuario.to_dict()
     }
 
+    # Hash con parámetros viejos: se reemplaza ahora que tenemos la contraseña
+    if hash_nuevo:
+        usuario.password = hash_nuevo
+        db.session.commit()
+
+    return respuesta
+
+
+@api.route("/auth/refresh", methods=["POST"])
+@jwt_required(refresh=True)
+@max_queries(1)
+def refresh():
+    principal = cargar_principal(get_jwt_identity())
+    if not principal or not principal.activo:
+        return {"error": "Usuario inactivo"}, 401
+
+    return {"token": create_access_token(identity=principal.id)}
+
 # ======================
 # USUARIOS (ADMIN)
 # ======================
 @api.route("/usuarios", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Usuario)
 def get_usuarios():
-    usuarios = Usuario.query.all()
-    return jsonify({"usuarios": [u.to_dict() for u in usuarios]})
+    vista = Vista.desde_request(Usuario)
+    usuarios, meta = LISTADO_USUARIOS.paginar(vista.query())
+    return jsonify({"usuarios": vista.serializar_lista(usuarios), **meta})
 
 
 @api.route("/usuarios", methods=["POST"])
 @jwt_required()
+@max_queries(5)
 def create_usuario():
     data = request.get_json(force=True)
     if not data:
         return jsonify({"message": "Invalid JSON"}), 400
 
-    if Usuario.query.filter_by(email=data["email"]).first():
+    # El email es único en todas las empresas
+    if Usuario.query.filter_by(email=data["email"]).execution_options(sin_tenant=True).first():
         return jsonify({"message": "Email already exists"}), 409
 
     user = Usuario(
         nombre=data["nombre"],
         email=data["email"],
         username=data.get("username"),
-        password=generate_password_hash(data["password"]),
+        password=hashear(data["password"]),
         rol=data.get("rol", "INSTALADOR"),
-        empresa_id=data.get("empresa_id"),
     )
 
     db.session.add(user)
@@ -122,6 +272,8 @@ def create_usuario():
     return jsonify({"user": user.to_dict()}), 201
 
 @api.route("/usuarios/<int:id>", methods=["PUT"])
+@jwt_required()
+@max_queries(5)
 def update_usuario(id):
     data = request.get_json(force=True)
     if not data:
@@ -136,22 +288,22 @@ def update_usuario(id):
     username = data.get("username")
     password = data.get("password")
     rol = data.get("rol")
-    empresa_id = data.get("empresa_id")
-    
+
     if nombre: usuario.nombre = nombre
     if email: usuario.email = email
     if username: usuario.username = username
-    if password: usuario.password = generate_password_hash(password)
+    if password: usuario.password = hashear(password)
     if rol: usuario.rol = rol
-    if empresa_id: usuario.empresa_id = empresa_id
     
     db.session.commit()    
     return jsonify({"usuario": usuario.to_dict()}), 200
 
 
 @api.route("/usuarios/<int:id>", methods=["DELETE"])
+@jwt_required()
+@max_queries(10)
 def delete_usuario(id):
-    usuario = Usuario.query.get(id)
+    usuario = Usuario.query.options(*opciones_carga(Usuario, CASCADE_USUARIO)).filter_by(id=id).first()
     if not usuario:
         return jsonify({"message": "Usuario no encontrado"}), 404
     
@@ -163,12 +315,17 @@ def delete_usuario(id):
 # EMPRESAS
 # ======================
 @api.route("/empresas", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Empresa)
 def get_empresas():
-    empresas = Empresa.query.all()
-    return jsonify({"empresas": [e.to_dict() for e in empresas]})
+    vista = Vista.desde_request(Empresa)
+    empresas, meta = LISTADO_EMPRESAS.paginar(vista.query())
+    return jsonify({"empresas": vista.serializar_lista(empresas), **meta})
 
 @api.route("/empresas", methods=["POST"])
 @jwt_required()
+@max_queries(4)
 def create_empresa():
     data = request.get_json(force=True)
     if not data:
@@ -183,31 +340,29 @@ def create_empresa():
 
     db.session.add(empresa)
     db.session.commit()
-    return jsonify({"empresa": empresa.to_dict()}), 201
+    return parcial.respuesta(empresa, "empresa", 201)
 
-@api.route("/empresas/<int:id>", methods=["PUT"])
+@api.route("/empresas/<int:id>", methods=["PUT", "PATCH"])
 @jwt_required()
+@max_queries(5)
 def update_empresa(id):
-    data = request.get_json(force=True)
-    if not data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
         return jsonify({"message": "Invalid JSON"}), 400
-    
+
     empresa = Empresa.query.get(id)
     if not empresa:
         return jsonify({"message": "Empresa no encontrada"}), 404
-    
-    empresa.nombre = data.get("nombre")
-    empresa.plan = data.get("plan")
-    empresa.max_usuarios = data.get("max_usuarios")
-    empresa.activa = data.get("activa")
-    
-    db.session.commit()    
-    return jsonify({"empresa": empresa.to_dict()}), 200
+
+    if parcial.aplicar(empresa, data):
+        db.session.commit()
+    return parcial.respuesta(empresa, "empresa")
 
 @api.route("/empresas/<int:id>", methods=["DELETE"])
 @jwt_required()
+@max_queries(37)
 def delete_empresa(id):
-    empresa = Empresa.query.get(id)
+    empresa = Empresa.query.options(*opciones_carga(Empresa, CASCADE_EMPRESA)).filter_by(id=id).first()
     if not empresa:
         return jsonify({"message": "Empresa no encontrada"}), 404
     
@@ -216,57 +371,193 @@ def delete_empresa(id):
     return jsonify({"message": "Empresa eliminada"}), 200
 
 
+# ======================
+# DATOS DE REFERENCIA (cacheados)
+# ======================
+TIPOS_SISTEMA = ("CAMARAS", "ALARMAS", "AMBOS")
+TTL_DASHBOARD = 30
+
+
+@api.route("/empresa", methods=["GET"])
+@jwt_required()
+@max_queries(2)
+def get_empresa_actual():
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    def cargar():
+        empresa = db.session.get(Empresa, empresa_id)
+        return empresa.to_dict() if empresa else None
+
+    empresa = cacheado((empresa_id, "empresa"), ("empresas",), cargar)
+    if empresa is None:
+        return jsonify({"message": "Empresa no encontrada"}), 404
+    return jsonify({"empresa": empresa})
+
+
+@api.route("/usuarios/instaladores", methods=["GET"])
+@jwt_required()
+@max_queries(2)
+def get_instaladores():
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    def cargar():
+        filas = db.session.execute(
+            db.select(Usuario.id, Usuario.nombre, Usuario.rol)
+            .where(Usuario.empresa_id == empresa_id, Usuario.activo.is_(True))
+            .order_by(Usuario.nombre)
+        )
+        return [{"id": id, "nombre": nombre, "rol": rol} for id, nombre, rol in filas]
+
+    usuarios = cacheado((empresa_id, "instaladores"), ("usuarios",), cargar)
+    return jsonify({"usuarios": usuarios})
+
+
+@api.route("/catalogos/tipos-sistema", methods=["GET"])
+@jwt_required()
+@max_queries(3)
+def get_tipos_sistema():
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    def cargar():
+        tipos = set(TIPOS_SISTEMA)
+        for model in (Instalacion, Presupuesto):
+            tipos.update(
+                db.session.execute(
+                    db.select(model.tipo_sistema)
+                    .where(model.empresa_id == empresa_id, model.tipo_sistema.isnot(None))
+                    .distinct()
+                ).scalars()
+            )
+        return sorted(tipos)
+
+    tipos = cacheado((empresa_id, "tipos_sistema"), ("instalaciones", "presupuestos"), cargar)
+    return jsonify({"tipos_sistema": tipos})
+
+
+@api.route("/dashboard", methods=["GET"])
+@jwt_required()
+@max_queries(5)
+def get_dashboard():
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    dias = parse_entero(request.args.get("dias", dashboard.DIAS_DEFAULT), "dias")
+    if not 0 <= dias <= 365:
+        raise ParametroInvalido("'dias' debe estar entre 0 y 365")
+    hoy = date.today()
+
+    # Cache corta: además de invalidarse con cada escritura, cambia con el día
+    resumen = cacheado(
+        (empresa_id, "dashboard", hoy, dias),
+        dashboard.ENTIDADES,
+        lambda: dashboard.resumen(empresa_id, hoy, dias),
+        ttl=TTL_DASHBOARD,
+    )
+    return jsonify(resumen)
+
+
+@api.route("/cache/estado", methods=["GET"])
+@jwt_required()
+@max_queries(1)
+def get_estado_cache():
+    return jsonify({**cache.estadisticas(), "principales": principales.estadisticas()})
+
+
+@api.route("/pool/estado", methods=["GET"])
+@jwt_required()
+@max_queries(1)
+def get_estado_pool():
+    pool = db.engine.pool
+    return jsonify({**metricas_pool.estadisticas(), "pool": pool.status(), "tipo": type(pool).__name__})
+
+
+# ======================
+# BUSQUEDA
+# ======================
+@api.route("/buscar", methods=["GET"])
+@jwt_required()
+@max_queries(7)
+def buscar():
+    """Búsqueda por texto (prefijos y errores de tipeo) en clientes, presupuestos y notas."""
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    q = (request.args.get("q") or "").strip()
+    if len(q) < 2:
+        raise ParametroInvalido("'q' debe tener al menos 2 caracteres")
+
+    tipos = [t.strip() for t in request.args.get("tipos", "").split(",") if t.strip()]
+    desconocidos = [t for t in tipos if t not in busqueda.ENTIDADES]
+    if desconocidos:
+        raise ParametroInvalido(f"Tipos inválidos: {desconocidos} (válidos: {list(busqueda.ENTIDADES)})")
+
+    limite = parse_entero(request.args.get("limit", busqueda.LIMITE_DEFAULT), "limit")
+    if not 0 < limite <= busqueda.MAX_LIMITE:
+        raise ParametroInvalido(f"'limit' debe estar entre 1 y {busqueda.MAX_LIMITE}")
+
+    resultados = busqueda.buscar(q, empresa_id, tipos or None, limite)
+    return jsonify({
+        "q": q,
+        "resultados": {
+            tipo: [{**obj.to_dict(), "puntaje": round(puntaje, 3)} for obj, puntaje in filas]
+            for tipo, filas in resultados.items()
+        },
+    })
+
+
 # ======================
 # CLIENTES
 # ======================
 @api.route("/clientes", methods=["POST"])
 @jwt_required()
+@max_queries(4)
 def create_cliente():
     data = request.get_json(force=True)
     if not data:
         return jsonify({"message": "Invalid JSON"}), 400
 
     cliente = Cliente(
-        empresa_id=data["empresa_id"],
         nombre=data["nombre"],
         telefono=data.get("telefono"),
         email=data.get("email"),
         direccion=data.get("direccion"),
-        lat=data.get("lat"),
-        lng=data.get("lng"),
         observaciones=data.get("observaciones"),
+        **parcial.convertir_campos(Cliente, data, ("lat", "lng")),
     )
 
     db.session.add(cliente)
     db.session.commit()
-    return jsonify({"cliente": cliente.to_dict()}), 201
+    return parcial.respuesta(cliente, "cliente", 201)
 
-@api.route("/clientes/<int:id>", methods=["PUT"])
+@api.route("/clientes/<int:id>", methods=["PUT", "PATCH"])
 @jwt_required()
+@max_queries(5)
 def update_cliente(id):
-    data = request.get_json(force=True)
-    if not data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
         return jsonify({"message": "Invalid JSON"}), 400
-    
+
     cliente = Cliente.query.get(id)
     if not cliente:
         return jsonify({"message": "Cliente no encontrado"}), 404
-    
-    cliente.nombre = data.get("nombre")
-    cliente.telefono = data.get("telefono")
-    cliente.email = data.get("email")
-    cliente.direccion = data.get("direccion")
-    cliente.lat = data.get("lat")
-    cliente.lng = data.get("lng")
-    cliente.observaciones = data.get("observaciones")
-    
-    db.session.commit()
-    return jsonify({"cliente": cliente.to_dict()}), 200 
+
+    if parcial.aplicar(cliente, data):
+        db.session.commit()
+    return parcial.respuesta(cliente, "cliente")
 
 @api.route("/clientes/<int:id>", methods=["DELETE"])
 @jwt_required()
+@max_queries(16)
 def delete_cliente(id):
-    cliente = Cliente.query.get(id)
+    cliente = Cliente.query.options(*opciones_carga(Cliente, CASCADE_CLIENTE)).filter_by(id=id).first()
     if not cliente:
         return jsonify({"message": "Cliente no encontrado"}), 404
     
@@ -274,10 +565,61 @@ def delete_cliente(id):
     db.session.commit()
     return jsonify({"message": "Cliente eliminado"}), 200   
 
+@api.route("/clientes/near", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Cliente)
+def get_clientes_cercanos():
+    lat = parse_real(request.args.get("lat"), "lat")
+    lng = parse_real(request.args.get("lng"), "lng")
+    radio = parse_real(request.args.get("radius_km", 5), "radius_km")
+    limite = parse_entero(request.args.get("limit", 50), "limit")
+    if not geo.coordenadas_validas(lat, lng):
+        raise ParametroInvalido("Coordenadas fuera de rango")
+    if not 0 < radio <= geo.MAX_RADIO_KM:
+        raise ParametroInvalido(f"'radius_km' debe estar entre 0 y {geo.MAX_RADIO_KM}")
+    if not 0 < limite <= MAX_CERCANOS:
+        raise ParametroInvalido(f"'limit' debe estar entre 1 y {MAX_CERCANOS}")
+
+    vista = Vista.desde_request(Cliente)
+    cercanos = geo.cercanos(vista.query(), lat, lng, radio, limite)
+    return jsonify({
+        "clientes": [
+            {**vista.serializar(cliente), "distancia_km": round(distancia, 3)}
+            for cliente, distancia in cercanos
+        ],
+    })
+
+@api.route("/clientes/bbox", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Cliente)
+def get_clientes_en_zona():
+    """Clientes dentro del rectángulo visible del mapa."""
+    min_lat = parse_real(request.args.get("min_lat"), "min_lat")
+    min_lng = parse_real(request.args.get("min_lng"), "min_lng")
+    max_lat = parse_real(request.args.get("max_lat"), "max_lat")
+    max_lng = parse_real(request.args.get("max_lng"), "max_lng")
+    if not (geo.coordenadas_validas(min_lat, min_lng) and geo.coordenadas_validas(max_lat, max_lng)):
+        raise ParametroInvalido("Coordenadas fuera de rango")
+    if min_lat > max_lat or min_lng > max_lng:
+        raise ParametroInvalido("Rectángulo inválido (min_* debe ser menor que max_*)")
+
+    vista = Vista.desde_request(Cliente)
+    query = vista.query().filter(geo.filtro_caja(min_lat, min_lng, max_lat, max_lng))
+    clientes, meta = LISTADO_CLIENTES.paginar(query)
+    return jsonify({"clientes": vista.serializar_lista(clientes), **meta})
+
 @api.route("/clientes", methods=["GET"])
+@jwt_required()
+# Con expand=instalaciones.mantenimientos,pendientes,presupuestos.componentes:
+# una consulta por relación expandida
+@max_queries(9)
+@con_etag(Cliente)
 def get_clientes():
-    clientes = Cliente.query.all()
-    return jsonify({"clientes": [c.to_dict() for c in clientes]})
+    vista = Vista.desde_request(Cliente)
+    clientes, meta = LISTADO_CLIENTES.paginar(vista.query())
+    return jsonify({"clientes": vista.serializar_lista(clientes), **meta})
 
 
 # ======================
@@ -285,57 +627,48 @@ def get_clientes():
 # ======================
 @api.route("/instalaciones", methods=["POST"])
 @jwt_required()
+@max_queries(6)
 def create_instalacion():
     data = request.get_json(silent=True)
 
     instalacion = Instalacion(
-        empresa_id=data["empresa_id"],
         cliente_id=data["cliente_id"],
         instalador_id=data["instalador_id"],
         tipo_sistema=data["tipo_sistema"],
-        fecha_instalacion=data["fecha_instalacion"],
+        fecha_instalacion=parse_fecha(data["fecha_instalacion"], "fecha_instalacion"),
         frecuencia_meses=data.get("frecuencia_meses", 6),
-        proximo_mantenimiento=data.get("proximo_mantenimiento"),
+        proximo_mantenimiento=(
+            parse_fecha(data["proximo_mantenimiento"], "proximo_mantenimiento")
+            if data.get("proximo_mantenimiento") else None
+        ),
     )
 
+    parcial.verificar_referencias(instalacion)
     db.session.add(instalacion)
     db.session.commit()
-    return jsonify({"instalacion": instalacion.to_dict()}), 201
+    return parcial.respuesta(instalacion, "instalacion", 201)
 
-@api.route("/instalaciones/<int:id>", methods=["PUT"])
+@api.route("/instalaciones/<int:id>", methods=["PUT", "PATCH"])
 @jwt_required()
+@max_queries(7)
 def update_instalacion(id):
-    data = request.get_json(force=True)
-    if not data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
         return jsonify({"message": "Invalid JSON"}), 400
-    
+
     instalacion = Instalacion.query.get(id)
     if not instalacion:
         return jsonify({"message": "Instalación no encontrada"}), 404
-    
-    empresa_id = data.get("empresa_id")
-    cliente_id = data.get("cliente_id")
-    instalador_id = data.get("instalador_id")
-    tipo_sistema = data.get("tipo_sistema")
-    fecha_instalacion = data.get("fecha_instalacion")
-    frecuencia_meses = data.get("frecuencia_meses")
-    proximo_mantenimiento = data.get("proximo_mantenimiento")
-
-    if empresa_id: instalacion.empresa_id = empresa_id
-    if cliente_id: instalacion.cliente_id = cliente_id
-    if instalador_id: instalacion.instalador_id = instalador_id
-    if tipo_sistema: instalacion.tipo_sistema = tipo_sistema
-    if fecha_instalacion: instalacion.fecha_instalacion = fecha_instalacion
-    if frecuencia_meses: instalacion.frecuencia_meses = frecuencia_meses
-    if proximo_mantenimiento: instalacion.proximo_mantenimiento = proximo_mantenimiento
-    
-    db.session.commit()    
-    return jsonify({"instalacion": instalacion.to_dict()}), 200
+
+    if parcial.aplicar(instalacion, data):
+        db.session.commit()
+    return parcial.respuesta(instalacion, "instalacion")
 
 @api.route("/instalaciones/<int:id>", methods=["DELETE"])
 @jwt_required()
+@max_queries(12)
 def delete_instalacion(id):
-    instalacion = Instalacion.query.get(id)
+    instalacion = Instalacion.query.options(*opciones_carga(Instalacion, CASCADE_INSTALACION)).filter_by(id=id).first()
     if not instalacion:
         return jsonify({"message": "Instalación no encontrada"}), 404
     
@@ -344,52 +677,54 @@ def delete_instalacion(id):
     return jsonify({"message": "Instalación eliminada"}), 200   
 
 @api.route("/instalaciones", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Instalacion)
 def get_instalaciones():
-    instalaciones = Instalacion.query.all()
-    return jsonify({"instalaciones": [i.to_dict() for i in instalaciones]})
+    vista = Vista.desde_request(Instalacion)
+    instalaciones, meta = LISTADO_INSTALACIONES.paginar(vista.query())
+    return jsonify({"instalaciones": vista.serializar_lista(instalaciones), **meta})
 
 # ======================
 # MANTENIMIENTOS
 # ======================
 @api.route("/mantenimientos", methods=["POST"])
 @jwt_required()
+@max_queries(9)
 def create_mantenimiento():
     data = request.get_json(silent=True)
 
     mantenimiento = Mantenimiento(
-        empresa_id=data["empresa_id"],
         instalacion_id=data["instalacion_id"],
         realizado_por=data["realizado_por"],
-        fecha=data["fecha"],
+        fecha=parse_fecha(data["fecha"], "fecha"),
         notas=data.get("notas"),
     )
 
+    parcial.verificar_referencias(mantenimiento)
     db.session.add(mantenimiento)
     db.session.commit()
-    return jsonify({"mantenimiento": mantenimiento.to_dict()}), 201
+    return parcial.respuesta(mantenimiento, "mantenimiento", 201)
 
-@api.route("/mantenimientos/<int:id>", methods=["PUT"])
+@api.route("/mantenimientos/<int:id>", methods=["PUT", "PATCH"])
 @jwt_required()
+@max_queries(6)
 def update_mantenimiento(id):
-    data = request.get_json(force=True)
-    if not data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
         return jsonify({"message": "Invalid JSON"}), 400
-    
+
     mantenimiento = Mantenimiento.query.get(id)
     if not mantenimiento:
         return jsonify({"message": "Mantenimiento no encontrado"}), 404
-    
-    mantenimiento.empresa_id = data.get("empresa_id")
-    mantenimiento.instalacion_id = data.get("instalacion_id")
-    mantenimiento.realizado_por = data.get("realizado_por")
-    mantenimiento.fecha = data.get("fecha")
-    mantenimiento.notas = data.get("notas")
-    
-    db.session.commit()    
-    return jsonify({"mantenimiento": mantenimiento.to_dict()}), 200
+
+    if parcial.aplicar(mantenimiento, data):
+        db.session.commit()
+    return parcial.respuesta(mantenimiento, "mantenimiento")
 
 @api.route("/mantenimientos/<int:id>", methods=["DELETE"])    
 @jwt_required()
+@max_queries(5)
 def delete_mantenimiento(id):
     mantenimiento = Mantenimiento.query.get(id)
     if not mantenimiento:
@@ -400,63 +735,135 @@ def delete_mantenimiento(id):
     return jsonify({"message": "Mantenimiento eliminado"}), 200   
 
 @api.route("/mantenimientos", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Mantenimiento)
 def get_mantenimientos():
-    mantenimientos = Mantenimiento.query.all()    
-    return jsonify({"mantenimientos": [m.to_dict() for m in mantenimientos]})
+    vista = Vista.desde_request(Mantenimiento)
+    mantenimientos, meta = LISTADO_MANTENIMIENTOS.paginar(vista.query())
+    return jsonify({"mantenimientos": vista.serializar_lista(mantenimientos), **meta})
+
+# ======================
+# AGENDA DE MANTENIMIENTOS
+# ======================
+@api.route("/agenda", methods=["GET"])
+@jwt_required()
+@max_queries(5)
+def get_agenda():
+    desde = request.args.get("from")
+    hasta = request.args.get("to")
+    instalador_id = request.args.get("instalador_id")
+
+    desde = parse_fecha(desde, "from") if desde else date.today()
+    hasta = parse_fecha(hasta, "to") if hasta else desde + timedelta(days=30)
+    if instalador_id:
+        instalador_id = parse_entero(instalador_id, "instalador_id")
+
+    vista = Vista.desde_request(Instalacion)
+    instalaciones = query_agenda(hasta, instalador_id).options(*vista.opciones).all()
+
+    agenda = []
+    for instalacion in instalaciones:
+        item = vista.serializar(instalacion)
+        item["vencida"] = instalacion.proximo_mantenimiento < desde
+        agenda.append(item)
+
+    return jsonify({
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "vencidas": sum(1 for item in agenda if item["vencida"]),
+        "agenda": agenda,
+    })
+
+
+# ======================
+# RUTAS DEL DIA
+# ======================
+@api.route("/rutas/planificar", methods=["POST"])
+@jwt_required()
+@max_queries(4)
+def planificar_rutas():
+    # NumPy se importa recién cuando se planifica (no en el arranque del worker)
+    from api.utils import rutas
+
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    data = request.get_json(silent=True) or {}
+    fecha = parse_fecha(data["fecha"], "fecha") if data.get("fecha") else date.today()
+    tiempo_max = parse_entero(data.get("tiempo_max_ms", rutas.TIEMPO_MAX_MS), "tiempo_max_ms")
+    if not 0 <= tiempo_max <= 5000:
+        raise ParametroInvalido("'tiempo_max_ms' debe estar entre 0 y 5000")
+
+    origen = data.get("origen")
+    if origen is not None:
+        try:
+            origen = (float(origen["lat"]), float(origen["lng"]))
+        except (KeyError, TypeError, ValueError):
+            raise ParametroInvalido("'origen' debe ser {\"lat\": ..., \"lng\": ...}")
+        if not geo.coordenadas_validas(*origen):
+            raise ParametroInvalido("'origen' fuera de rango")
+
+    ids = data.get("instaladores")
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        raise ParametroInvalido("'instaladores' debe ser una lista de ids")
+
+    tecnicos = rutas.instaladores(empresa_id, ids)
+    paradas = rutas.paradas_del_dia(empresa_id, fecha, data.get("incluir_vencidas", True))
+    plan = rutas.planificar(paradas, tecnicos, origen, tiempo_max)
+    return jsonify({"fecha": fecha.isoformat(), **plan})
+
 
 # ======================    
 # PENDIENTES
 # ======================
 @api.route("/pendientes", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Pendiente)
 def get_pendientes():
-    pendientes = Pendiente.query.all()
-    return jsonify({"pendientes": [p.to_dict() for p in pendientes]})
+    vista = Vista.desde_request(Pendiente)
+    pendientes, meta = LISTADO_PENDIENTES.paginar(vista.query())
+    return jsonify({"pendientes": vista.serializar_lista(pendientes), **meta})
 
 @api.route("/pendientes", methods=["POST"])
 @jwt_required()
+@max_queries(6)
 def create_pendiente():
     data = request.get_json(silent=True)
 
     pendiente = Pendiente(
-        empresa_id=data["empresa_id"],
         cliente_id=data["cliente_id"],
         instalacion_id=data["instalacion_id"],
-        fecha=data["fecha"],
+        fecha=parse_fecha(data["fecha"], "fecha"),
         notas=data.get("notas"),
     )
 
+    parcial.verificar_referencias(pendiente)
     db.session.add(pendiente)
     db.session.commit()
-    return jsonify({"pendiente": pendiente.to_dict()}), 201
+    return parcial.respuesta(pendiente, "pendiente", 201)
 
-@api.route("/pendientes/<int:id>", methods=["PUT"])
+@api.route("/pendientes/<int:id>", methods=["PUT", "PATCH"])
 @jwt_required()
+@max_queries(6)
 def update_pendiente(id):
-    data = request.get_json(force=True)
-    if not data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
         return jsonify({"message": "Invalid JSON"}), 400
-    
+
     pendiente = Pendiente.query.get(id)
     if not pendiente:
         return jsonify({"message": "Pendiente no encontrado"}), 404
-    
-    empresa_id = data.get("empresa_id")
-    cliente_id = data.get("cliente_id")
-    instalacion_id = data.get("instalacion_id")
-    fecha = data.get("fecha")
-    notas = data.get("notas")
-
-    if empresa_id: pendiente.empresa_id = empresa_id
-    if cliente_id: pendiente.cliente_id = cliente_id
-    if instalacion_id: pendiente.instalacion_id = instalacion_id
-    if fecha: pendiente.fecha = fecha
-    if notas: pendiente.notas = notas
-    
-    db.session.commit()    
-    return jsonify({"pendiente": pendiente.to_dict()}), 200
+
+    if parcial.aplicar(pendiente, data):
+        db.session.commit()
+    return parcial.respuesta(pendiente, "pendiente")
 
 @api.route("/pendientes/<int:id>", methods=["DELETE"])
 @jwt_required()
+@max_queries(5)
 def delete_pendiente(id):
     pendiente = Pendiente.query.get(id)
     if not pendiente:
@@ -472,11 +879,12 @@ def delete_pendiente(id):
 
 @api.route("/presupuestos", methods=["POST"])
 @jwt_required()
+@max_queries(9)
 def create_presupuesto():
     data = request.get_json(silent=True)
+    lineas = validar_lineas(data.get("componentes", []))
 
     presupuesto = Presupuesto(
-        empresa_id=data["empresa_id"],
         cliente_id=data.get("cliente_id"),
         cliente_nombre=data.get("cliente_nombre"),
         cliente_telefono=data.get("cliente_telefono"),
@@ -484,57 +892,40 @@ def create_presupuesto():
         cliente_email=data.get("cliente_email"),
         tipo_sistema=data["tipo_sistema"],
         descripcion=data["descripcion"],
-        total=data["total"],
         estado="pendiente",
         creado_por=data["creado_por"],
+        # El total sale de los componentes, no del cliente
+        total=total_lineas(lineas),
     )
 
+    parcial.verificar_referencias(presupuesto)
     db.session.add(presupuesto)
+    if lineas:
+        insertar_lineas(presupuesto, lineas)
     db.session.commit()
-    return jsonify({"presupuesto": presupuesto.to_dict()}), 201
+    return parcial.respuesta(presupuesto, "presupuesto", 201)
 
-@api.route("/presupuestos/<int:id>", methods=["PUT"])
+@api.route("/presupuestos/<int:id>", methods=["PUT", "PATCH"])
 @jwt_required()
+@max_queries(6)
 def update_presupuesto(id):
-    data = request.get_json(force=True)
-    if not data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
         return jsonify({"message": "Invalid JSON"}), 400
-    
+
     presupuesto = Presupuesto.query.get(id)
     if not presupuesto:
         return jsonify({"message": "Presupuesto no encontrado"}), 404
-    
-    empresa_id = data.get("empresa_id")
-    cliente_id = data.get("cliente_id")
-    cliente_nombre = data.get("cliente_nombre")
-    cliente_telefono = data.get("cliente_telefono")
-    cliente_direccion = data.get("cliente_direccion")
-    cliente_email = data.get("cliente_email")
-    tipo_sistema = data["tipo_sistema"]
-    descripcion = data["descripcion"]
-    total = data["total"]
-    estado = data.get("estado")
-    creado_por = data.get("creado_por")
-
-    if empresa_id: presupuesto.empresa_id = empresa_id
-    if cliente_id: presupuesto.cliente_id = cliente_id
-    if cliente_nombre: presupuesto.cliente_nombre = cliente_nombre
-    if cliente_telefono: presupuesto.cliente_telefono = cliente_telefono
-    if cliente_direccion: presupuesto.cliente_direccion = cliente_direccion
-    if cliente_email: presupuesto.cliente_email = cliente_email
-    if tipo_sistema: presupuesto.tipo_sistema = tipo_sistema
-    if descripcion: presupuesto.descripcion = descripcion
-    if total: presupuesto.total = total
-    if estado: presupuesto.estado = estado
-    if creado_por: presupuesto.creado_por = creado_por
-    
-    db.session.commit()    
-    return jsonify({"presupuesto": presupuesto.to_dict()}), 200
+
+    if parcial.aplicar(presupuesto, data):
+        db.session.commit()
+    return parcial.respuesta(presupuesto, "presupuesto")
 
 @api.route("/presupuestos/<int:id>", methods=["DELETE"])
 @jwt_required()
+@max_queries(7)
 def delete_presupuesto(id):
-    presupuesto = Presupuesto.query.get(id)
+    presupuesto = Presupuesto.query.options(*opciones_carga(Presupuesto, CASCADE_PRESUPUESTO)).filter_by(id=id).first()
     if not presupuesto:
         return jsonify({"message": "Presupuesto no encontrado"}), 404
     
@@ -543,57 +934,94 @@ def delete_presupuesto(id):
     return jsonify({"message": "Presupuesto eliminado"}), 200   
 
 @api.route("/presupuestos", methods=["GET"])
+@jwt_required()
+@max_queries(8)
+@con_etag(Presupuesto)
 def get_presupuestos():
-    presupuestos = Presupuesto.query.all()
-    return jsonify({"presupuestos": [p.to_dict() for p in presupuestos]})
+    vista = Vista.desde_request(Presupuesto)
+    presupuestos, meta = LISTADO_PRESUPUESTOS.paginar(vista.query())
+    return jsonify({"presupuestos": vista.serializar_lista(presupuestos), **meta})
 
 @api.route("/presupuestos/<int:id>", methods=["GET"])
+@jwt_required()
+@max_queries(5)
+@con_etag(Presupuesto, default_expand="componentes")
 def get_presupuesto_detalle(id):
-    presupuesto = Presupuesto.query.get(id)
+    vista = Vista.desde_request(Presupuesto, default_expand="componentes")
+    presupuesto = vista.query().filter_by(id=id).first()
     if not presupuesto:
         return jsonify({"message": "Presupuesto no encontrado"}), 404
-    
-    return jsonify({"presupuesto": presupuesto.to_dict()})
+
+    return jsonify({"presupuesto": vista.serializar(presupuesto)})
 
 # ======================
 # COMPONENTES
 # ======================
+@api.route("/presupuestos/<int:id>/componentes", methods=["PUT"])
+@jwt_required()
+@max_queries(10)
+def reemplazar_componentes_presupuesto(id):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or "componentes" not in data:
+        return jsonify({"message": "Se espera {\"componentes\": [...]}"}), 400
+
+    resultado = reemplazar_componentes(id, validar_lineas(data["componentes"]))
+    if resultado is None:
+        return jsonify({"message": "Presupuesto no encontrado"}), 404
+
+    presupuesto, componentes = resultado
+    return jsonify({"presupuesto": presupuesto, "componentes": componentes}), 200
+
 @api.route("/componentes", methods=["POST"])
 @jwt_required()
+@max_queries(7)
 def create_componente():
     data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"message": "Invalid JSON"}), 400
+
+    linea = validar_lineas([data])[0]
+    if not Presupuesto.query.filter_by(id=data.get("presupuesto_id")).first():
+        return jsonify({"message": "Presupuesto no encontrado"}), 404
 
     componente = Componente(
         presupuesto_id=data["presupuesto_id"],
-        nombre=data["nombre"],
-        cantidad=data["cantidad"],
-        precio=data["precio"],
+        nombre=linea["nombre"],
+        cantidad=linea["cantidad"],
+        precio=linea["precio"],
     )
 
     db.session.add(componente)
     db.session.commit()
-    return jsonify({"componente": componente.to_dict()}), 201
+    return parcial.respuesta(componente, "componente", 201)
 
-@api.route("/componentes/<int:id>", methods=["PUT"])    
+@api.route("/componentes/<int:id>", methods=["PUT", "PATCH"])
 @jwt_required()
+@max_queries(7)
 def update_componente(id):
-    data = request.get_json(force=True)
-    if not data:
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
         return jsonify({"message": "Invalid JSON"}), 400
     
     componente = Componente.query.get(id)
     if not componente:
         return jsonify({"message": "Componente no encontrado"}), 404
     
-    componente.nombre = data.get("nombre")
-    componente.cantidad = data.get("cantidad")
-    componente.precio = data.get("precio")
-    
-    db.session.commit()    
-    return jsonify({"componente": componente.to_dict()}), 200
+    linea = validar_lineas([{
+        "nombre": data.get("nombre", componente.nombre),
+        "cantidad": data.get("cantidad", componente.cantidad),
+        "precio": data.get("precio", componente.precio),
+    }])[0]
+    cambios = {campo: linea[campo] for campo in ("nombre", "cantidad", "precio") if linea[campo] != getattr(componente, campo)}
+    if cambios:
+        for campo, valor in cambios.items():
+            setattr(componente, campo, valor)
+        db.session.commit()
+    return parcial.respuesta(componente, "componente")
 
 @api.route("/componentes/<int:id>", methods=["DELETE"])
 @jwt_required()
+@max_queries(6)
 def delete_componente(id):
     componente = Componente.query.get(id)
     if not componente:
@@ -604,9 +1032,112 @@ def delete_componente(id):
     return jsonify({"message": "Componente eliminado"}), 200   
 
 @api.route("/componentes", methods=["GET"])
+@jwt_required()
+@max_queries(3)
+@con_etag(Componente)
 def get_componentes():
-    componentes = Componente.query.all()
-    return jsonify({"componentes": [c.to_dict() for c in componentes]})
+    componentes, meta = LISTADO_COMPONENTES.paginar()
+    return jsonify({"componentes": [c.to_dict() for c in componentes], **meta})
+
+
+# ======================
+# IMPORTACION MASIVA
+# ======================
+# Sin @max_queries: hace un número fijo de queries por chunk de filas
+@api.route("/import/<entidad>", methods=["POST"])
+@jwt_required()
+def importar_entidad(entidad):
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    filas = leer_filas(request.stream, request.content_type or "")
+    resultado = importar(entidad, filas, empresa_id)
+    return jsonify(resultado), 200
+
+
+# ======================
+# SINCRONIZACION OFFLINE (lote de operaciones y feed de cambios)
+# ======================
+@api.route("/batch", methods=["POST"])
+@jwt_required()
+# Acotado por las entidades que toca el lote, no por la cantidad de operaciones
+# (en Postgres los INSERT de una tabla van en un statement; SQLite los hace de a uno)
+@max_queries(40)
+def batch():
+    """
+    {"operaciones": [{"op": "create", "entidad": "clientes", "tmp_id": "c1", "datos": {...}},
+                     {"op": "create", "entidad": "pendientes", "datos": {"cliente_id": "$c1", ...}},
+                     {"op": "update", "entidad": "clientes", "id": 7, "datos": {...}},
+                     {"op": "delete", "entidad": "mantenimientos", "id": 9}]}
+
+    Todo o nada: una sola transacción y un solo commit.
+    """
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    data = request.get_json(silent=True) or {}
+    cascadas = {Cliente: CASCADE_CLIENTE, Instalacion: CASCADE_INSTALACION}
+    try:
+        resultado = lote.ejecutar(data.get("operaciones"), empresa_id, cascadas)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        return jsonify({"message": "El lote viola una restricción de la base: no se aplicó ninguna operación",
+                        "detalle": str(e.orig)}), 409
+    return jsonify(resultado), 200
+
+
+@api.route("/cambios", methods=["GET"])
+@jwt_required()
+@max_queries(10)
+def listar_cambios():
+    """
+    Feed incremental: ?since=<cursor de la respuesta anterior>&limit=500
+
+    Sin 'since' devuelve todo el tenant (sincronización inicial, paginada).
+    El cliente aplica 'cambios' (upsert por id) y después 'borrados', guarda
+    'cursor' y repite mientras 'hay_mas'. Las filas de los últimos segundos
+    pueden repetirse entre sincronizaciones.
+    """
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    limite = parse_entero(request.args.get("limit", cambios.LIMITE_DEFAULT), "limit")
+    if not 0 < limite <= cambios.MAX_LIMITE:
+        raise ParametroInvalido(f"'limit' debe estar entre 1 y {cambios.MAX_LIMITE}")
+
+    resultado = cambios.consultar(
+        empresa_id,
+        request.args.get("since"),
+        limite,
+        margen_segundos=current_app.config["CAMBIOS_MARGEN_SEGUNDOS"],
+        retencion_dias=current_app.config["CAMBIOS_RETENCION_DIAS"],
+    )
+    return jsonify(resultado), 200
+
+
+# ======================
+# EXPORTACION (streaming)
+# ======================
+@api.route("/export/<entidad>.<formato>", methods=["GET"])
+@jwt_required()
+def exportar_entidad(entidad, formato):
+    if entidad not in exportador.ENTIDADES or formato not in exportador.FORMATOS:
+        return jsonify({"message": "Exportación no soportada"}), 404
+
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return jsonify({"message": "Usuario sin empresa"}), 403
+
+    filas = exportador.exportar(entidad, formato, empresa_id)
+    return Response(
+        stream_with_context(filas),
+        mimetype=exportador.FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename={entidad}.{formato}"},
+    )
 
 
 # ======================
@@ -615,6 +1146,7 @@ def get_componentes():
 
 @api.route("/usuarios/<int:id>/password", methods=["PUT"])
 @jwt_required()
+@max_queries(4)
 def change_password(id):
     data = request.get_json(force=True)
 
@@ -629,10 +1161,11 @@ def change_password(id):
         return jsonify({"message": "Usuario no encontrado"}), 404
 
     # Verificar contraseña actual
-    if not check_password_hash(usuario.password, current_password):
+    ok, _ = verificar(usuario.password, current_password)
+    if not ok:
         return jsonify({"message": "Contraseña actual incorrecta"}), 401
 
-    usuario.password = generate_password_hash(new_password)
+    usuario.password = hashear(new_password)
     db.session.commit()
 
     return jsonify({"message": "Contraseña actualizada correctamente"}), 200
\ No newline at end of file
@@ -0,0 +1,143 @@
+import calendar
+from datetime import date
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+from api.models import db, Instalacion, Mantenimiento
+from api.utils import versiones
+
+
+FRECUENCIA_DEFAULT = 6
+
+
+def _como_fecha(valor):
+    # Las rutas reciben las fechas como "YYYY-MM-DD"
+    if isinstance(valor, str):
+        return date.fromisoformat(valor)
+    return valor
+
+
+def sumar_meses(fecha, meses):
+    """Suma meses de calendario (31/01 + 1 mes = 28/02 o 29/02)."""
+    mes = fecha.month - 1 + meses
+    anio = fecha.year + mes // 12
+    mes = mes % 12 + 1
+    dia = min(fecha.day, calendar.monthrange(anio, mes)[1])
+    return date(anio, mes, dia)
+
+
+def _frecuencia(instalacion):
+    return instalacion.frecuencia_meses or FRECUENCIA_DEFAULT
+
+
+# =========================
+# RECALCULO INCREMENTAL
+# =========================
+def _ultimo_mantenimiento(session, instalacion_id):
+    # Index-only con idx_mantenimiento_instalacion_fecha
+    return session.execute(
+        select(func.max(Mantenimiento.fecha)).where(Mantenimiento.instalacion_id == instalacion_id)
+    ).scalar()
+
+
+def _recalcular(session, flush_context, instances):
+    with session.no_autoflush:
+        # Instalación nueva sin fecha de próximo mantenimiento
+        for obj in session.new:
+            if isinstance(obj, Instalacion) and obj.proximo_mantenimiento is None and obj.fecha_instalacion:
+                obj.proximo_mantenimiento = sumar_meses(_como_fecha(obj.fecha_instalacion), _frecuencia(obj))
+
+        # Cambio de frecuencia: se recalcula desde el último mantenimiento, salvo
+        # que el mismo cambio fije la fecha del próximo a mano
+        for obj in session.dirty:
+            if not isinstance(obj, Instalacion) or obj.id is None:
+                continue
+            attrs = db.inspect(obj).attrs
+            if not attrs.frecuencia_meses.history.has_changes():
+                continue
+            if attrs.proximo_mantenimiento.history.has_changes():
+                continue
+            base = _ultimo_mantenimiento(session, obj.id) or _como_fecha(obj.fecha_instalacion)
+            obj.proximo_mantenimiento = sumar_meses(_como_fecha(base), _frecuencia(obj))
+
+        # Mantenimiento nuevo: el próximo se corre si queda más adelante
+        for obj in session.new:
+            if not isinstance(obj, Mantenimiento) or not obj.fecha:
+                continue
+            instalacion = obj.instalacion or session.get(Instalacion, obj.instalacion_id)
+            if instalacion is None:
+                continue
+            candidato = sumar_meses(_como_fecha(obj.fecha), _frecuencia(instalacion))
+            actual = _como_fecha(instalacion.proximo_mantenimiento)
+            if actual is None or candidato > actual:
+                instalacion.proximo_mantenimiento = candidato
+
+
+def init_agenda(app):
+    if not event.contains(Session, "before_flush", _recalcular):
+        event.listen(Session, "before_flush", _recalcular)
+
+
+# =========================
+# RECALCULO MASIVO
+# =========================
+def _proximo_sql(dialecto):
+    ultimo = (
+        select(func.max(Mantenimiento.fecha))
+        .where(Mantenimiento.instalacion_id == Instalacion.id)
+        .scalar_subquery()
+    )
+    base = func.coalesce(ultimo, Instalacion.fecha_instalacion)
+    meses = func.coalesce(Instalacion.frecuencia_meses, FRECUENCIA_DEFAULT)
+
+    if dialecto == "postgresql":
+        return db.cast(base + func.make_interval(0, meses), db.Date)
+    # SQLite (desarrollo local): el desborde de fin de mes difiere de sumar_meses
+    return func.date(base, "+" + db.cast(meses, db.String) + " months")
+
+
+def recalcular_todo(empresa_id=None, ids=None):
+    """
+    Recalcula proximo_mantenimiento de todas las instalaciones (o solo de
+    las de ids) con un único UPDATE (subconsulta correlacionada sobre el
+    último mantenimiento). Devuelve la cantidad de filas actualizadas.
+    """
+    dialecto = db.session.get_bind().dialect.name
+    proximo = _proximo_sql(dialecto)
+    # Solo las que cambian: el resto conserva su updated_at (feed de /cambios)
+    stmt = update(Instalacion).values(proximo_mantenimiento=proximo).where(
+        Instalacion.proximo_mantenimiento.is_distinct_from(proximo)
+    )
+    if empresa_id is not None:
+        stmt = stmt.where(Instalacion.empresa_id == empresa_id)
+    if ids is not None:
+        stmt = stmt.where(Instalacion.id.in_(ids))
+
+    resultado = db.session.execute(stmt.execution_options(synchronize_session=False, sin_tenant=True))
+
+    if empresa_id is not None:
+        empresas = [empresa_id]
+    else:
+        empresas = db.session.execute(
+            select(Instalacion.empresa_id).distinct().execution_options(sin_tenant=True)
+        ).scalars()
+    for empresa in empresas:
+        versiones.bump(empresa, Instalacion.__tablename__)
+
+    db.session.commit()
+    return resultado.rowcount
+
+
+# =========================
+# CONSULTA DE AGENDA
+# =========================
+def query_agenda(hasta, instalador_id=None):
+    """Instalaciones activas con mantenimiento vencido o previsto hasta 'hasta'."""
+    query = Instalacion.query.filter(
+        Instalacion.activa.is_(True),
+        Instalacion.proximo_mantenimiento <= hasta,
+    )
+    if instalador_id is not None:
+        query = query.filter(Instalacion.instalador_id == instalador_id)
+    return query.order_by(Instalacion.proximo_mantenimiento, Instalacion.id)
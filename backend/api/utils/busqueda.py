@@ -0,0 +1,216 @@
+import re
+from functools import reduce
+
+from sqlalchemy import event, func, literal, literal_column, or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from api.models import db, Cliente, Mantenimiento, Pendiente, Presupuesto
+
+
+LIMITE_DEFAULT = 10
+MAX_LIMITE = 50
+MAX_TERMINOS = 8
+# Similitud mínima (0-1) para aceptar una coincidencia aproximada
+SIMILITUD_MINIMA = 0.4
+
+# Columnas de texto buscables por entidad. El orden importa: en Postgres la
+# expresión tiene que coincidir con la de los índices de la migración.
+ENTIDADES = {
+    "clientes": (Cliente, ("nombre", "telefono", "email", "direccion", "observaciones")),
+    "presupuestos": (Presupuesto, ("descripcion", "cliente_nombre", "cliente_telefono", "cliente_direccion", "tipo_sistema")),
+    "mantenimientos": (Mantenimiento, ("notas",)),
+    "pendientes": (Pendiente, ("notas",)),
+}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class IndiceNoCreado(RuntimeError):
+    """SQLite sin la tabla FTS5 de búsqueda (se responde con 503)."""
+
+
+def _escapar_like(valor):
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def terminos(q):
+    return [t.lower() for t in _TOKEN.findall(q or "")][:MAX_TERMINOS]
+
+
+def _texto(model, columnas):
+    # coalesce(a, '') || ' ' || coalesce(b, '') ... (inmutable: se puede indexar)
+    partes = [func.coalesce(getattr(model, c), literal_column("''")) for c in columnas]
+    return reduce(lambda a, b: a.op("||")(literal_column("' '")).op("||")(b), partes)
+
+
+# =========================
+# POSTGRES: tsvector + pg_trgm
+# =========================
+def _buscar_postgres(tipo, q, tokens, empresa_id, limite):
+    model, columnas = ENTIDADES[tipo]
+    texto = _texto(model, columnas)
+    documento = func.to_tsvector(literal_column("'simple'"), texto)
+    # Prefijo de cada término: "gonz rod" -> gonz:* & rod:*
+    consulta = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{t}:*" for t in tokens))
+    similitud = func.word_similarity(q, texto)
+    puntaje = func.greatest(func.ts_rank(documento, consulta), similitud).label("puntaje")
+
+    stmt = (
+        select(model, puntaje)
+        .where(
+            model.empresa_id == empresa_id,
+            or_(
+                documento.op("@@")(consulta),
+                # Tolerancia a errores de tipeo y coincidencias parciales (teléfonos, calles)
+                literal(q).op("<%")(texto),
+                texto.ilike(f"%{_escapar_like(q)}%", escape="\\"),
+            ),
+        )
+        .order_by(puntaje.desc(), model.id)
+        .limit(limite)
+    )
+    return [(obj, float(p)) for obj, p in db.session.execute(stmt)]
+
+
+# =========================
+# SQLITE: FTS5 (desarrollo y tests)
+# =========================
+# La tabla FTS5 y los triggers que la mantienen al día son parte del esquema:
+# los crean la migración c2e7a9f4b816, db.create_all() o `flask crear-busqueda`,
+# nunca un request.
+def _sql_texto(prefijo, columnas):
+    return " || ' ' || ".join(f"coalesce({prefijo}.{c}, '')" for c in columnas)
+
+
+def _existe_fts(conn):
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busqueda_fts'")
+    ).first() is not None
+
+
+def crear_fts(conn):
+    """
+    Crea la tabla FTS5 (tokenizer trigram) y sus triggers, y la llena desde
+    las tablas base. No hace nada si ya existe. Devuelve True si la creó.
+    """
+    if _existe_fts(conn):
+        return False
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE busqueda_fts USING fts5("
+        "entidad UNINDEXED, ref_id UNINDEXED, empresa_id UNINDEXED, texto, "
+        "tokenize = 'trigram case_sensitive 0')"
+    ))
+    for tipo, (model, columnas) in ENTIDADES.items():
+        tabla = model.__tablename__
+        conn.execute(text(
+            f"INSERT INTO busqueda_fts (entidad, ref_id, empresa_id, texto) "
+            f"SELECT '{tipo}', t.id, t.empresa_id, {_sql_texto('t', columnas)} FROM {tabla} t"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_ai AFTER INSERT ON {tabla} BEGIN "
+            f"INSERT INTO busqueda_fts (entidad, ref_id, empresa_id, texto) "
+            f"VALUES ('{tipo}', new.id, new.empresa_id, {_sql_texto('new', columnas)}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_ad AFTER DELETE ON {tabla} BEGIN "
+            f"DELETE FROM busqueda_fts WHERE entidad = '{tipo}' AND ref_id = old.id; END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_au AFTER UPDATE ON {tabla} BEGIN "
+            f"DELETE FROM busqueda_fts WHERE entidad = '{tipo}' AND ref_id = old.id; "
+            f"INSERT INTO busqueda_fts (entidad, ref_id, empresa_id, texto) "
+            f"VALUES ('{tipo}', new.id, new.empresa_id, {_sql_texto('new', columnas)}); END"
+        ))
+    return True
+
+
+def _despues_create_all(metadata, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        crear_fts(connection)
+
+
+def init_busqueda(app):
+    # Las bases de desarrollo y tests armadas con create_all() también la tienen
+    if not event.contains(db.metadata, "after_create", _despues_create_all):
+        event.listen(db.metadata, "after_create", _despues_create_all)
+
+
+def _trigramas(palabra):
+    return {palabra[i:i + 3] for i in range(len(palabra) - 2)}
+
+
+def _similitud(tokens, texto):
+    """Aproximación de word_similarity de pg_trgm: trigramas de la consulta presentes en el texto."""
+    texto = texto.lower()
+    buscados = set().union(*(_trigramas(f"  {t} ") for t in tokens))
+    presentes = set().union(*(_trigramas(f"  {p} ") for p in _TOKEN.findall(texto))) if texto else set()
+    similitud = len(buscados & presentes) / len(buscados) if buscados else 0.0
+    # Un término que es prefijo de una palabra cuenta como coincidencia completa
+    palabras = _TOKEN.findall(texto)
+    if all(any(p.startswith(t) for p in palabras) or t in texto for t in tokens):
+        similitud = max(similitud, 1.0)
+    return similitud
+
+
+def _buscar_sqlite(tipos, q, tokens, empresa_id, limite):
+    conn = db.session.connection()
+
+    largos = [t for t in tokens if len(t) >= 3]
+    parametros = {"empresa_id": empresa_id}
+    filtro_tipos = ", ".join(f"'{t}'" for t in tipos)
+    if largos:
+        # OR de trigramas: tolera letras cambiadas; bm25 ordena por coincidencias
+        trigramas = sorted(set().union(*(_trigramas(t) for t in largos)))
+        parametros["consulta"] = " OR ".join('"' + g.replace('"', '""') + '"' for g in trigramas)
+        condicion = "busqueda_fts MATCH :consulta"
+        orden = "bm25(busqueda_fts)"
+    else:
+        parametros["like"] = f"%{_escapar_like(q)}%"
+        condicion = "texto LIKE :like ESCAPE '\\'"
+        orden = "ref_id"
+
+    try:
+        filas = conn.execute(
+            text(
+                f"SELECT entidad, ref_id, texto FROM busqueda_fts "
+                f"WHERE {condicion} AND empresa_id = :empresa_id AND entidad IN ({filtro_tipos}) "
+                f"ORDER BY {orden} LIMIT :candidatos"
+            ),
+            {**parametros, "candidatos": limite * len(tipos) * 10},
+        ).all()
+    except OperationalError as e:
+        if "busqueda_fts" not in str(e.orig):
+            raise
+        raise IndiceNoCreado("Índice de búsqueda no creado: ejecutar 'flask db upgrade' o 'flask crear-busqueda'")
+
+    puntajes = {tipo: {} for tipo in tipos}
+    for entidad, ref_id, contenido in filas:
+        similitud = _similitud(tokens, contenido)
+        if similitud >= SIMILITUD_MINIMA:
+            puntajes[entidad][int(ref_id)] = similitud
+
+    resultados = {}
+    for tipo in tipos:
+        mejores = sorted(puntajes[tipo].items(), key=lambda par: (-par[1], par[0]))[:limite]
+        if not mejores:
+            resultados[tipo] = []
+            continue
+        model = ENTIDADES[tipo][0]
+        objetos = {o.id: o for o in model.query.filter(model.id.in_([id for id, _ in mejores]))}
+        resultados[tipo] = [(objetos[id], p) for id, p in mejores if id in objetos]
+    return resultados
+
+
+# =========================
+# BUSQUEDA
+# =========================
+def buscar(q, empresa_id, tipos=None, limite=LIMITE_DEFAULT):
+    """{tipo: [(objeto, puntaje)]} ordenado por relevancia, solo del tenant."""
+    tipos = list(tipos or ENTIDADES)
+    tokens = terminos(q)
+    if not tokens:
+        return {tipo: [] for tipo in tipos}
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        return {tipo: _buscar_postgres(tipo, q.strip(), tokens, empresa_id, limite) for tipo in tipos}
+    return _buscar_sqlite(tipos, q.strip(), tokens, empresa_id, limite)
@@ -0,0 +1,202 @@
+import logging
+import select as _select
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from api.models import db
+
+
+logger = logging.getLogger(__name__)
+
+CANAL = "cache_invalidacion"
+
+
+class CacheLRU:
+    """
+    Cache en memoria del proceso, acotada (LRU) y con vencimiento (TTL).
+    Las claves son (empresa_id, nombre, ...) y cada entrada declara de qué
+    entidades depende para poder invalidarla cuando éstas cambian.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._dependencias = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expiradas = self.invalidaciones = 0
+        # Publicar invalidaciones para otros workers (LISTEN/NOTIFY en Postgres)
+        self.notificar = False
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            valor, vence = entrada
+            if vence < time.monotonic():
+                self._quitar(clave)
+                self.expiradas += 1
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def set(self, clave, valor, entidades, ttl=None):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + (ttl or self.ttl))
+            self._datos.move_to_end(clave)
+            self._dependencias[clave] = frozenset(entidades)
+            while len(self._datos) > self.maxsize:
+                viejo, _ = self._datos.popitem(last=False)
+                self._dependencias.pop(viejo, None)
+                self.evictions += 1
+
+    def _quitar(self, clave):
+        self._datos.pop(clave, None)
+        self._dependencias.pop(clave, None)
+
+    def descartar(self, clave):
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+                self.invalidaciones += 1
+
+    def invalidar(self, empresa_id, entidad):
+        with self._lock:
+            claves = [
+                clave for clave, entidades in self._dependencias.items()
+                if clave[0] == empresa_id and entidad in entidades
+            ]
+            for clave in claves:
+                self._quitar(clave)
+            self.invalidaciones += len(claves)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._dependencias.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._datos),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "evictions": self.evictions,
+                "expiradas": self.expiradas,
+                "invalidaciones": self.invalidaciones,
+            }
+
+
+cache = CacheLRU()
+
+
+def cacheado(clave, entidades, cargar, ttl=None):
+    """Devuelve el valor cacheado o lo calcula con cargar() y lo guarda."""
+    valor = cache.get(clave)
+    if valor is None:
+        valor = cargar()
+        cache.set(clave, valor, entidades, ttl)
+    return valor
+
+
+# =========================
+# INVALIDACION
+# =========================
+# Otras caches del proceso que se invalidan por el mismo canal: los mensajes
+# "<prefijo>:<clave>" van a su manejador en vez de a cache.invalidar
+_suscriptores = {}
+
+
+def suscribir(prefijo, invalidar, limpiar):
+    """invalidar(clave) al recibir "<prefijo>:<clave>"; limpiar() si se cae el LISTEN."""
+    _suscriptores[prefijo] = (invalidar, limpiar)
+
+
+def publicar(mensajes):
+    """Publica mensajes de invalidación para los otros workers (si LISTEN/NOTIFY está activo)."""
+    if not cache.notificar or not mensajes:
+        return
+    # Conexión aparte: en after_commit la transacción de la sesión ya cerró
+    payloads = [{"canal": CANAL, "payload": mensaje} for mensaje in mensajes]
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text("SELECT pg_notify(:canal, :payload)"), payloads)
+    except Exception:
+        logger.exception("No se pudo notificar la invalidación de cache")
+
+
+def _recibir(payload):
+    prefijo, clave = payload.split(":", 1)
+    if prefijo in _suscriptores:
+        _suscriptores[prefijo][0](clave)
+    else:
+        cache.invalidar(int(prefijo), clave)
+
+
+def _limpiar_todo():
+    cache.limpiar()
+    for _, limpiar in _suscriptores.values():
+        limpiar()
+
+
+def _despues_commit(session):
+    cambios = session.info.pop("cambios", None)
+    if not cambios:
+        return
+    for empresa_id, entidad in cambios:
+        cache.invalidar(empresa_id, entidad)
+    publicar([f"{empresa_id}:{entidad}" for empresa_id, entidad in cambios])
+
+
+def _despues_rollback(session):
+    session.info.pop("cambios", None)
+
+
+def _escuchar(app):
+    """Thread con una conexión dedicada en LISTEN: invalida lo que cambió en otros workers."""
+    while True:
+        try:
+            with app.app_context():
+                raw = db.engine.raw_connection()
+            try:
+                raw.driver_connection.autocommit = True
+                cursor = raw.cursor()
+                cursor.execute(f"LISTEN {CANAL}")
+                pg = raw.driver_connection
+                while True:
+                    if _select.select([pg], [], [], 60) == ([], [], []):
+                        continue
+                    pg.poll()
+                    while pg.notifies:
+                        _recibir(pg.notifies.pop(0).payload)
+            finally:
+                raw.invalidate()
+        except Exception:
+            logger.exception("LISTEN de invalidación de cache caído; se reintenta")
+            _limpiar_todo()
+            time.sleep(5)
+
+
+def init_cache(app):
+    cache.maxsize = app.config.get("CACHE_MAXSIZE", cache.maxsize)
+    cache.ttl = app.config.get("CACHE_TTL", cache.ttl)
+
+    if not event.contains(Session, "after_commit", _despues_commit):
+        event.listen(Session, "after_commit", _despues_commit)
+        event.listen(Session, "after_rollback", _despues_rollback)
+
+    if app.config.get("CACHE_LISTEN_NOTIFY"):
+        cache.notificar = True
+        threading.Thread(target=_escuchar, args=(app,), name="cache-listen", daemon=True).start()
@@ -0,0 +1,187 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, insert, literal, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from api.models import db, Borrado, Cliente, Componente, Empresa, Instalacion, Mantenimiento, Pendiente, Presupuesto
+from api.utils.serializacion import opciones_carga
+
+
+# Entidades del feed y relaciones que viajan con cada fila
+ENTIDADES = {
+    "clientes": (Cliente, {}),
+    "instalaciones": (Instalacion, {}),
+    "mantenimientos": (Mantenimiento, {}),
+    "pendientes": (Pendiente, {}),
+    # Los componentes van dentro del presupuesto: cambiarlos toca su updated_at
+    "presupuestos": (Presupuesto, {"componentes": {}}),
+}
+MODELOS = tuple(model for model, _ in ENTIDADES.values())
+BORRADOS = "borrados"
+
+LIMITE_DEFAULT = 500
+MAX_LIMITE = 2000
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class CursorVencido(ValueError):
+    """El cursor es anterior a la retención de los borrados: hay que resincronizar de cero."""
+
+
+# =========================
+# REGISTRO (hooks del ORM)
+# =========================
+def _registrar(session, flush_context):
+    # Lo que cae en cascada al borrar una empresa no tiene a quién avisarle
+    empresas = {e.id for e in session.deleted if isinstance(e, Empresa)}
+    borrados = [
+        {"empresa_id": obj.empresa_id, "entidad": obj.__tablename__, "entidad_id": obj.id}
+        for obj in session.deleted
+        if isinstance(obj, MODELOS) and obj.empresa_id not in empresas
+    ]
+    if borrados:
+        session.connection().execute(insert(Borrado), borrados)
+
+    # Un cambio de componente que no mueve el total no ensucia el presupuesto:
+    # se toca su updated_at (salvo que el flush ya lo haya escrito)
+    presupuestos = {
+        p.id for p in session.new | session.dirty | session.deleted
+        if isinstance(p, Presupuesto) and (p not in session.dirty or session.is_modified(p))
+    }
+    presupuestos |= session.info.get("presupuestos_actualizados", set())
+    tocados = set()
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Componente) and obj.presupuesto_id not in presupuestos:
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            tocados.add(obj.presupuesto_id)
+    tocados.discard(None)
+    if tocados:
+        session.connection().execute(
+            update(Presupuesto).where(Presupuesto.id.in_(tocados)).values(updated_at=func.now())
+        )
+
+
+def purgar_borrados(dias):
+    """Borra los tombstones más viejos que la retención. Devuelve la cantidad."""
+    limite = ahora_db() - timedelta(days=dias)
+    resultado = db.session.execute(delete(Borrado).where(Borrado.borrado_at < limite))
+    db.session.commit()
+    return resultado.rowcount
+
+
+def init_cambios(app):
+    if not event.contains(Session, "after_flush", _registrar):
+        event.listen(Session, "after_flush", _registrar)
+
+
+# =========================
+# CURSOR
+# =========================
+def codificar_cursor(posiciones):
+    datos = {clave: [ts.isoformat(), id] for clave, (ts, id) in posiciones.items()}
+    return base64.urlsafe_b64encode(json.dumps(datos, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(valor):
+    """Cursor opaco -> {entidad | "borrados": (updated_at, id)}."""
+    if not valor:
+        return {}
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(valor + "=" * (-len(valor) % 4)))
+        posiciones = {}
+        for clave, (ts, id) in datos.items():
+            if clave not in ENTIDADES and clave != BORRADOS or not isinstance(id, int):
+                raise ValueError(clave)
+            posiciones[clave] = (datetime.fromisoformat(ts), id)
+        return posiciones
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, AttributeError):
+        raise CursorInvalido("Cursor inválido")
+
+
+# =========================
+# FEED
+# =========================
+def reloj_db():
+    # Mismo reloj que los default=func.now() de las columnas (timestamp sin zona)
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.localtimestamp()
+    return func.now()
+
+
+def ahora_db():
+    return db.session.execute(select(reloj_db())).scalar()
+
+
+def _desde(columna, id_columna, posicion):
+    ts, id = posicion
+    if db.session.get_bind().dialect.name == "sqlite":
+        # SQLite guarda CURRENT_TIMESTAMP como texto sin microsegundos: el
+        # parámetro tiene que tener el mismo formato para comparar bien
+        ts = literal(ts.isoformat(sep=" "), db.String)
+    return tuple_(columna, id_columna) > tuple_(ts, id)
+
+
+def _pagina(query, columna, id_columna, posicion, limite):
+    if posicion is not None:
+        query = query.where(_desde(columna, id_columna, posicion))
+    filas = db.session.scalars(query.order_by(columna, id_columna).limit(limite + 1)).all()
+    return filas[:limite], len(filas) > limite
+
+
+def _siguiente(posicion, ultima, completa, corte):
+    """
+    Página completa: se sigue desde la última fila. Última página: el cursor
+    avanza hasta el corte (ahora - margen) aunque no haya filas, para que una
+    transacción más lenta que haya escrito con un timestamp anterior al commit
+    se vea en la próxima sincronización.
+    """
+    if completa:
+        return ultima
+    candidatos = [p for p in (posicion, (corte, 0)) if p is not None]
+    return max(candidatos)
+
+
+def consultar(empresa_id, cursor, limite=LIMITE_DEFAULT, margen_segundos=30, retencion_dias=None):
+    """
+    Cambios del tenant desde el cursor: filas creadas o modificadas por
+    entidad (keyset sobre (empresa_id, updated_at, id)) e ids borrados. Cada
+    entidad pagina por separado con el mismo límite; hay_mas indica que
+    alguna quedó con filas pendientes.
+    """
+    posiciones = decodificar_cursor(cursor)
+    ahora = ahora_db()
+    if posiciones and retencion_dias is not None:
+        if min(ts for ts, _ in posiciones.values()) < ahora - timedelta(days=retencion_dias):
+            raise CursorVencido("El cursor es más viejo que la retención de borrados: resincronizar sin 'since'")
+    corte = ahora - timedelta(seconds=margen_segundos)
+
+    cambios, siguiente, hay_mas = {}, {}, False
+    for entidad, (model, expand) in ENTIDADES.items():
+        query = select(model).where(model.empresa_id == empresa_id).options(*opciones_carga(model, expand))
+        filas, mas = _pagina(query, model.updated_at, model.id, posiciones.get(entidad), limite)
+        cambios[entidad] = [obj.to_dict(expand=expand) for obj in filas]
+        ultima = (filas[-1].updated_at, filas[-1].id) if filas else None
+        siguiente[entidad] = _siguiente(posiciones.get(entidad), ultima, mas, corte)
+        hay_mas = hay_mas or mas
+
+    query = select(Borrado).where(Borrado.empresa_id == empresa_id)
+    filas, mas = _pagina(query, Borrado.borrado_at, Borrado.id, posiciones.get(BORRADOS), limite)
+    borrados = {entidad: [] for entidad in ENTIDADES}
+    for fila in filas:
+        borrados[fila.entidad].append(fila.entidad_id)
+    ultima = (filas[-1].borrado_at, filas[-1].id) if filas else None
+    siguiente[BORRADOS] = _siguiente(posiciones.get(BORRADOS), ultima, mas, corte)
+
+    return {
+        "cambios": cambios,
+        "borrados": borrados,
+        "cursor": codificar_cursor(siguiente),
+        "hay_mas": hay_mas or mas,
+    }
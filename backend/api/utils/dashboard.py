@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from sqlalchemy import case, func, select
+
+from api.models import db, Cliente, Instalacion, Pendiente, Presupuesto
+
+
+DIAS_DEFAULT = 30
+
+# De qué tablas depende el resumen (se invalida al escribir en cualquiera)
+ENTIDADES = (
+    Cliente.__tablename__,
+    Instalacion.__tablename__,
+    Pendiente.__tablename__,
+    Presupuesto.__tablename__,
+)
+
+
+def _contar_si(condicion):
+    return func.count(case((condicion, 1)))
+
+
+def resumen(empresa_id, hoy, dias=DIAS_DEFAULT):
+    """
+    Contadores de la pantalla de inicio con cuatro consultas agregadas
+    (cada una resuelta sobre un índice que empieza por empresa_id).
+    """
+    limite = hoy + timedelta(days=dias)
+
+    clientes = db.session.execute(
+        select(func.count())
+        .select_from(Cliente)
+        .where(Cliente.empresa_id == empresa_id, Cliente.activo.is_(True))
+    ).scalar()
+
+    pendientes = db.session.execute(
+        select(
+            func.count(),
+            _contar_si(Pendiente.fecha < hoy),
+            _contar_si(Pendiente.fecha <= limite),
+        ).where(Pendiente.empresa_id == empresa_id)
+    ).one()
+
+    instalaciones = db.session.execute(
+        select(
+            func.count(),
+            _contar_si(Instalacion.proximo_mantenimiento < hoy),
+            _contar_si(Instalacion.proximo_mantenimiento <= limite),
+        ).where(Instalacion.empresa_id == empresa_id, Instalacion.activa.is_(True))
+    ).one()
+
+    presupuestos = dict(
+        db.session.execute(
+            select(Presupuesto.estado, func.count())
+            .where(Presupuesto.empresa_id == empresa_id)
+            .group_by(Presupuesto.estado)
+        ).all()
+    )
+
+    return {
+        "fecha": hoy.isoformat(),
+        "dias": dias,
+        "clientes": clientes,
+        "pendientes": {
+            "total": pendientes[0],
+            "vencidos": pendientes[1],
+            "proximos": pendientes[2],
+        },
+        "instalaciones": {
+            "activas": instalaciones[0],
+            "vencidas": instalaciones[1],
+            "proximas": instalaciones[2],
+        },
+        "presupuestos": {
+            "total": sum(presupuestos.values()),
+            "por_estado": {estado or "sin_estado": n for estado, n in presupuestos.items()},
+        },
+        # Lo que muestra la tarjeta "Servicios pendientes" del inicio
+        "servicios_pendientes": pendientes[2] + instalaciones[2],
+    }
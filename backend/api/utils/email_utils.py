@@ -1,10 +1,151 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
 from flask_mail import Message # type: ignore
+from sqlalchemy import func
 from extensions import mail
 
-def send_email(to, subject, body):
-    msg = Message(subject, recipients=[to])
-    msg.body = body
+from api.models import db, EmailOutbox
+from api.utils.cambios import ahora_db, reloj_db
+
+
+logger = logging.getLogger(__name__)
+
+LOTE = 50
+MAX_INTENTOS = 8
+BACKOFF_BASE = 30  # segundos; se duplica en cada intento
+
+# Estadísticas del último lote enviado por este proceso
+ultimo_lote = {"enviados": 0, "fallidos": 0, "duracion": 0.0, "latencia_max": 0.0, "at": None}
+
+
+def send_email(to, subject, body, commit=True):
+    """
+    Encola el email en la outbox; lo envía el sender en segundo plano.
+    Con commit=False queda en la transacción del request (se envía solo si
+    ésta se confirma).
+    """
+    db.session.add(EmailOutbox(destinatario=to, asunto=subject, cuerpo=body))
+    if commit:
+        db.session.commit()
+
+
+# =========================
+# SENDER
+# =========================
+def _backoff(intentos):
+    return timedelta(seconds=BACKOFF_BASE * 2 ** (intentos - 1))
+
+
+def _tomar_lote(limite):
+    query = (
+        EmailOutbox.query.filter(
+            EmailOutbox.estado == "PENDIENTE",
+            EmailOutbox.proximo_intento <= func.now(),
+        )
+        .order_by(EmailOutbox.proximo_intento, EmailOutbox.id)
+        .limit(limite)
+    )
+    # Varios senders en paralelo no toman las mismas filas
+    if db.session.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    return query.all()
+
+
+def _fallo(email, error, ahora):
+    email.intentos += 1
+    email.ultimo_error = str(error)
+    if email.intentos >= MAX_INTENTOS:
+        email.estado = "ERROR"
+        logger.error("Email %s descartado tras %s intentos: %s", email.id, email.intentos, error)
+    else:
+        email.proximo_intento = ahora + _backoff(email.intentos)
+
+
+def enviar_pendientes(limite=LOTE):
+    """Envía un lote por una única conexión SMTP. Devuelve la cantidad procesada."""
+    emails = _tomar_lote(limite)
+    if not emails:
+        db.session.commit()
+        return 0
+
+    # Reloj de la base: proximo_intento se compara con now() y enviado_at con
+    # created_at (default now()), no con el reloj de este proceso
+    inicio = time.perf_counter()
+    ahora = ahora_db()
+    procesados = set()
+
     try:
-        mail.send(msg)
+        with mail.connect() as conn:
+            for email in emails:
+                procesados.add(email.id)
+                msg = Message(email.asunto, recipients=[email.destinatario])
+                msg.body = email.cuerpo
+                try:
+                    conn.send(msg)
+                except Exception as e:
+                    _fallo(email, e, ahora)
+                    continue
+                email.estado = "ENVIADO"
+                email.enviado_at = ahora + timedelta(seconds=time.perf_counter() - inicio)
     except Exception as e:
-        print(f"Error enviando email: {e}")
+        # Falló la conexión: lo que quedó sin intentar se reintenta más tarde
+        for email in emails:
+            if email.id not in procesados:
+                _fallo(email, e, ahora)
+
+    # Antes del commit: después los objetos quedan expirados
+    enviados = [e for e in emails if e.estado == "ENVIADO"]
+    ultimo_lote.update(
+        enviados=len(enviados),
+        fallidos=len(emails) - len(enviados),
+        duracion=round(time.perf_counter() - inicio, 3),
+        latencia_max=max(
+            ((e.enviado_at - e.created_at).total_seconds() for e in enviados if e.created_at),
+            default=0.0,
+        ),
+        at=ahora.isoformat(),
+    )
+    db.session.commit()
+    return len(emails)
+
+
+def estado_outbox():
+    pendientes, mas_antiguo, ahora = (
+        db.session.query(func.count(EmailOutbox.id), func.min(EmailOutbox.created_at), reloj_db())
+        .filter(EmailOutbox.estado == "PENDIENTE")
+        .one()
+    )
+    con_error = EmailOutbox.query.filter(EmailOutbox.estado == "ERROR").count()
+    espera = (ahora - mas_antiguo).total_seconds() if mas_antiguo else 0.0
+    return {
+        "pendientes": pendientes,
+        "con_error": con_error,
+        "espera_max_segundos": round(espera, 1),
+        "ultimo_lote": ultimo_lote,
+    }
+
+
+def procesar_outbox(app, intervalo=5, detener=None):
+    """Loop del sender: vacía la outbox y duerme 'intervalo' segundos cuando no hay nada."""
+    while detener is None or not detener.is_set():
+        with app.app_context():
+            try:
+                procesados = enviar_pendientes()
+            except Exception:
+                logger.exception("Error procesando la outbox de emails")
+                db.session.rollback()
+                procesados = 0
+            finally:
+                db.session.remove()
+        if procesados < LOTE:
+            time.sleep(intervalo)
+
+
+def iniciar_sender(app):
+    """Sender en un thread del propio proceso (MAIL_OUTBOX_THREAD)."""
+    hilo = threading.Thread(target=procesar_outbox, args=(app,), name="email-outbox", daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from api.models import db, Cliente, Instalacion, Mantenimiento, Pendiente, Presupuesto
+
+
+FILAS_POR_LOTE = 1000
+
+ENTIDADES = {
+    "clientes": Cliente,
+    "instalaciones": Instalacion,
+    "mantenimientos": Mantenimiento,
+    "pendientes": Pendiente,
+    "presupuestos": Presupuesto,
+}
+
+FORMATOS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_default(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return str(valor)
+
+
+def _filas(model, empresa_id):
+    """
+    Filas como tuplas desde un cursor del lado del servidor: en Postgres
+    stream_results usa un named cursor, así que la memoria no depende del
+    tamaño de la tabla.
+    """
+    columnas = [getattr(model, campo) for campo in model.__campos__]
+    stmt = (
+        select(*columnas)
+        .where(model.empresa_id == empresa_id)
+        .order_by(model.id)
+        .execution_options(stream_results=True, yield_per=FILAS_POR_LOTE)
+    )
+    resultado = db.session.execute(stmt)
+    try:
+        for particion in resultado.partitions():
+            yield particion
+    finally:
+        resultado.close()
+
+
+def exportar_csv(model, empresa_id):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(model.__campos__)
+    yield buffer.getvalue()
+
+    for filas in _filas(model, empresa_id):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(filas)
+        yield buffer.getvalue()
+
+
+def exportar_ndjson(model, empresa_id):
+    campos = model.__campos__
+    for filas in _filas(model, empresa_id):
+        yield "".join(
+            json.dumps(dict(zip(campos, fila)), default=_json_default, ensure_ascii=False) + "\n"
+            for fila in filas
+        )
+
+
+def exportar(entidad, formato, empresa_id):
+    model = ENTIDADES[entidad]
+    if formato == "csv":
+        return exportar_csv(model, empresa_id)
+    return exportar_ndjson(model, empresa_id)
@@ -0,0 +1,124 @@
+import math
+
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+
+from api.models import Cliente
+
+
+RADIO_TIERRA_KM = 6371.0088
+
+# Grilla fija de celdas de CELDA_GRADOS x CELDA_GRADOS (~5,5 km de lado en
+# latitud). celda = fila * COLUMNAS + columna, así que las celdas de una
+# misma fila son enteros consecutivos y un rectángulo se consulta como un
+# rango BETWEEN por fila sobre el índice (empresa_id, celda).
+CELDA_GRADOS = 0.05
+COLUMNAS = int(round(360 / CELDA_GRADOS))
+
+# Rectángulos más altos que esto se filtran solo por lat/lng (demasiados rangos)
+MAX_FILAS = 64
+MAX_RADIO_KM = 100
+
+
+def _fila(lat):
+    return min(int((lat + 90) // CELDA_GRADOS), int(round(180 / CELDA_GRADOS)) - 1)
+
+
+def _columna(lng):
+    return min(int((lng + 180) // CELDA_GRADOS), COLUMNAS - 1)
+
+
+def coordenadas_validas(lat, lng):
+    return -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def _coordenada(valor):
+    # Las escrituras que no pasan por la API (admin, consola) pueden traer texto
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def celda(lat, lng):
+    lat, lng = _coordenada(lat), _coordenada(lng)
+    if lat is None or lng is None or not coordenadas_validas(lat, lng):
+        return None
+    return _fila(lat) * COLUMNAS + _columna(lng)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dlat = p2 - p1
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dlng / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def caja_alrededor(lat, lng, radio_km):
+    """Rectángulo (min_lat, min_lng, max_lat, max_lng) que contiene el círculo."""
+    dlat = math.degrees(radio_km / RADIO_TIERRA_KM)
+    coseno = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(180.0, math.degrees(radio_km / (RADIO_TIERRA_KM * coseno)))
+    return (
+        max(-90.0, lat - dlat),
+        max(-180.0, lng - dlng),
+        min(90.0, lat + dlat),
+        min(180.0, lng + dlng),
+    )
+
+
+# =========================
+# CONSULTAS
+# =========================
+def filtro_caja(min_lat, min_lng, max_lat, max_lng):
+    """
+    Condición SQL para clientes dentro del rectángulo (sin cruzar el
+    antimeridiano). Los rangos de celdas usan el índice; la comparación
+    exacta de lat/lng descarta los bordes de las celdas.
+    """
+    exacto = and_(
+        Cliente.lat.between(min_lat, max_lat),
+        Cliente.lng.between(min_lng, max_lng),
+    )
+    fila_desde, fila_hasta = _fila(min_lat), _fila(max_lat)
+    if fila_hasta - fila_desde + 1 > MAX_FILAS:
+        return exacto
+
+    col_desde, col_hasta = _columna(min_lng), _columna(max_lng)
+    rangos = [
+        Cliente.celda.between(fila * COLUMNAS + col_desde, fila * COLUMNAS + col_hasta)
+        for fila in range(fila_desde, fila_hasta + 1)
+    ]
+    return and_(or_(*rangos), exacto)
+
+
+def cercanos(query, lat, lng, radio_km, limite):
+    """
+    Clientes a menos de radio_km ordenados por distancia haversine exacta.
+    Devuelve [(cliente, distancia_km)].
+    """
+    candidatos = query.filter(filtro_caja(*caja_alrededor(lat, lng, radio_km))).all()
+    ranking = []
+    for cliente in candidatos:
+        distancia = haversine_km(lat, lng, cliente.lat, cliente.lng)
+        if distancia <= radio_km:
+            ranking.append((cliente, distancia))
+    ranking.sort(key=lambda par: (par[1], par[0].id))
+    return ranking[:limite]
+
+
+# =========================
+# MANTENIMIENTO DE LA CELDA
+# =========================
+def _asignar_celda(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Cliente):
+            nueva = celda(obj.lat, obj.lng)
+            if obj.celda != nueva:
+                obj.celda = nueva
+
+
+def init_geo(app):
+    if not event.contains(Session, "before_flush", _asignar_celda):
+        event.listen(Session, "before_flush", _asignar_celda)
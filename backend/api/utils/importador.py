@@ -0,0 +1,327 @@
+import csv
+import io
+import json
+from datetime import date
+
+from sqlalchemy import insert, select
+
+from api.models import db, Cliente, Instalacion, Mantenimiento, Usuario
+from api.utils import versiones
+from api.utils.geo import celda
+from api.utils.agenda import recalcular_todo, sumar_meses
+
+
+CHUNK = 1000
+MAX_ERRORES = 1000
+
+
+class ImportacionInvalida(ValueError):
+    pass
+
+
+# =========================
+# LECTURA (CSV / NDJSON)
+# =========================
+def leer_filas(stream, content_type):
+    """Itera las filas del body sin cargarlo entero en memoria."""
+    texto = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if "csv" in content_type:
+        for fila in csv.DictReader(texto):
+            yield {k.strip(): (v.strip() if v is not None else None) for k, v in fila.items() if k}
+        return
+
+    if "ndjson" in content_type or "jsonl" in content_type:
+        for linea in texto:
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = None
+            yield fila if isinstance(fila, dict) else {"__invalida__": linea[:100]}
+        return
+
+    raise ImportacionInvalida("Content-Type debe ser text/csv o application/x-ndjson")
+
+
+def _chunks(filas, tamanio):
+    chunk = []
+    for numero, fila in enumerate(filas, start=1):
+        chunk.append((numero, fila))
+        if len(chunk) == tamanio:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# =========================
+# VALIDACION
+# =========================
+def _vacio(valor):
+    return valor is None or valor == ""
+
+
+def _texto(fila, campo, errores, requerido=False, largo=None):
+    valor = fila.get(campo)
+    if _vacio(valor):
+        if requerido:
+            errores[campo] = "requerido"
+        return None
+    valor = str(valor)
+    if largo and len(valor) > largo:
+        errores[campo] = f"máximo {largo} caracteres"
+    return valor
+
+
+def _entero(fila, campo, errores, requerido=False):
+    valor = fila.get(campo)
+    if _vacio(valor):
+        if requerido:
+            errores[campo] = "requerido"
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        errores[campo] = "debe ser entero"
+
+
+def _decimal(fila, campo, errores):
+    valor = fila.get(campo)
+    if _vacio(valor):
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        errores[campo] = "debe ser numérico"
+
+
+def _fecha(fila, campo, errores, requerido=False):
+    valor = fila.get(campo)
+    if _vacio(valor):
+        if requerido:
+            errores[campo] = "requerido"
+        return None
+    try:
+        return date.fromisoformat(str(valor))
+    except ValueError:
+        errores[campo] = "fecha inválida (YYYY-MM-DD)"
+
+
+def _usuarios_por_email(empresa_id, emails):
+    if not emails:
+        return {}
+    filas = db.session.execute(
+        select(Usuario.email, Usuario.id).where(
+            Usuario.empresa_id == empresa_id, Usuario.email.in_(emails)
+        )
+    )
+    return dict(filas.all())
+
+
+def _ids_enteros(chunk, campo):
+    ids = set()
+    for _, f in chunk:
+        try:
+            ids.add(int(f.get(campo)))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def _usuarios_validos(empresa_id, ids):
+    if not ids:
+        return set()
+    return set(
+        db.session.execute(
+            select(Usuario.id).where(Usuario.empresa_id == empresa_id, Usuario.id.in_(ids))
+        ).scalars()
+    )
+
+
+# =========================
+# ENTIDADES
+# =========================
+def _preparar_clientes(chunk, empresa_id):
+    validas, errores = [], []
+    for numero, fila in chunk:
+        err = {}
+        row = {
+            "empresa_id": empresa_id,
+            "nombre": _texto(fila, "nombre", err, requerido=True, largo=120),
+            "telefono": _texto(fila, "telefono", err, largo=50),
+            "email": _texto(fila, "email", err, largo=120),
+            "direccion": _texto(fila, "direccion", err, largo=255),
+            "lat": _decimal(fila, "lat", err),
+            "lng": _decimal(fila, "lng", err),
+            "observaciones": _texto(fila, "observaciones", err),
+            "activo": True,
+        }
+        # El insert masivo no pasa por el flush del ORM
+        row["celda"] = celda(row["lat"], row["lng"])
+        if err:
+            errores.append({"fila": numero, "errores": err})
+        else:
+            validas.append(row)
+    return validas, errores
+
+
+def _preparar_instalaciones(chunk, empresa_id):
+    # Una consulta por chunk para resolver clientes (por nombre) e instaladores (por email o id)
+    nombres = {f.get("cliente") for _, f in chunk if _vacio(f.get("cliente_id")) and f.get("cliente")}
+    ids = {f.get("cliente_id") for _, f in chunk if not _vacio(f.get("cliente_id"))}
+    clientes_por_nombre, clientes_validos = {}, set()
+    if nombres or ids:
+        ids_int = {int(i) for i in ids if str(i).isdigit()}
+        filas = db.session.execute(
+            select(Cliente.id, Cliente.nombre).where(
+                Cliente.empresa_id == empresa_id,
+                db.or_(Cliente.nombre.in_(nombres), Cliente.id.in_(ids_int)),
+            )
+        )
+        for cliente_id, nombre in filas:
+            clientes_por_nombre.setdefault(nombre, cliente_id)
+            clientes_validos.add(cliente_id)
+
+    instaladores = _usuarios_por_email(
+        empresa_id, {f.get("instalador") for _, f in chunk if f.get("instalador")}
+    )
+    instaladores_validos = _usuarios_validos(empresa_id, _ids_enteros(chunk, "instalador_id"))
+
+    validas, errores = [], []
+    for numero, fila in chunk:
+        err = {}
+        cliente_id = _entero(fila, "cliente_id", err)
+        if cliente_id is None and "cliente_id" not in err:
+            cliente_id = clientes_por_nombre.get(fila.get("cliente"))
+        if cliente_id is None:
+            err.setdefault("cliente", "cliente inexistente o no indicado")
+        elif cliente_id not in clientes_validos:
+            err["cliente_id"] = "cliente inexistente"
+
+        instalador_id = _entero(fila, "instalador_id", err)
+        if instalador_id is not None and instalador_id not in instaladores_validos:
+            err["instalador_id"] = "usuario inexistente"
+        elif instalador_id is None and fila.get("instalador"):
+            instalador_id = instaladores.get(fila["instalador"])
+            if instalador_id is None:
+                err["instalador"] = "usuario inexistente"
+
+        fecha_instalacion = _fecha(fila, "fecha_instalacion", err, requerido=True)
+        frecuencia = _entero(fila, "frecuencia_meses", err) or 6
+        proximo = _fecha(fila, "proximo_mantenimiento", err)
+        if proximo is None and fecha_instalacion:
+            proximo = sumar_meses(fecha_instalacion, frecuencia)
+
+        row = {
+            "empresa_id": empresa_id,
+            "cliente_id": cliente_id,
+            "instalador_id": instalador_id,
+            "tipo_sistema": _texto(fila, "tipo_sistema", err, largo=50),
+            "fecha_instalacion": fecha_instalacion,
+            "frecuencia_meses": frecuencia,
+            "proximo_mantenimiento": proximo,
+            "activa": True,
+        }
+        if err:
+            errores.append({"fila": numero, "errores": err})
+        else:
+            validas.append(row)
+    return validas, errores
+
+
+def _preparar_mantenimientos(chunk, empresa_id):
+    ids = _ids_enteros(chunk, "instalacion_id")
+    instalaciones_validas = set(
+        db.session.execute(
+            select(Instalacion.id).where(Instalacion.empresa_id == empresa_id, Instalacion.id.in_(ids))
+        ).scalars()
+    ) if ids else set()
+
+    tecnicos = _usuarios_por_email(
+        empresa_id, {f.get("tecnico") for _, f in chunk if f.get("tecnico")}
+    )
+    tecnicos_validos = _usuarios_validos(empresa_id, _ids_enteros(chunk, "realizado_por"))
+
+    validas, errores = [], []
+    for numero, fila in chunk:
+        err = {}
+        instalacion_id = _entero(fila, "instalacion_id", err, requerido=True)
+        if instalacion_id is not None and instalacion_id not in instalaciones_validas:
+            err["instalacion_id"] = "instalación inexistente"
+
+        realizado_por = _entero(fila, "realizado_por", err)
+        if realizado_por is not None and realizado_por not in tecnicos_validos:
+            err["realizado_por"] = "usuario inexistente"
+        elif realizado_por is None and fila.get("tecnico"):
+            realizado_por = tecnicos.get(fila["tecnico"])
+            if realizado_por is None:
+                err["tecnico"] = "usuario inexistente"
+
+        row = {
+            "empresa_id": empresa_id,
+            "instalacion_id": instalacion_id,
+            "realizado_por": realizado_por,
+            "fecha": _fecha(fila, "fecha", err, requerido=True),
+            "notas": _texto(fila, "notas", err),
+        }
+        if err:
+            errores.append({"fila": numero, "errores": err})
+        else:
+            validas.append(row)
+    return validas, errores
+
+
+ENTIDADES = {
+    "clientes": (Cliente, _preparar_clientes),
+    "instalaciones": (Instalacion, _preparar_instalaciones),
+    "mantenimientos": (Mantenimiento, _preparar_mantenimientos),
+}
+
+
+# =========================
+# IMPORTACION
+# =========================
+def importar(entidad, filas, empresa_id, chunk=CHUNK):
+    """
+    Valida e inserta por chunks: una transacción y un executemany por chunk.
+    Las filas inválidas no se insertan y se reportan con su número de fila.
+    """
+    if entidad not in ENTIDADES:
+        raise ImportacionInvalida(f"Entidad '{entidad}' no soportada")
+    model, preparar = ENTIDADES[entidad]
+
+    insertadas = 0
+    total = 0
+    errores = []
+    errores_totales = 0
+
+    for lote in _chunks(filas, chunk):
+        total += len(lote)
+        invalidas = [(n, f) for n, f in lote if "__invalida__" in f]
+        lote = [(n, f) for n, f in lote if "__invalida__" not in f]
+
+        validas, errores_lote = preparar(lote, empresa_id)
+        errores_lote = [{"fila": n, "errores": {"linea": "JSON inválido"}} for n, _ in invalidas] + errores_lote
+
+        if validas:
+            db.session.execute(insert(model), validas)
+            versiones.bump(empresa_id, model.__tablename__)
+            db.session.commit()
+            insertadas += len(validas)
+
+            # Los mantenimientos importados corren el próximo mantenimiento de
+            # sus instalaciones (solo esas: el resto conserva fechas y updated_at)
+            if entidad == "mantenimientos":
+                recalcular_todo(empresa_id, ids={row["instalacion_id"] for row in validas})
+
+        errores_totales += len(errores_lote)
+        errores.extend(errores_lote[: MAX_ERRORES - len(errores)])
+
+    return {
+        "total": total,
+        "insertadas": insertadas,
+        "con_errores": errores_totales,
+        "errores": sorted(errores, key=lambda e: e["fila"]),
+    }
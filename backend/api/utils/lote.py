@@ -0,0 +1,245 @@
+from collections import defaultdict
+
+from sqlalchemy.orm import RelationshipDirection
+
+from api.models import db, Cliente, Instalacion, Mantenimiento, Pendiente, Usuario
+from api.utils.parcial import CAMPOS, convertir
+from api.utils.serializacion import opciones_carga
+
+
+MAX_OPERACIONES = 500
+OPERACIONES = ("create", "update", "delete")
+# Prefijo de las referencias a filas creadas en el mismo lote: "$c1"
+PREFIJO_TEMPORAL = "$"
+
+# Campos que el cliente puede escribir en cada entidad (los mismos que en PATCH)
+ENTIDADES = {
+    "clientes": (Cliente, CAMPOS[Cliente]),
+    "instalaciones": (Instalacion, CAMPOS[Instalacion]),
+    "mantenimientos": (Mantenimiento, CAMPOS[Mantenimiento]),
+    "pendientes": (Pendiente, CAMPOS[Pendiente]),
+}
+# Entidades que se pueden referenciar por id (además de las del lote)
+REFERENCIABLES = {model for model, _ in ENTIDADES.values()} | {Usuario}
+
+
+class LoteInvalido(ValueError):
+    pass
+
+
+def _claves_foraneas(model):
+    """{columna FK: (relación, modelo destino)} de las relaciones many-to-one."""
+    fks = {}
+    for rel in db.inspect(model).relationships:
+        if rel.direction is RelationshipDirection.MANYTOONE and rel.mapper.class_ in REFERENCIABLES:
+            for columna in rel.local_columns:
+                fks[columna.key] = (rel.key, rel.mapper.class_)
+    return fks
+
+
+FORANEAS = {model: _claves_foraneas(model) for model, _ in ENTIDADES.values()}
+
+
+def _temporal(valor):
+    return isinstance(valor, str) and valor.startswith(PREFIJO_TEMPORAL)
+
+
+def _es_id(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+# =========================
+# VALIDACION
+# =========================
+def _normalizar(operaciones):
+    if not isinstance(operaciones, list) or not operaciones:
+        raise LoteInvalido("'operaciones' debe ser una lista no vacía")
+    if len(operaciones) > MAX_OPERACIONES:
+        raise LoteInvalido(f"Máximo {MAX_OPERACIONES} operaciones por lote")
+
+    normalizadas, errores, temporales = [], [], set()
+    for indice, op in enumerate(operaciones):
+        err = {}
+        if not isinstance(op, dict):
+            errores.append({"indice": indice, "errores": {"operacion": "debe ser un objeto"}})
+            continue
+        tipo, entidad, datos = op.get("op"), op.get("entidad"), op.get("datos", {})
+        if tipo not in OPERACIONES:
+            err["op"] = f"debe ser uno de {', '.join(OPERACIONES)}"
+        if entidad not in ENTIDADES:
+            err["entidad"] = f"debe ser una de {', '.join(ENTIDADES)}"
+        if not isinstance(datos, dict):
+            err["datos"] = "debe ser un objeto"
+
+        id, tmp_id = op.get("id"), op.get("tmp_id")
+        if tipo == "create":
+            if tmp_id is not None:
+                if not isinstance(tmp_id, str) or not tmp_id or _temporal(tmp_id):
+                    err["tmp_id"] = f"debe ser un texto sin '{PREFIJO_TEMPORAL}' al inicio"
+                elif tmp_id in temporales:
+                    err["tmp_id"] = "repetido"
+                temporales.add(tmp_id)
+        elif tipo in ("update", "delete") and not (_es_id(id) or _temporal(id)):
+            err["id"] = f"debe ser un entero o '{PREFIJO_TEMPORAL}tmp_id'"
+
+        if err:
+            errores.append({"indice": indice, "errores": err})
+        else:
+            normalizadas.append({"indice": indice, "op": tipo, "entidad": entidad, "id": id, "tmp_id": tmp_id, "datos": datos})
+    if errores:
+        raise LoteInvalido(errores)
+    return normalizadas
+
+
+def _cargar_existentes(operaciones, cascadas):
+    """Una consulta por modelo con todas las filas que el lote toca o referencia (filtradas por tenant)."""
+    ids, borrados = defaultdict(set), defaultdict(set)
+    for op in operaciones:
+        model = ENTIDADES[op["entidad"]][0]
+        if op["op"] != "create" and _es_id(op["id"]):
+            (borrados if op["op"] == "delete" else ids)[model].add(op["id"])
+        for campo, valor in op["datos"].items():
+            destino = FORANEAS[model].get(campo)
+            if destino and _es_id(valor):
+                ids[destino[1]].add(valor)
+
+    consultas = []
+    for model, valores in borrados.items():
+        # Solo las filas a borrar traen las relaciones que recorre el cascade
+        opciones = opciones_carga(model, cascadas[model]) if model in cascadas else []
+        consultas.append(model.query.options(*opciones).filter(model.id.in_(valores)))
+    for model, valores in ids.items():
+        valores = valores - borrados.get(model, set())
+        if valores:
+            consultas.append(model.query.filter(model.id.in_(valores)))
+
+    cargados = {}
+    for query in consultas:
+        for obj in query:
+            cargados[(type(obj), obj.id)] = obj
+    return cargados
+
+
+# =========================
+# EJECUCION
+# =========================
+def _valores_iniciales(model, campos, datos):
+    """
+    Los campos no enviados van explícitos (default o None): así todas las
+    filas nuevas de una tabla tienen las mismas columnas y el flush las
+    inserta en un único statement en vez de una por grupo de columnas.
+    """
+    valores = {}
+    for campo in campos:
+        if campo in datos:
+            continue
+        default = model.__table__.c[campo].default
+        valores[campo] = default.arg if default is not None and default.is_scalar else None
+    return valores
+
+
+def _usos(referencias):
+    # Las que siguen en la sesión (una fila creada y borrada en el lote ya no cuenta)
+    return ", ".join(str(indice) for indice, obj in referencias if obj in db.session)
+
+
+def ejecutar(operaciones, empresa_id, cascadas=None):
+    """
+    Aplica las operaciones en orden dentro de la transacción de la sesión y
+    hace un único flush: el ORM agrupa los INSERT de cada tabla en un solo
+    statement (RETURNING) y los UPDATE con las mismas columnas en un
+    executemany. No hace commit. Devuelve un resultado compacto por operación.
+    """
+    operaciones = _normalizar(operaciones)
+    cargados = _cargar_existentes(operaciones, cascadas or {})
+    creados = {}  # tmp_id -> (modelo, objeto)
+    borrados_tmp = set()
+    referencias = defaultdict(list)  # "$tmp_id" -> (índice, objeto) de las operaciones que la usan como FK
+    errores, aplicadas = [], []
+
+    def resolver(model, valor):
+        if _temporal(valor):
+            par = creados.get(valor[len(PREFIJO_TEMPORAL):])
+            if par is None or valor in borrados_tmp:
+                raise ValueError("referencia temporal inexistente (debe crearse antes en el lote)")
+            if par[0] is not model:
+                raise ValueError(f"la referencia temporal no es de {model.__tablename__}")
+            return par[1]
+        obj = cargados.get((model, valor))
+        if obj is None:
+            raise ValueError("inexistente")
+        return obj
+
+    def asignar(obj, model, campos, datos, err, indice):
+        for campo, valor in datos.items():
+            if campo not in campos:
+                err[campo] = "campo desconocido o de solo lectura"
+                continue
+            try:
+                destino = FORANEAS[model].get(campo)
+                if destino and valor is not None and (_temporal(valor) or _es_id(valor)):
+                    # Por la relación: el flush completa la FK de las filas nuevas
+                    setattr(obj, destino[0], resolver(destino[1], valor))
+                    if _temporal(valor):
+                        referencias[valor].append((indice, obj))
+                else:
+                    setattr(obj, campo, convertir(model.__table__.c[campo], valor))
+            except ValueError as e:
+                err[campo] = str(e)
+
+    with db.session.no_autoflush:
+        for op in operaciones:
+            model, campos = ENTIDADES[op["entidad"]]
+            err = {}
+            if op["op"] == "create":
+                faltan = [
+                    c for c in campos
+                    if not model.__table__.c[c].nullable and model.__table__.c[c].default is None and c not in op["datos"]
+                ]
+                for campo in faltan:
+                    err[campo] = "requerido"
+                obj = model(empresa_id=empresa_id, **_valores_iniciales(model, campos, op["datos"]))
+                asignar(obj, model, campos, op["datos"], err, op["indice"])
+                if not err:
+                    db.session.add(obj)
+                    if op["tmp_id"] is not None:
+                        creados[op["tmp_id"]] = (model, obj)
+            else:
+                try:
+                    obj = resolver(model, op["id"])
+                except ValueError as e:
+                    err["id"] = str(e)
+                else:
+                    if op["op"] == "update":
+                        asignar(obj, model, campos, op["datos"], err, op["indice"])
+                    elif obj in db.session.new:
+                        # Creada y borrada en el mismo lote: no llega a la base. Si otra
+                        # operación la referencia, el expunge la arrastraría (cascade)
+                        usos = _usos(referencias[op["id"]])
+                        if usos:
+                            err["id"] = f"referenciada por otras operaciones del lote (índices {usos})"
+                        else:
+                            db.session.expunge(obj)
+                            borrados_tmp.add(op["id"])
+                    else:
+                        db.session.delete(obj)
+
+            if err:
+                errores.append({"indice": op["indice"], "errores": err})
+            else:
+                aplicadas.append((op, obj))
+
+    if errores:
+        raise LoteInvalido(errores)
+
+    db.session.flush()
+    resultados = []
+    for op, obj in aplicadas:
+        resultado = {"op": op["op"], "entidad": op["entidad"], "id": obj.id}
+        if op["tmp_id"] is not None:
+            resultado["tmp_id"] = op["tmp_id"]
+        resultados.append(resultado)
+    return {
+        "resultados": resultados,
+        "ids": {tmp_id: obj.id for tmp_id, (_, obj) in creados.items() if obj.id is not None},
+    }
@@ -0,0 +1,203 @@
+from datetime import date, datetime
+
+from flask import request
+from sqlalchemy import Boolean, Date, DateTime, Integer, and_, or_, text
+
+from api.models import db
+from api.utils import tenancy
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+class ParametroInvalido(ValueError):
+    """Parámetro de query string inválido (se responde con 400)."""
+
+
+# =========================
+# CONVERSION DE PARAMETROS
+# =========================
+def _parse_bool(valor):
+    valor = valor.lower()
+    if valor in ("true", "1", "yes", "si"):
+        return True
+    if valor in ("false", "0", "no"):
+        return False
+    raise ValueError(valor)
+
+
+def _parse_datetime(valor):
+    # Acepta "2025-01-31" o "2025-01-31T10:00:00"
+    return datetime.fromisoformat(valor)
+
+
+def parse_fecha(valor, nombre):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ParametroInvalido(f"Fecha inválida para '{nombre}': {valor}")
+
+
+def parse_entero(valor, nombre):
+    try:
+        return int(valor)
+    except ValueError:
+        raise ParametroInvalido(f"'{nombre}' debe ser un entero")
+
+
+def parse_real(valor, nombre):
+    if valor is None or valor == "":
+        raise ParametroInvalido(f"Falta el parámetro '{nombre}'")
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ParametroInvalido(f"'{nombre}' debe ser un número")
+    if numero != numero or numero in (float("inf"), float("-inf")):
+        raise ParametroInvalido(f"'{nombre}' debe ser un número")
+    return numero
+
+
+def _parse_valor(columna, nombre, valor):
+    tipo = columna.type
+    try:
+        if isinstance(tipo, Boolean):
+            return _parse_bool(valor)
+        if isinstance(tipo, Integer):
+            return int(valor)
+        if isinstance(tipo, DateTime):
+            return _parse_datetime(valor)
+        if isinstance(tipo, Date):
+            return date.fromisoformat(valor)
+    except ValueError:
+        raise ParametroInvalido(f"Valor inválido para '{nombre}': {valor}")
+    return valor
+
+
+# =========================
+# LISTADO PAGINADO (KEYSET)
+# =========================
+class Listado:
+    """
+    Describe qué filtros, rangos y ordenamientos acepta un endpoint de lista.
+
+    - filtros: columnas filtrables por igualdad (?empresa_id=1&activo=true)
+    - rangos:  columnas de fecha filtrables con <col>_desde / <col>_hasta
+    - orden:   claves de orden permitidas (?sort=nombre o ?sort=-fecha)
+
+    La paginación es por cursor (?after=<id>&limit=), así que el costo de
+    cada página no depende de cuántas filas haya antes.
+    """
+
+    def __init__(self, model, filtros=(), rangos=(), orden=("id",)):
+        self.model = model
+        self.filtros = {nombre: getattr(model, nombre) for nombre in filtros}
+        self.rangos = {nombre: getattr(model, nombre) for nombre in rangos}
+        self.orden = {nombre: getattr(model, nombre) for nombre in orden}
+
+    def _filtrar(self, query, args):
+        for nombre, columna in self.filtros.items():
+            valor = args.get(nombre)
+            if valor is not None and valor != "":
+                query = query.filter(columna == _parse_valor(columna, nombre, valor))
+
+        for nombre, columna in self.rangos.items():
+            desde = args.get(f"{nombre}_desde")
+            hasta = args.get(f"{nombre}_hasta")
+            if desde:
+                query = query.filter(columna >= _parse_valor(columna, f"{nombre}_desde", desde))
+            if hasta:
+                query = query.filter(columna <= _parse_valor(columna, f"{nombre}_hasta", hasta))
+
+        return query
+
+    def _limit(self, args):
+        try:
+            limit = int(args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise ParametroInvalido("'limit' debe ser un entero")
+        if limit < 1:
+            raise ParametroInvalido("'limit' debe ser mayor a 0")
+        return min(limit, MAX_LIMIT)
+
+    def _sort(self, args):
+        sort = args.get("sort", "id")
+        descendente = sort.startswith("-")
+        clave = sort.lstrip("-")
+        if clave not in self.orden:
+            permitidos = ", ".join(sorted(self.orden))
+            raise ParametroInvalido(f"Orden '{clave}' no permitido (usar: {permitidos})")
+        return self.orden[clave], descendente
+
+    def _after(self, query, args, columna, descendente):
+        after = args.get("after")
+        if not after:
+            return query
+        try:
+            after = int(after)
+        except ValueError:
+            raise ParametroInvalido("'after' debe ser un id")
+
+        pk = self.model.id
+        if columna is pk:
+            return query.filter(pk < after if descendente else pk > after)
+
+        # El cursor es siempre un id: buscamos el valor de la columna de orden
+        # de esa fila para continuar la comparación (valor, id).
+        valor = db.session.query(columna).filter(pk == after).scalar()
+        if valor is None:
+            raise ParametroInvalido("Cursor 'after' inválido")
+
+        if descendente:
+            return query.filter(or_(columna < valor, and_(columna == valor, pk < after)))
+        return query.filter(or_(columna > valor, and_(columna == valor, pk > after)))
+
+    def _contar(self, query, modo):
+        if modo == "exact":
+            return query.order_by(None).count()
+
+        if modo == "estimate":
+            # En Postgres usamos la estimación del planner (no recorre la tabla)
+            bind = db.session.get_bind()
+            if bind.dialect.name == "postgresql":
+                # El filtro del tenant lo agrega do_orm_execute, que no ve este
+                # SQL crudo: se aplica acá antes de compilar
+                empresa_id = tenancy.empresa_actual()
+                if empresa_id is not None:
+                    query = query.options(*tenancy.criterios_tenant(empresa_id))
+                stmt = query.order_by(None).statement.compile(
+                    dialect=bind.dialect, compile_kwargs={"literal_binds": True}
+                )
+                plan = db.session.execute(text(f"EXPLAIN (FORMAT JSON) {stmt}")).scalar()
+                return int(plan[0]["Plan"]["Plan Rows"])
+            return query.order_by(None).count()
+
+        raise ParametroInvalido("'count' debe ser 'exact' o 'estimate'")
+
+    def paginar(self, query=None, args=None):
+        """Devuelve (items, meta) donde meta trae next_cursor, limit y total opcional."""
+        args = request.args if args is None else args
+        query = self.model.query if query is None else query
+
+        query = self._filtrar(query, args)
+        limit = self._limit(args)
+        columna, descendente = self._sort(args)
+
+        meta = {"limit": limit}
+        count = args.get("count")
+        if count:
+            meta["total"] = self._contar(query, count)
+
+        query = self._after(query, args, columna, descendente)
+        pk = self.model.id
+        if descendente:
+            query = query.order_by(columna.desc(), pk.desc()) if columna is not pk else query.order_by(pk.desc())
+        else:
+            query = query.order_by(columna, pk) if columna is not pk else query.order_by(pk)
+
+        items = query.limit(limit + 1).all()
+        hay_mas = len(items) > limit
+        items = items[:limit]
+
+        meta["next_cursor"] = items[-1].id if hay_mas else None
+        return items, meta
@@ -0,0 +1,169 @@
+from datetime import date
+
+from flask import jsonify, make_response, request
+from sqlalchemy import select
+
+from api.models import db, Empresa, Usuario, Cliente, Instalacion, Mantenimiento, Pendiente, Presupuesto
+
+
+# Campos que se pueden escribir con PUT/PATCH en cada modelo
+CAMPOS = {
+    Empresa: ("nombre", "plan", "max_usuarios", "activa"),
+    Cliente: ("nombre", "telefono", "email", "direccion", "lat", "lng", "observaciones", "activo"),
+    Instalacion: (
+        "cliente_id", "instalador_id", "tipo_sistema", "fecha_instalacion",
+        "frecuencia_meses", "proximo_mantenimiento", "activa",
+    ),
+    Mantenimiento: ("instalacion_id", "realizado_por", "fecha", "notas"),
+    Pendiente: ("cliente_id", "instalacion_id", "fecha", "notas"),
+    # El total lo mantienen los componentes
+    Presupuesto: (
+        "cliente_id", "cliente_nombre", "cliente_telefono", "cliente_direccion",
+        "cliente_email", "tipo_sistema", "descripcion", "estado", "creado_por",
+    ),
+}
+# Los clientes mandan la representación completa: estos se ignoran en silencio
+IGNORADOS = {"id", "empresa_id"}
+# Calculados por el servidor: se aceptan en el cuerpo pero no se escriben
+CALCULADOS = {Presupuesto: {"total"}}
+
+_POR_TABLA = {model.__tablename__: model for model in (Usuario, Cliente, Instalacion, Presupuesto)}
+
+
+def _claves_foraneas(model):
+    """{columna FK: modelo destino} (sin empresa_id, que no se escribe)."""
+    return {
+        columna.key: _POR_TABLA[fk.column.table.name]
+        for columna in model.__table__.columns
+        for fk in columna.foreign_keys
+        if fk.column.table.name in _POR_TABLA
+    }
+
+
+FORANEAS = {model: _claves_foraneas(model) for model in CAMPOS}
+
+
+class CambiosInvalidos(ValueError):
+    pass
+
+
+def convertir(columna, valor):
+    """Valor JSON -> valor de la columna. Lanza ValueError con el motivo."""
+    tipo = columna.type
+    if valor is None:
+        if not columna.nullable:
+            raise ValueError("requerido")
+        return None
+    if isinstance(tipo, db.Boolean):
+        if not isinstance(valor, bool):
+            raise ValueError("debe ser true/false")
+        return valor
+    if isinstance(tipo, db.Integer):
+        if isinstance(valor, bool) or not isinstance(valor, int):
+            raise ValueError("debe ser entero")
+        return valor
+    if isinstance(tipo, (db.Float, db.Numeric)):
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            raise ValueError("debe ser numérico")
+        return float(valor)
+    if isinstance(tipo, db.Date):
+        try:
+            return date.fromisoformat(str(valor))
+        except ValueError:
+            raise ValueError("fecha inválida (YYYY-MM-DD)")
+    if not isinstance(valor, str):
+        raise ValueError("debe ser texto")
+    largo = getattr(tipo, "length", None)
+    if largo and len(valor) > largo:
+        raise ValueError(f"máximo {largo} caracteres")
+    return valor
+
+
+def referencias_invalidas(model, valores):
+    """{campo: motivo} de las FK de valores que no existen en el tenant (una consulta por FK)."""
+    errores = {}
+    for campo, valor in valores.items():
+        destino = FORANEAS[model].get(campo)
+        if destino is not None and valor is not None:
+            if db.session.execute(select(destino.id).where(destino.id == valor)).first() is None:
+                errores[campo] = "inexistente"
+    return errores
+
+
+def verificar_referencias(obj):
+    """Altas: las FK tienen que apuntar a filas del tenant. Lanza CambiosInvalidos."""
+    model = type(obj)
+    errores = referencias_invalidas(model, {campo: getattr(obj, campo) for campo in FORANEAS[model]})
+    if errores:
+        raise CambiosInvalidos(errores)
+
+
+def convertir_campos(model, datos, campos):
+    """Altas: {campo: valor de la columna} de estos campos. Lanza CambiosInvalidos."""
+    errores, valores = {}, {}
+    for campo in campos:
+        try:
+            valores[campo] = convertir(model.__table__.c[campo], datos.get(campo))
+        except ValueError as e:
+            errores[campo] = str(e)
+    if errores:
+        raise CambiosInvalidos(errores)
+    return valores
+
+
+def aplicar(obj, datos):
+    """
+    Escribe en obj solo los campos enviados cuyo valor cambia (el UPDATE lleva
+    únicamente esas columnas). Valida todo antes de tocar nada. Devuelve el
+    set de campos modificados: vacío si no hay nada que escribir.
+    """
+    model = type(obj)
+    campos = CAMPOS[model]
+    errores, cambios = {}, {}
+    for campo, valor in datos.items():
+        if campo in IGNORADOS or campo in CALCULADOS.get(model, ()):
+            continue
+        if campo not in campos:
+            errores[campo] = "campo desconocido o de solo lectura"
+            continue
+        try:
+            valor = convertir(model.__table__.c[campo], valor)
+        except ValueError as e:
+            errores[campo] = str(e)
+            continue
+        if valor != getattr(obj, campo):
+            cambios[campo] = valor
+
+    # Solo se verifican las referencias que cambian (filtradas por tenant)
+    errores.update(referencias_invalidas(model, cambios))
+
+    if errores:
+        raise CambiosInvalidos(errores)
+    for campo, valor in cambios.items():
+        setattr(obj, campo, valor)
+    return set(cambios)
+
+
+# =========================
+# RESPUESTAS (Prefer: return=minimal)
+# =========================
+def prefiere_minimo():
+    preferencias = request.headers.get("Prefer", "")
+    return any(p.split(";")[0].strip().lower() == "return=minimal" for p in preferencias.split(","))
+
+
+def respuesta(obj, clave, status=200):
+    """
+    Representación plana de la fila escrita. Con Prefer: return=minimal no se
+    serializa nada (ni se recarga la fila expirada por el commit): 204, o 201
+    con Location para las altas.
+    """
+    if not prefiere_minimo():
+        return jsonify({clave: obj.to_dict()}), status
+
+    response = make_response("", 204 if status == 200 else status)
+    response.headers["Preference-Applied"] = "return=minimal"
+    if status == 201:
+        # La identidad no expira con el commit: no hace falta otro SELECT
+        response.headers["Location"] = f"{request.path.rstrip('/')}/{db.inspect(obj).identity[0]}"
+    return response
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+# Método de hash vigente. Los hashes guardados con otro método o con otros
+# parámetros se regeneran en el próximo login correcto.
+METODO = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+
+_pool = None
+_pool_lock = threading.Lock()
+_workers = None
+
+
+def init_passwords(app):
+    # PASSWORD_HASH_WORKERS=0 calcula en el thread del request (desarrollo)
+    global _workers
+    _workers = app.config["PASSWORD_HASH_WORKERS"]
+
+
+def _executor():
+    # Se crea en el primer uso: cada worker de gunicorn tiene su propio pool
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=_workers or min(os.cpu_count() or 1, 4),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def _verificar(hash_guardado, password):
+    ok = check_password_hash(hash_guardado, password)
+    nuevo = None
+    if ok and necesita_rehash(hash_guardado):
+        nuevo = generate_password_hash(password, method=METODO)
+    return ok, nuevo
+
+
+def _prefijo(hash_guardado):
+    return hash_guardado.split("$", 1)[0]
+
+
+@cache
+def _prefijo_actual():
+    # Calcula un hash (~100 ms con scrypt): en el primer uso, no al importar
+    return _prefijo(generate_password_hash("", method=METODO))
+
+
+def necesita_rehash(hash_guardado):
+    return _prefijo(hash_guardado) != _prefijo_actual()
+
+
+def verificar(hash_guardado, password):
+    """
+    Devuelve (ok, hash_nuevo). hash_nuevo no es None cuando la contraseña es
+    correcta pero el hash guardado usa parámetros viejos y hay que reemplazarlo.
+    El cálculo (CPU-bound) corre en un pool de procesos acotado.
+    """
+    if _workers == 0:
+        return _verificar(hash_guardado, password)
+    return _executor().submit(_verificar, hash_guardado, password).result()
+
+
+def hashear(password):
+    if _workers == 0:
+        return generate_password_hash(password, method=METODO)
+    return _executor().submit(generate_password_hash, password, METODO).result()
@@ -0,0 +1,206 @@
+import bisect
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+logger = logging.getLogger(__name__)
+
+PERFILES = ("fijo", "workers", "pooler")
+
+# Límites (ms) de los buckets del histograma de espera por una conexión
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class MetricasPool:
+    """
+    Telemetría del pool del proceso: conexiones en uso, espera al pedir una
+    conexión (histograma), costo del pre-ping, overflow y timeouts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.espera_lenta_ms = 500
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.checkouts = self.en_uso = self.pico_en_uso = 0
+            self.conexiones_nuevas = self.overflow = self.timeouts = self.invalidadas = 0
+            self.espera_total_ms = self.espera_max_ms = 0.0
+            self.pre_ping_total_ms = 0.0
+            self.histograma = [0] * (len(BUCKETS_MS) + 1)
+
+    def registrar_checkout(self, espera_ms, pre_ping_ms, overflow):
+        with self._lock:
+            self.checkouts += 1
+            self.espera_total_ms += espera_ms
+            self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+            self.pre_ping_total_ms += pre_ping_ms
+            self.histograma[bisect.bisect_left(BUCKETS_MS, espera_ms)] += 1
+            if overflow:
+                self.overflow += 1
+
+    def estadisticas(self):
+        with self._lock:
+            buckets = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+            return {
+                "checkouts": self.checkouts,
+                "en_uso": self.en_uso,
+                "pico_en_uso": self.pico_en_uso,
+                "conexiones_nuevas": self.conexiones_nuevas,
+                "overflow": self.overflow,
+                "timeouts": self.timeouts,
+                "invalidadas": self.invalidadas,
+                "espera_promedio_ms": round(self.espera_total_ms / self.checkouts, 3) if self.checkouts else None,
+                "espera_max_ms": round(self.espera_max_ms, 3),
+                "pre_ping_promedio_ms": round(self.pre_ping_total_ms / self.checkouts, 3) if self.checkouts else None,
+                "histograma_espera": dict(zip(buckets, self.histograma)),
+            }
+
+
+metricas = MetricasPool()
+
+# Espera del último _do_get de este thread (el pool se comparte entre threads)
+_local = threading.local()
+
+
+# =========================
+# POOLS MEDIDOS
+# =========================
+class _Medido:
+    """
+    _do_get es la espera por una conexión (cola del pool o conexión nueva);
+    el resto de connect() es el pre-ping y el reset del checkout.
+    """
+
+    def connect(self):
+        inicio = time.perf_counter()
+        _local.espera = 0.0
+        conexion = super().connect()
+        total_ms = (time.perf_counter() - inicio) * 1000
+        espera_ms = _local.espera * 1000
+        pre_ping_ms = max(0.0, total_ms - espera_ms) if self._pre_ping else 0.0
+        metricas.registrar_checkout(espera_ms, pre_ping_ms, self._en_overflow())
+        if espera_ms >= metricas.espera_lenta_ms:
+            logger.warning("Espera de %.0f ms por una conexión del pool: %s", espera_ms, self.status())
+        return conexion
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeout:
+            with metricas._lock:
+                metricas.timeouts += 1
+            logger.error("Timeout esperando una conexión del pool: %s", self.status())
+            raise
+        finally:
+            _local.espera = time.perf_counter() - inicio
+
+    def _en_overflow(self):
+        return False
+
+
+class QueuePoolMedido(_Medido, QueuePool):
+    def _en_overflow(self):
+        return self.overflow() > 0
+
+
+class NullPoolMedido(_Medido, NullPool):
+    pass
+
+
+def _al_conectar(dbapi_connection, connection_record):
+    with metricas._lock:
+        metricas.conexiones_nuevas += 1
+
+
+def _al_checkout(dbapi_connection, connection_record, connection_proxy):
+    with metricas._lock:
+        metricas.en_uso += 1
+        metricas.pico_en_uso = max(metricas.pico_en_uso, metricas.en_uso)
+
+
+def _al_checkin(dbapi_connection, connection_record):
+    with metricas._lock:
+        metricas.en_uso = max(0, metricas.en_uso - 1)
+
+
+def _al_invalidar(dbapi_connection, connection_record, exception):
+    with metricas._lock:
+        metricas.invalidadas += 1
+
+
+for _clase in (QueuePoolMedido, NullPoolMedido):
+    event.listen(_clase, "connect", _al_conectar)
+    event.listen(_clase, "checkout", _al_checkout)
+    event.listen(_clase, "checkin", _al_checkin)
+    event.listen(_clase, "invalidate", _al_invalidar)
+
+
+# =========================
+# PERFILES DEL ENGINE
+# =========================
+def tamanio_por_worker(max_conexiones, reservadas, workers, hilos, conexiones_fijas=0):
+    """
+    (pool_size, max_overflow) para que workers procesos quepan juntos en
+    max_conexiones. Cada worker recibe su parte; pool_size cubre sus hilos
+    (más las conexiones que quedan tomadas, como el LISTEN de la cache) y lo
+    que sobra de su parte queda como overflow.
+    """
+    parte = max(1, (max_conexiones - reservadas) // max(1, workers))
+    pool_size = max(1, min(parte, hilos + conexiones_fijas))
+    return pool_size, max(0, parte - pool_size)
+
+
+def opciones_engine(config):
+    perfil = config.get("DB_POOL_PERFIL", "fijo")
+    if perfil not in PERFILES:
+        raise ValueError(f"DB_POOL_PERFIL inválido: {perfil!r} (válidos: {', '.join(PERFILES)})")
+
+    if perfil == "pooler":
+        # PgBouncer / pooler de Supabase en modo transacción: el pooler ya
+        # reparte las conexiones reales, así que no se guarda ninguna en el
+        # proceso (cada checkout abre una contra el pooler, sin pre-ping).
+        # psycopg2 no usa prepared statements del lado del servidor; con
+        # psycopg 3 hay que desactivarlos porque no sobreviven entre transacciones.
+        opciones = {"poolclass": NullPoolMedido, "pool_pre_ping": False}
+        if str(config.get("SQLALCHEMY_DATABASE_URI") or "").startswith("postgresql+psycopg:"):
+            opciones["connect_args"] = {"prepare_threshold": None}
+        return opciones
+
+    if perfil == "workers":
+        pool_size, max_overflow = tamanio_por_worker(
+            config["DB_MAX_CONEXIONES"],
+            config["DB_CONEXIONES_RESERVADAS"],
+            config["WEB_CONCURRENCY"],
+            config["GUNICORN_THREADS"],
+            # La conexión del LISTEN de la cache queda tomada todo el tiempo
+            1 if config.get("CACHE_LISTEN_NOTIFY") else 0,
+        )
+    else:
+        pool_size, max_overflow = config["DB_POOL_SIZE"], config["DB_MAX_OVERFLOW"]
+
+    return {
+        "poolclass": QueuePoolMedido,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+
+
+def init_pool(app):
+    """Antes de db.init_app: el engine se crea con estas opciones."""
+    metricas.espera_lenta_ms = app.config.get("DB_POOL_ESPERA_LENTA_MS", metricas.espera_lenta_ms)
+    if app.config.get("SQLALCHEMY_ENGINE_OPTIONS") is None:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = opciones_engine(app.config)
+
+    if app.config.get("DB_POOL_PERFIL") == "pooler" and app.config.get("CACHE_LISTEN_NOTIFY"):
+        logger.warning("CACHE_LISTEN_NOTIFY no funciona a través de un pooler en modo transacción")
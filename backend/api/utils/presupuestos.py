@@ -0,0 +1,241 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import delete, event, insert, select, update
+from sqlalchemy.orm import Session
+
+from api.models import db, Componente, Presupuesto
+from api.utils import versiones
+
+
+CENTAVOS = Decimal("0.01")
+
+
+class ComponentesInvalidos(ValueError):
+    pass
+
+
+def subtotal(cantidad, precio):
+    return Decimal(cantidad) * Decimal(precio)
+
+
+# =========================
+# VALIDACION
+# =========================
+def _precio(valor):
+    try:
+        precio = Decimal(str(valor)).quantize(CENTAVOS)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return precio if precio >= 0 else None
+
+
+def validar_lineas(lineas):
+    """Normaliza la lista de componentes: [{id?, nombre, cantidad, precio}]."""
+    if not isinstance(lineas, list):
+        raise ComponentesInvalidos("'componentes' debe ser una lista")
+
+    validas, errores, ids = [], [], set()
+    for numero, linea in enumerate(lineas, start=1):
+        if not isinstance(linea, dict):
+            errores.append({"linea": numero, "errores": {"linea": "debe ser un objeto"}})
+            continue
+
+        err = {}
+        nombre = linea.get("nombre")
+        if not nombre or len(str(nombre)) > 120:
+            err["nombre"] = "requerido (máximo 120 caracteres)"
+
+        cantidad = linea.get("cantidad")
+        if isinstance(cantidad, bool) or not isinstance(cantidad, int) or cantidad <= 0:
+            err["cantidad"] = "debe ser un entero mayor a 0"
+
+        precio = _precio(linea.get("precio"))
+        if precio is None:
+            err["precio"] = "debe ser un número mayor o igual a 0"
+
+        id = linea.get("id")
+        if id is not None:
+            if isinstance(id, bool) or not isinstance(id, int):
+                err["id"] = "debe ser un entero"
+            elif id in ids:
+                err["id"] = "repetido"
+            ids.add(id)
+
+        if err:
+            errores.append({"linea": numero, "errores": err})
+        else:
+            validas.append({"id": id, "nombre": str(nombre), "cantidad": cantidad, "precio": precio})
+
+    if errores:
+        raise ComponentesInvalidos(errores)
+    return validas
+
+
+# =========================
+# ALTA Y REEMPLAZO DE LINEAS
+# =========================
+def total_lineas(lineas):
+    return sum((subtotal(l["cantidad"], l["precio"]) for l in lineas), Decimal(0))
+
+
+def insertar_lineas(presupuesto, lineas):
+    """Líneas de un presupuesto recién creado: un único INSERT (executemany)."""
+    db.session.flush()
+    db.session.execute(
+        insert(Componente),
+        [
+            {"presupuesto_id": presupuesto.id, "nombre": l["nombre"], "cantidad": l["cantidad"], "precio": l["precio"]}
+            for l in lineas
+        ],
+    )
+    versiones.bump(presupuesto.empresa_id, Componente.__tablename__)
+
+
+def reemplazar_componentes(presupuesto_id, lineas):
+    """
+    Deja el presupuesto con exactamente estas líneas en una transacción:
+    las que traen id se actualizan, las nuevas se insertan y las que faltan
+    se borran (un statement por operación). El total se ajusta con el delta
+    de las líneas tocadas. Devuelve (presupuesto, componentes) serializados,
+    o None si el presupuesto no existe.
+    """
+    # FOR UPDATE: dos reemplazos concurrentes del mismo presupuesto se serializan
+    cabecera = db.session.execute(
+        select(Presupuesto.id, Presupuesto.empresa_id, Presupuesto.total)
+        .where(Presupuesto.id == presupuesto_id)
+        .with_for_update()
+    ).first()
+    if cabecera is None:
+        return None
+
+    actuales = {
+        fila.id: fila
+        for fila in db.session.execute(
+            select(Componente.id, Componente.cantidad, Componente.precio)
+            .where(Componente.presupuesto_id == presupuesto_id)
+        )
+    }
+
+    desconocidos = [l["id"] for l in lineas if l["id"] is not None and l["id"] not in actuales]
+    if desconocidos:
+        raise ComponentesInvalidos(f"Componentes inexistentes en el presupuesto: {desconocidos}")
+
+    delta = Decimal(0)
+    nuevas, modificadas = [], []
+    for linea in lineas:
+        if linea["id"] is None:
+            nuevas.append(linea)
+            delta += subtotal(linea["cantidad"], linea["precio"])
+            continue
+        actual = actuales[linea["id"]]
+        delta += subtotal(linea["cantidad"], linea["precio"]) - subtotal(actual.cantidad, actual.precio)
+        modificadas.append(linea)
+
+    conservadas = {l["id"] for l in modificadas}
+    borradas = [id for id in actuales if id not in conservadas]
+    for id in borradas:
+        delta -= subtotal(actuales[id].cantidad, actuales[id].precio)
+
+    if borradas:
+        db.session.execute(
+            delete(Componente).where(Componente.id.in_(borradas)),
+            execution_options={"synchronize_session": False},
+        )
+    if modificadas:
+        db.session.execute(
+            update(Componente),
+            [{"id": l["id"], "nombre": l["nombre"], "cantidad": l["cantidad"], "precio": l["precio"]} for l in modificadas],
+        )
+    if nuevas:
+        ids = db.session.execute(
+            insert(Componente).returning(Componente.id, sort_by_parameter_order=True),
+            [
+                {"presupuesto_id": presupuesto_id, "nombre": l["nombre"], "cantidad": l["cantidad"], "precio": l["precio"]}
+                for l in nuevas
+            ],
+        ).scalars().all()
+        for linea, id in zip(nuevas, ids):
+            linea["id"] = id
+    # Siempre: aunque el total no cambie, el UPDATE toca updated_at (feed de /cambios)
+    db.session.execute(
+        update(Presupuesto)
+        .where(Presupuesto.id == presupuesto_id)
+        .values(total=Presupuesto.total + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+    versiones.bump(cabecera.empresa_id, Componente.__tablename__, Presupuesto.__tablename__)
+    db.session.commit()
+
+    total = Decimal(cabecera.total or 0) + delta
+    componentes = [
+        {
+            "id": l["id"],
+            "presupuesto_id": presupuesto_id,
+            "nombre": l["nombre"],
+            "cantidad": l["cantidad"],
+            "precio": float(l["precio"]),
+        }
+        for l in lineas
+    ]
+    return {"id": presupuesto_id, "total": float(total)}, componentes
+
+
+# =========================
+# TOTAL INCREMENTAL (ORM)
+# =========================
+def _valor_anterior(estado, campo):
+    # Valor en la base antes de los cambios pendientes de este flush
+    historia = estado.attrs[campo].history
+    if historia.deleted:
+        return historia.deleted[0]
+    return getattr(estado.obj(), campo)
+
+
+def _ajustar_totales(session, flush_context, instances):
+    """Altas, cambios y bajas de componentes por el ORM ajustan el total de su presupuesto."""
+    borrados = {p.id for p in session.deleted if isinstance(p, Presupuesto)}
+    deltas = defaultdict(Decimal)
+
+    for obj in session.new:
+        if isinstance(obj, Componente):
+            destino = obj.presupuesto_id or obj.presupuesto
+            deltas[destino] += subtotal(obj.cantidad, obj.precio)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Componente) or not session.is_modified(obj):
+            continue
+        estado = db.inspect(obj)
+        anterior = subtotal(_valor_anterior(estado, "cantidad"), _valor_anterior(estado, "precio"))
+        viejo_presupuesto = _valor_anterior(estado, "presupuesto_id")
+        deltas[viejo_presupuesto] -= anterior
+        deltas[obj.presupuesto_id] += subtotal(obj.cantidad, obj.precio)
+
+    for obj in session.deleted:
+        if isinstance(obj, Componente):
+            estado = db.inspect(obj)
+            anterior = subtotal(_valor_anterior(estado, "cantidad"), _valor_anterior(estado, "precio"))
+            deltas[_valor_anterior(estado, "presupuesto_id")] -= anterior
+
+    # Los que reciben UPDATE en este flush (ya escriben su updated_at): total
+    # queda expirado, así que después del flush is_modified() no los ve
+    actualizados = session.info["presupuestos_actualizados"] = set()
+    with session.no_autoflush:
+        for destino, delta in deltas.items():
+            if not delta or destino is None or destino in borrados:
+                continue
+            presupuesto = destino if isinstance(destino, Presupuesto) else session.get(Presupuesto, destino)
+            if presupuesto is None:
+                continue
+            if presupuesto in session.new:
+                presupuesto.total = Decimal(presupuesto.total or 0) + delta
+            else:
+                # UPDATE ... SET total = total + delta (atómico frente a otros requests)
+                presupuesto.total = Presupuesto.total + delta
+                actualizados.add(presupuesto.id)
+
+
+def init_presupuestos(app):
+    if not event.contains(Session, "before_flush", _ajustar_totales):
+        event.listen(Session, "before_flush", _ajustar_totales)
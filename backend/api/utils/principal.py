@@ -0,0 +1,83 @@
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from api.models import db, Usuario
+from api.utils import cache
+
+
+class Principal:
+    """Lo mínimo del usuario autenticado que necesitan las rutas (sin ORM ni relaciones)."""
+
+    __slots__ = ("id", "empresa_id", "rol", "activo")
+
+    def __init__(self, id, empresa_id, rol, activo):
+        self.id = id
+        self.empresa_id = empresa_id
+        self.rol = rol
+        self.activo = activo
+
+    def __repr__(self):
+        return f"<Principal {self.id} empresa={self.empresa_id} rol={self.rol}>"
+
+
+# Cache por identidad del token. Los cambios de usuarios la invalidan al hacer
+# commit en este proceso y, con CACHE_LISTEN_NOTIFY, en los demás workers por
+# el canal de la cache; sin LISTEN/NOTIFY los otros workers esperan al TTL.
+principales = cache.CacheLRU(maxsize=4096, ttl=60)
+
+
+def cargar_principal(usuario_id):
+    """Principal del usuario (None si no existe). Sin consulta si está en cache."""
+    clave = ("principal", usuario_id)
+    principal = principales.get(clave)
+    if principal is not None:
+        return principal
+
+    fila = db.session.execute(
+        select(Usuario.id, Usuario.empresa_id, Usuario.rol, Usuario.activo)
+        .where(Usuario.id == usuario_id)
+        .execution_options(sin_tenant=True)
+    ).first()
+    if fila is None:
+        return None
+
+    principal = Principal(*fila)
+    principales.set(clave, principal, (Usuario.__tablename__,))
+    return principal
+
+
+# =========================
+# INVALIDACION
+# =========================
+def _registrar_usuarios(session, flush_context):
+    ids = session.info.setdefault("principales", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Usuario) and obj.id is not None:
+            ids.add(obj.id)
+
+
+def _descartar(usuario_id):
+    principales.descartar(("principal", int(usuario_id)))
+
+
+def _despues_commit(session):
+    ids = session.info.pop("principales", ())
+    for usuario_id in ids:
+        _descartar(usuario_id)
+    cache.publicar([f"principal:{usuario_id}" for usuario_id in ids])
+
+
+def _despues_rollback(session):
+    session.info.pop("principales", None)
+
+
+def init_principal(app):
+    principales.maxsize = app.config.get("PRINCIPAL_CACHE_MAXSIZE", principales.maxsize)
+    principales.ttl = app.config.get("PRINCIPAL_CACHE_TTL", principales.ttl)
+
+    if not event.contains(Session, "after_flush", _registrar_usuarios):
+        event.listen(Session, "after_flush", _registrar_usuarios)
+        event.listen(Session, "after_commit", _despues_commit)
+        event.listen(Session, "after_rollback", _despues_rollback)
+
+    cache.suscribir("principal", _descartar, principales.limpiar)
@@ -0,0 +1,147 @@
+import logging
+import time
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import current_app, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger(__name__)
+
+# Contadores activos en el contexto actual (request y/o assert_max_queries)
+_contadores = ContextVar("contadores_sql", default=())
+
+
+class ContadorQueries:
+    __slots__ = ("cantidad", "tiempo", "sentencias")
+
+    def __init__(self):
+        self.cantidad = 0
+        self.tiempo = 0.0
+        self.sentencias = []
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# =========================
+# EVENTOS DEL ENGINE
+# =========================
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    context._inicio_sql = time.perf_counter()
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - context._inicio_sql
+    for contador in _contadores.get():
+        contador.cantidad += 1
+        contador.tiempo += duracion
+        contador.sentencias.append(statement)
+
+
+def _activar(contador):
+    return _contadores.set(_contadores.get() + (contador,))
+
+
+# =========================
+# POR REQUEST
+# =========================
+def _iniciar_request():
+    g.queries = ContadorQueries()
+    g.queries_token = _activar(g.queries)
+
+
+def _headers(response):
+    contador = g.get("queries")
+    if contador is None:
+        return response
+
+    ms = contador.tiempo * 1000
+    response.headers["X-Query-Count"] = str(contador.cantidad)
+    response.headers.add("Server-Timing", f'db;dur={ms:.1f};desc="{contador.cantidad} queries"')
+    return response
+
+
+def _cerrar_request(exception=None):
+    # teardown corre siempre, incluso si la vista lanzó una excepción
+    token = g.pop("queries_token", None)
+    if token is not None:
+        _contadores.reset(token)
+
+
+def queries_request():
+    """Contador del request actual (None fuera de un request)."""
+    return g.get("queries")
+
+
+def init_query_stats(app):
+    app.before_request(_iniciar_request)
+    app.after_request(_headers)
+    app.teardown_request(_cerrar_request)
+    if not event.contains(Engine, "before_cursor_execute", _antes):
+        event.listen(Engine, "before_cursor_execute", _antes)
+        event.listen(Engine, "after_cursor_execute", _despues)
+
+
+# =========================
+# PRESUPUESTO DE QUERIES
+# =========================
+def _reportar(nombre, contador, maximo):
+    mensaje = f"{nombre}: {contador.cantidad} queries (máximo {maximo})"
+    detalle = "\n".join(contador.sentencias)
+    if current_app.config.get("QUERY_BUDGET_ENFORCE"):
+        raise QueryBudgetExceeded(f"{mensaje}\n{detalle}")
+    logger.warning(mensaje)
+
+
+def max_queries(maximo):
+    """
+    Presupuesto de queries de un endpoint. Cuenta todo el request (incluida la
+    resolución del tenant). Con QUERY_BUDGET_ENFORCE (tests) superarlo lanza
+    QueryBudgetExceeded; en producción solo se loguea.
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            respuesta = fn(*args, **kwargs)
+            contador = queries_request()
+            if contador is not None and contador.cantidad > maximo:
+                _reportar(fn.__name__, contador, maximo)
+            return respuesta
+
+        wrapper.max_queries = maximo
+        return wrapper
+
+    return decorator
+
+
+class assert_max_queries(ContextDecorator):
+    """
+    Para tests:
+
+        with assert_max_queries(3):
+            client.get("/api/clientes", headers=headers)
+    """
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.contador = None
+
+    def __enter__(self):
+        self.contador = ContadorQueries()
+        self._token = _activar(self.contador)
+        return self.contador
+
+    def __exit__(self, *exc):
+        _contadores.reset(self._token)
+        if exc[0] is None and self.contador.cantidad > self.maximo:
+            detalle = "\n".join(self.contador.sentencias)
+            raise QueryBudgetExceeded(
+                f"{self.contador.cantidad} queries (máximo {self.maximo})\n{detalle}"
+            )
+        return False
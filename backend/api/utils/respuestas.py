@@ -0,0 +1,130 @@
+import gzip
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# JSON
+# =========================
+def _default(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+
+class ProveedorEstandar(DefaultJSONProvider):
+    """json de la stdlib con fechas ISO 8601 y Decimal como número (igual que orjson)."""
+
+    default = staticmethod(_default)
+
+
+class ProveedorOrjson(JSONProvider):
+    """
+    orjson: serializa fechas de forma nativa (ISO 8601) y escribe los bytes
+    de la respuesta directamente, sin pasar por str. Las claves no se ordenan.
+    """
+
+    OPCIONES = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.OPCIONES).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        cuerpo = orjson.dumps(obj, default=_default, option=self.OPCIONES)
+        return self._app.response_class(cuerpo, mimetype="application/json")
+
+
+PROVEEDORES = {"orjson": ProveedorOrjson, "estandar": ProveedorEstandar}
+
+
+def proveedor_json(nombre):
+    if nombre not in PROVEEDORES:
+        raise ValueError(f"JSON_PROVIDER inválido: {nombre!r} (válidos: {', '.join(PROVEEDORES)})")
+    if nombre == "orjson" and orjson is None:
+        logger.warning("orjson no está instalado: se usa el JSON estándar")
+        return ProveedorEstandar
+    return PROVEEDORES[nombre]
+
+
+# =========================
+# COMPRESION
+# =========================
+COMPRIMIBLES = ("application/json", "text/csv", "text/html", "text/plain")
+
+
+def codificaciones_disponibles():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def comprimir(datos, codificacion, nivel_gzip=6, calidad_brotli=4):
+    if codificacion == "br":
+        return brotli.compress(datos, quality=calidad_brotli)
+    # mtime=0: el mismo cuerpo da los mismos bytes
+    return gzip.compress(datos, compresslevel=nivel_gzip, mtime=0)
+
+
+def _comprimir_respuesta(app, response):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRIMIBLES
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    datos = response.get_data()
+    if len(datos) < app.config["COMPRESION_MIN_BYTES"]:
+        return response
+
+    codificacion = request.accept_encodings.best_match(codificaciones_disponibles())
+    if codificacion is None:
+        return response
+
+    response.set_data(comprimir(
+        datos, codificacion,
+        app.config["COMPRESION_NIVEL_GZIP"],
+        app.config["COMPRESION_CALIDAD_BROTLI"],
+    ))
+    response.headers["Content-Encoding"] = codificacion
+    # El cuerpo cambia por codificación: un ETag fuerte deja de valer
+    etag, debil = response.get_etag()
+    if etag and not debil:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_respuestas(app):
+    """Antes que los demás after_request: la compresión tiene que correr última."""
+    app.json_provider_class = proveedor_json(app.config.get("JSON_PROVIDER", "orjson"))
+    app.json = app.json_provider_class(app)
+
+    if app.config.get("COMPRESION_HABILITADA"):
+        @app.after_request
+        def _comprimir(response):
+            return _comprimir_respuesta(app, response)
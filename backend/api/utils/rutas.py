@@ -0,0 +1,248 @@
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from api.models import db, Cliente, Instalacion, Usuario
+from api.utils.geo import RADIO_TIERRA_KM
+
+
+TIEMPO_MAX_MS = 300
+VELOCIDAD_KMH = 30
+MINUTOS_POR_VISITA = 45
+
+
+# =========================
+# DATOS
+# =========================
+def paradas_del_dia(empresa_id, fecha, incluir_vencidas=True):
+    """Instalaciones activas con mantenimiento ese día (y las vencidas) con la ubicación del cliente."""
+    condicion = (
+        Instalacion.proximo_mantenimiento <= fecha
+        if incluir_vencidas
+        else Instalacion.proximo_mantenimiento == fecha
+    )
+    filas = db.session.execute(
+        select(
+            Instalacion.id,
+            Instalacion.cliente_id,
+            Instalacion.proximo_mantenimiento,
+            Cliente.nombre,
+            Cliente.direccion,
+            Cliente.lat,
+            Cliente.lng,
+        )
+        .join(Cliente, Cliente.id == Instalacion.cliente_id)
+        .where(Instalacion.empresa_id == empresa_id, Instalacion.activa.is_(True), condicion)
+        .order_by(Instalacion.proximo_mantenimiento, Instalacion.id)
+    )
+    return [
+        {
+            "instalacion_id": id,
+            "cliente_id": cliente_id,
+            "proximo_mantenimiento": proximo.isoformat() if proximo else None,
+            "cliente": nombre,
+            "direccion": direccion,
+            "lat": lat,
+            "lng": lng,
+        }
+        for id, cliente_id, proximo, nombre, direccion, lat, lng in filas
+    ]
+
+
+def instaladores(empresa_id, ids=None):
+    stmt = select(Usuario.id, Usuario.nombre).where(
+        Usuario.empresa_id == empresa_id,
+        Usuario.activo.is_(True),
+        Usuario.rol == "INSTALADOR",
+    )
+    if ids is not None:
+        stmt = stmt.where(Usuario.id.in_(ids))
+    return [{"id": id, "nombre": nombre} for id, nombre in db.session.execute(stmt.order_by(Usuario.id))]
+
+
+# =========================
+# DISTANCIAS
+# =========================
+def matriz_distancias(lat, lng):
+    """Matriz n x n de distancias haversine en km, sin loops de Python."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distancias_desde(lat0, lng0, lat, lng):
+    """Distancias en km desde un punto a cada parada."""
+    lat0, lng0 = np.radians(lat0), np.radians(lng0)
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lng - lng0) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _con_inicio(d, desde_inicio):
+    """
+    Agrega el nodo 0 (punto de partida) a la matriz. Sin origen es un nodo
+    ficticio a distancia 0 de todos: el recorrido queda abierto en ambos extremos.
+    """
+    n = d.shape[0]
+    m = np.zeros((n + 1, n + 1))
+    m[1:, 1:] = d
+    if desde_inicio is not None:
+        m[0, 1:] = desde_inicio
+        m[1:, 0] = desde_inicio
+    return m
+
+
+# =========================
+# ASIGNACION (SWEEP)
+# =========================
+def asignar(lat, lng, k, origen=None):
+    """
+    Reparte las paradas en k grupos de tamaño parejo barriendo por ángulo
+    alrededor del origen (o del centroide): cada técnico recibe un sector.
+    """
+    n = len(lat)
+    if k <= 0 or n == 0:
+        return []
+    centro_lat, centro_lng = origen if origen is not None else (np.mean(lat), np.mean(lng))
+    angulos = np.arctan2(
+        np.asarray(lat) - centro_lat,
+        (np.asarray(lng) - centro_lng) * np.cos(np.radians(centro_lat)),
+    )
+    orden = np.argsort(angulos, kind="stable")
+    # El corte arranca en el hueco angular más grande para no partir un grupo compacto
+    if n > 1:
+        ordenados = angulos[orden]
+        huecos = np.diff(np.append(ordenados, ordenados[0] + 2 * np.pi))
+        orden = np.roll(orden, -(int(np.argmax(huecos)) + 1))
+    return [grupo for grupo in np.array_split(orden, k)]
+
+
+# =========================
+# ORDEN DE VISITA
+# =========================
+def vecino_mas_cercano(d):
+    """Recorrido desde el nodo 0 yendo siempre a la parada más cercana sin visitar."""
+    n = d.shape[0]
+    visitado = np.zeros(n, dtype=bool)
+    visitado[0] = True
+    recorrido = [0]
+    actual = 0
+    for _ in range(n - 1):
+        fila = np.where(visitado, np.inf, d[actual])
+        actual = int(np.argmin(fila))
+        visitado[actual] = True
+        recorrido.append(actual)
+    return np.array(recorrido)
+
+
+def dos_opt(d, recorrido, limite):
+    """
+    2-opt sobre un recorrido abierto que empieza en el nodo 0 (fijo). Para
+    cada i evalúa todas las inversiones [i..j] de una vez con NumPy y aplica
+    la mejor. Corta al no haber mejoras o al llegar a 'limite' (perf_counter).
+    """
+    p = recorrido.copy()
+    n = len(p)
+    if n < 4:
+        return p
+    mejoro = True
+    while mejoro and time.perf_counter() < limite:
+        mejoro = False
+        for i in range(1, n - 1):
+            j = np.arange(i + 1, n)
+            a, b = p[i - 1], p[i]
+            c = p[j]
+            siguiente = np.append(p[j[:-1] + 1], -1)
+            actual = d[a, b] + np.where(siguiente >= 0, d[c, siguiente], 0.0)
+            nuevo = d[a, c] + np.where(siguiente >= 0, d[b, siguiente], 0.0)
+            ganancia = actual - nuevo
+            mejor = int(np.argmax(ganancia))
+            if ganancia[mejor] > 1e-9:
+                k = j[mejor]
+                p[i:k + 1] = p[i:k + 1][::-1]
+                mejoro = True
+            if time.perf_counter() >= limite:
+                break
+    return p
+
+
+def largo(d, recorrido):
+    return float(d[recorrido[:-1], recorrido[1:]].sum()) if len(recorrido) > 1 else 0.0
+
+
+# =========================
+# PLANIFICACION
+# =========================
+def planificar(paradas, tecnicos, origen=None, tiempo_max_ms=TIEMPO_MAX_MS,
+               velocidad_kmh=VELOCIDAD_KMH, minutos_por_visita=MINUTOS_POR_VISITA):
+    """
+    paradas: dicts con lat/lng (las que no tienen ubicación quedan fuera).
+    tecnicos: dicts {id, nombre}. origen: (lat, lng) de salida o None.
+    """
+    inicio = time.perf_counter()
+    limite = inicio + tiempo_max_ms / 1000
+
+    ubicadas, sin_ubicacion = [], []
+    for parada in paradas:
+        if parada.get("lat") is None or parada.get("lng") is None:
+            sin_ubicacion.append(parada["instalacion_id"])
+        else:
+            ubicadas.append(parada)
+
+    rutas = []
+    largo_nn = largo_final = 0.0
+    if ubicadas and tecnicos:
+        lat = np.array([p["lat"] for p in ubicadas])
+        lng = np.array([p["lng"] for p in ubicadas])
+        d = matriz_distancias(lat, lng)
+        desde_origen = None
+        if origen is not None:
+            desde_origen = distancias_desde(origen[0], origen[1], lat, lng)
+
+        grupos = asignar(lat, lng, min(len(tecnicos), len(ubicadas)), origen)
+        for numero, (tecnico, grupo) in enumerate(zip(tecnicos, grupos)):
+            sub = _con_inicio(d[np.ix_(grupo, grupo)], None if desde_origen is None else desde_origen[grupo])
+            recorrido_nn = vecino_mas_cercano(sub)
+            # El tiempo que queda se reparte entre los recorridos que faltan
+            restante = max(0.0, limite - time.perf_counter())
+            recorrido = dos_opt(sub, recorrido_nn, time.perf_counter() + restante / (len(grupos) - numero))
+            largo_nn += largo(sub, recorrido_nn)
+            km = largo(sub, recorrido)
+            largo_final += km
+
+            visitas = []
+            for orden, nodo in enumerate(recorrido[1:], start=1):
+                parada = ubicadas[grupo[nodo - 1]]
+                anterior = recorrido[orden - 1]
+                visitas.append({**parada, "orden": orden, "tramo_km": round(float(sub[anterior, nodo]), 3)})
+
+            rutas.append({
+                "instalador": tecnico,
+                "paradas": visitas,
+                "distancia_km": round(km, 3),
+                "duracion_min": round(km / velocidad_kmh * 60 + len(visitas) * minutos_por_visita),
+            })
+
+    # Técnicos sin paradas (menos paradas que técnicos)
+    asignados = {r["instalador"]["id"] for r in rutas}
+    rutas += [
+        {"instalador": t, "paradas": [], "distancia_km": 0.0, "duracion_min": 0}
+        for t in tecnicos if t["id"] not in asignados
+    ]
+
+    return {
+        "rutas": rutas,
+        "sin_ubicacion": sin_ubicacion,
+        "sin_asignar": [p["instalacion_id"] for p in ubicadas] if not tecnicos else [],
+        "estadisticas": {
+            "paradas": len(ubicadas),
+            "ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "distancia_vecino_mas_cercano_km": round(largo_nn, 3),
+            "distancia_km": round(largo_final, 3),
+        },
+    }
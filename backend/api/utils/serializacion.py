@@ -0,0 +1,87 @@
+from flask import request
+from sqlalchemy.orm import joinedload, selectinload
+
+from api.utils.pagination import ParametroInvalido
+
+
+MAX_EXPAND_DEPTH = 3
+
+
+def _relacion(model, nombre):
+    if nombre not in model.__expandibles__:
+        permitidos = ", ".join(model.__expandibles__) or "ninguna"
+        raise ParametroInvalido(
+            f"No se puede expandir '{nombre}' en {model.__name__} (permitidas: {permitidos})"
+        )
+    return getattr(model, nombre)
+
+
+def parse_expand(model, valor):
+    """'instalaciones.mantenimientos,pendientes' -> {"instalaciones": {"mantenimientos": {}}, "pendientes": {}}"""
+    arbol = {}
+    for ruta in filter(None, (r.strip() for r in (valor or "").split(","))):
+        partes = ruta.split(".")
+        if len(partes) > MAX_EXPAND_DEPTH:
+            raise ParametroInvalido(f"'expand' admite como máximo {MAX_EXPAND_DEPTH} niveles")
+
+        actual_model = model
+        nodo = arbol
+        for parte in partes:
+            rel = _relacion(actual_model, parte)
+            actual_model = rel.property.mapper.class_
+            nodo = nodo.setdefault(parte, {})
+    return arbol
+
+
+def parse_fields(valor):
+    campos = {f.strip() for f in (valor or "").split(",") if f.strip()}
+    return campos or None
+
+
+def opciones_carga(model, arbol, padre=None):
+    """Loader options para cargar solo las relaciones pedidas en 'expand'."""
+    opciones = []
+    for nombre, sub in arbol.items():
+        rel = getattr(model, nombre)
+        if rel.property.uselist:
+            opcion = padre.selectinload(rel) if padre is not None else selectinload(rel)
+        else:
+            opcion = padre.joinedload(rel) if padre is not None else joinedload(rel)
+        hijas = opciones_carga(rel.property.mapper.class_, sub, opcion)
+        opciones.extend(hijas or [opcion])
+    return opciones
+
+
+class Vista:
+    """
+    Representación pedida por el cliente: ?fields=id,nombre&expand=instalaciones.mantenimientos
+
+    Por defecto la representación es plana (sin relaciones).
+    """
+
+    def __init__(self, model, fields=None, expand=None):
+        self.model = model
+        self.fields = fields
+        self.expand = expand or {}
+
+    @classmethod
+    def desde_request(cls, model, default_expand=None):
+        expand = request.args.get("expand", default_expand)
+        return cls(
+            model,
+            fields=parse_fields(request.args.get("fields")),
+            expand=parse_expand(model, expand),
+        )
+
+    @property
+    def opciones(self):
+        return opciones_carga(self.model, self.expand)
+
+    def query(self):
+        return self.model.query.options(*self.opciones)
+
+    def serializar(self, obj):
+        return obj.to_dict(self.fields, self.expand)
+
+    def serializar_lista(self, objs):
+        return [obj.to_dict(self.fields, self.expand) for obj in objs]
@@ -0,0 +1,114 @@
+from flask import g, has_request_context, jsonify
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from api.models import (
+    Usuario,
+    Empresa,
+    Cliente,
+    Instalacion,
+    Mantenimiento,
+    Pendiente,
+    Presupuesto,
+    Componente,
+)
+from api.utils.principal import cargar_principal
+
+
+# Modelos con columna empresa_id: se filtran automáticamente por el tenant
+MODELOS_TENANT = (Usuario, Cliente, Instalacion, Mantenimiento, Pendiente, Presupuesto)
+
+
+def empresa_actual():
+    """empresa_id del usuario del token, o None si el request no está autenticado."""
+    if not has_request_context():
+        return None
+    return g.get("empresa_id")
+
+
+def usuario_actual():
+    """Principal del usuario autenticado, o None si el request no está autenticado."""
+    if not has_request_context():
+        return None
+    return g.get("principal")
+
+
+def _resolver_empresa():
+    # El principal sale de la cache: sin consulta en el camino habitual
+    g.empresa_id = None
+    g.principal = None
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        # Token inválido/expirado: lo rechaza @jwt_required en la ruta
+        return
+    identidad = get_jwt_identity()
+    if identidad is None:
+        return
+
+    principal = cargar_principal(identidad)
+    if principal is None or not principal.activo:
+        # Token vigente de un usuario borrado o desactivado
+        return jsonify({"message": "Usuario inexistente o inactivo"}), 401
+
+    g.principal = principal
+    g.empresa_id = principal.empresa_id
+
+
+def criterios_tenant(empresa_id):
+    """Opciones with_loader_criteria que restringen cada modelo al tenant."""
+    opciones = [
+        with_loader_criteria(
+            model, lambda cls: cls.empresa_id == empresa_id, include_aliases=True
+        )
+        for model in MODELOS_TENANT
+    ]
+    opciones.append(
+        with_loader_criteria(Empresa, lambda cls: cls.id == empresa_id, include_aliases=True)
+    )
+    # Componente no tiene empresa_id: se filtra a través de su presupuesto
+    opciones.append(
+        with_loader_criteria(
+            Componente,
+            lambda cls: cls.presupuesto_id.in_(
+                select(Presupuesto.id).where(Presupuesto.empresa_id == empresa_id)
+            ),
+            include_aliases=True,
+        )
+    )
+    return opciones
+
+
+def _filtrar_por_empresa(execute_state):
+    if (
+        not execute_state.is_select
+        or execute_state.is_column_load
+        or execute_state.is_relationship_load
+        or execute_state.execution_options.get("sin_tenant", False)
+    ):
+        return
+
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return
+
+    execute_state.statement = execute_state.statement.options(*criterios_tenant(empresa_id))
+
+
+def _asignar_empresa(session, flush_context, instances):
+    # Con un usuario autenticado las escrituras van siempre a su empresa: un
+    # empresa_id de otro tenant (en el body o asignado a mano) no se respeta
+    empresa_id = empresa_actual()
+    if empresa_id is None:
+        return
+    for obj in session.new | session.dirty:
+        if isinstance(obj, MODELOS_TENANT) and obj.empresa_id != empresa_id:
+            obj.empresa_id = empresa_id
+
+
+def init_tenancy(app):
+    app.before_request(_resolver_empresa)
+    if not event.contains(Session, "do_orm_execute", _filtrar_por_empresa):
+        event.listen(Session, "do_orm_execute", _filtrar_por_empresa)
+        event.listen(Session, "before_flush", _asignar_empresa)
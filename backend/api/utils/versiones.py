@@ -0,0 +1,130 @@
+import hashlib
+from functools import wraps
+
+from flask import make_response, request
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from api.models import db, Empresa, Componente, Version
+from api.utils.serializacion import parse_expand
+from api.utils.tenancy import MODELOS_TENANT, empresa_actual
+
+
+# =========================
+# CONTADORES
+# =========================
+def _upsert(dialecto):
+    return pg_insert if dialecto == "postgresql" else sqlite_insert
+
+
+def incrementar(conn, cambios):
+    """cambios: set de (empresa_id, entidad). Un único UPSERT multi-fila, en la misma transacción."""
+    if not cambios:
+        return
+    insert = _upsert(conn.dialect.name)
+    # Ordenadas: dos transacciones bloquean las filas de versiones en el mismo orden
+    filas = [{"empresa_id": e, "entidad": entidad, "version": 1} for e, entidad in sorted(cambios)]
+    stmt = insert(Version).values(filas).on_conflict_do_update(
+        index_elements=[Version.empresa_id, Version.entidad],
+        set_={"version": Version.version + 1},
+    )
+    conn.execute(stmt)
+
+
+def cambios_pendientes(session):
+    """(empresa_id, entidad) escritos en la transacción en curso (los usa la cache al hacer commit)."""
+    return session.info.setdefault("cambios", set())
+
+
+def bump(empresa_id, *entidades):
+    """Para escrituras que no pasan por el flush del ORM (bulk insert/update)."""
+    cambios = {(empresa_id, entidad) for entidad in entidades}
+    incrementar(db.session.connection(), cambios)
+    cambios_pendientes(db.session()).update(cambios)
+
+
+def _empresa_de(obj):
+    if isinstance(obj, Empresa):
+        return obj.id
+    if isinstance(obj, MODELOS_TENANT):
+        return obj.empresa_id
+    if isinstance(obj, Componente):
+        return empresa_actual()
+    return None
+
+
+def _registrar_cambios(session, flush_context):
+    cambios = set()
+    modificados = [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in list(session.new) + modificados + list(session.deleted):
+        if isinstance(obj, Version):
+            continue
+        empresa_id = _empresa_de(obj)
+        if empresa_id is not None:
+            cambios.add((empresa_id, obj.__tablename__))
+    if cambios:
+        incrementar(session.connection(), cambios)
+        cambios_pendientes(session).update(cambios)
+
+
+def init_versiones(app):
+    if not event.contains(Session, "after_flush", _registrar_cambios):
+        event.listen(Session, "after_flush", _registrar_cambios)
+
+
+# =========================
+# ETAG
+# =========================
+def _entidades(model, arbol):
+    entidades = {model.__tablename__}
+    for nombre, sub in arbol.items():
+        destino = getattr(model, nombre).property.mapper.class_
+        entidades |= _entidades(destino, sub)
+    return entidades
+
+
+def calcular_etag(empresa_id, entidades):
+    versiones = dict(
+        db.session.execute(
+            select(Version.entidad, Version.version).where(
+                Version.empresa_id == empresa_id, Version.entidad.in_(entidades)
+            )
+        ).all()
+    )
+    # La misma URL con las mismas versiones devuelve el mismo cuerpo
+    clave = "|".join(f"{e}={versiones.get(e, 0)}" for e in sorted(entidades))
+    clave = f"{empresa_id}|{clave}|{request.full_path}"
+    return hashlib.sha1(clave.encode()).hexdigest()
+
+
+def con_etag(model, default_expand=None):
+    """
+    ETag derivado de los contadores de versión del tenant. Si el cliente
+    manda If-None-Match y nada cambió se responde 304 sin ejecutar la
+    consulta ni el serializador.
+    """
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            empresa_id = empresa_actual()
+            if empresa_id is None:
+                return fn(*args, **kwargs)
+
+            arbol = parse_expand(model, request.args.get("expand", default_expand))
+            etag = calcular_etag(empresa_id, _entidades(model, arbol))
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(fn(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
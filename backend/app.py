@@ -1,41 +1,67 @@
+import click
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flask_admin import Admin
-from flask_admin.contrib.sqla import ModelView
-from flask_migrate import Migrate
 from extensions import mail
 
 from config import Config
-from api.models import db, Usuario, Empresa, Cliente, Instalacion, Mantenimiento, Cliente, Pendiente, Presupuesto, Componente
+from api.models import db
+from api.admin import init_admin
 from api.routes import api
-
-
-def create_app():
+from api.utils.tenancy import init_tenancy
+from api.utils.principal import init_principal
+from api.utils.query_stats import init_query_stats
+from api.utils.agenda import init_agenda
+from api.utils.versiones import init_versiones
+from api.utils.cambios import init_cambios
+from api.utils.cache import init_cache
+from api.utils.presupuestos import init_presupuestos
+from api.utils.geo import init_geo
+from api.utils.busqueda import init_busqueda
+from api.utils.passwords import init_passwords
+from api.utils.pool import init_pool
+from api.utils.respuestas import init_respuestas
+from api.commands import init_commands
+from api.utils.email_utils import iniciar_sender
+
+
+def create_app(config=Config):
     app = Flask(__name__)
     app.config["JWT_VERIFY_SUB"]=False
-    app.config.from_object(Config)
+    app.config.from_object(config)
+    # Primero: su after_request (compresión) corre después de todos los demás
+    init_respuestas(app)
 
     # Extensiones
     CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
     mail.init_app(app)
+    init_pool(app)
     db.init_app(app)
     JWTManager(app)
-    Migrate(app, db)
-
-    
+    init_query_stats(app)
+    init_tenancy(app)
+    init_principal(app)
+    init_agenda(app)
+    init_versiones(app)
+    init_cambios(app)
+    init_cache(app)
+    init_presupuestos(app)
+    init_geo(app)
+    init_busqueda(app)
+    init_passwords(app)
+    init_commands(app)
+
+    if app.config["MAIL_OUTBOX_THREAD"]:
+        iniciar_sender(app)
+
+    # Flask-Migrate (alembic) solo hace falta para "flask db ...": se importa
+    # únicamente cuando la app la levanta el CLI de Flask
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
 
     # Admin panel
-    admin = Admin(app, name='Panel Admin')
-    admin.add_view(ModelView(Usuario, db.session))
-    admin.add_view(ModelView(Empresa, db.session))
-    admin.add_view(ModelView(Cliente, db.session))
-    admin.add_view(ModelView(Instalacion, db.session))    
-    admin.add_view(ModelView(Mantenimiento, db.session))
-    admin.add_view(ModelView(Pendiente, db.session))
-    admin.add_view(ModelView(Presupuesto, db.session))
-    admin.add_view(ModelView(Componente, db.session))
-
+    init_admin(app)
 
     # Blueprints
     app.register_blueprint(api, url_prefix='/api')
@@ -53,16 +79,17 @@ def create_app():
     return app
 
 
-app = create_app()
-
-# ⚠️ Solo crear tablas si realmente estás en desarrollo
-with app.app_context():
-    try:
-        db.create_all()
-    except Exception as e:
-        print("⚠ No se pudieron crear las tablas:", e)
+def __getattr__(nombre):
+    # "gunicorn app:app" y "flask --app app" piden app.app: se crea en ese
+    # momento y no al importar el módulo (tests y scripts usan create_app()).
+    # Las tablas no se crean acá: el esquema lo manejan las migraciones.
+    if nombre == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(nombre)
 
 
 if __name__ == "__main__":
     # ⚠️ DESACTIVAR DEBUG EN SUPABASE (produce doble proceso)
-    app.run(debug=False)
\ No newline at end of file
+    create_app().run(debug=False)
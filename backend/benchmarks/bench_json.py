@@ -0,0 +1,117 @@
+"""
+Benchmark de la respuesta de GET /clientes: serialización JSON + compresión.
+
+    cd backend
+    python benchmarks/bench_json.py --clientes 50 500 2000 --expand
+
+Arma en memoria (sin base de datos) el mismo cuerpo que devuelve el listado
+de clientes, opcionalmente con sus instalaciones expandidas, y mide para
+cada combinación de proveedor JSON y codificación el tiempo de serializar,
+el de comprimir y el tamaño final. "antes" reproduce el camino anterior:
+fechas convertidas con isoformat() en cada to_dict y el proveedor por
+defecto de Flask (claves ordenadas, ensure_ascii).
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.models import Cliente, Instalacion  # noqa: E402
+from api.utils import respuestas  # noqa: E402
+
+
+def _clientes(n, expand):
+    base = datetime(2024, 1, 1, 9, 30)
+    clientes = []
+    for i in range(n):
+        cliente = Cliente(
+            id=i + 1, empresa_id=1, nombre=f"Cliente Núñez {i}", telefono=f"09{i:07d}",
+            email=f"cliente{i}@correo.com.uy", direccion=f"Av. 18 de Julio {1000 + i}, Montevideo",
+            lat=-34.9 + i * 1e-4, lng=-56.16 - i * 1e-4, observaciones="Portón lateral, perro en el patio",
+            activo=True, created_at=base + timedelta(hours=i),
+        )
+        if expand:
+            cliente.instalaciones = [
+                Instalacion(
+                    id=i * 3 + j + 1, empresa_id=1, cliente_id=i + 1, instalador_id=1 + j,
+                    tipo_sistema=("CAMARAS", "ALARMAS", "AMBOS")[j], fecha_instalacion=date(2023, 1 + j, 10),
+                    frecuencia_meses=6, proximo_mantenimiento=date(2026, 1 + j, 10), activa=True,
+                )
+                for j in range(2)
+            ]
+        clientes.append(cliente)
+    return clientes
+
+
+def _iso(valor):
+    return valor.isoformat() if isinstance(valor, (date, datetime)) else valor
+
+
+def _to_dict_antes(dato):
+    # Conversión por objeto como hacía Serializable._valor_json
+    if isinstance(dato, dict):
+        return {k: _to_dict_antes(v) for k, v in dato.items()}
+    if isinstance(dato, list):
+        return [_to_dict_antes(v) for v in dato]
+    return _iso(dato)
+
+
+def _medir(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clientes", type=int, nargs="+", default=[50, 500, 2000])
+    parser.add_argument("--expand", action="store_true", help="Incluir instalaciones (expand=instalaciones)")
+    parser.add_argument("--repeticiones", type=int, default=15)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    proveedores = {
+        "antes": DefaultJSONProvider(app),
+        "estandar": respuestas.ProveedorEstandar(app),
+    }
+    if respuestas.orjson is not None:
+        proveedores["orjson"] = respuestas.ProveedorOrjson(app)
+    codificaciones = [("identity", None)] + [(c, c) for c in respuestas.codificaciones_disponibles()]
+    expand = {"instalaciones": {}} if args.expand else None
+
+    print(f"{'clientes':>8} {'proveedor':<9} {'codif.':<8} {'json ms':>8} {'comp. ms':>9} {'total ms':>9} {'bytes':>10}")
+    for n in args.clientes:
+        clientes = _clientes(n, args.expand)
+        for nombre, proveedor in proveedores.items():
+            def serializar():
+                filas = [c.to_dict(expand=expand) for c in clientes]
+                if nombre == "antes":
+                    filas = _to_dict_antes(filas)
+                with app.app_context():
+                    return proveedor.response({"clientes": filas, "limit": n, "next_cursor": None}).get_data()
+
+            json_ms, cuerpo = _medir(serializar, args.repeticiones)
+            for etiqueta, codificacion in codificaciones:
+                if codificacion is None:
+                    comp_ms, datos = 0.0, cuerpo
+                else:
+                    comp_ms, datos = _medir(lambda: respuestas.comprimir(cuerpo, codificacion), args.repeticiones)
+                print(
+                    f"{n:>8} {nombre:<9} {etiqueta:<8} {json_ms:8.2f} {comp_ms:9.2f} "
+                    f"{json_ms + comp_ms:9.2f} {len(datos):>10}"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de /auth/login y /auth/refresh.
+
+    cd backend
+    python benchmarks/bench_login.py --requests 200 --threads 8
+
+Usa una base SQLite temporal (o DATABASE_URL si se pasa --usar-database-url)
+y compara el hash en el thread del request (PASSWORD_HASH_WORKERS=0) contra
+el pool de procesos, más la renovación de sesión con refresh token.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _preparar_entorno(args):
+    if not args.usar_database_url:
+        ruta = os.path.join(tempfile.mkdtemp(), "bench_login.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{ruta}"
+
+
+def _sembrar(app, usuarios):
+    from api.models import db, Empresa, Usuario
+    from api.utils.passwords import hashear
+
+    with app.app_context():
+        db.create_all()
+        empresa = Empresa(nombre="Benchmark")
+        db.session.add(empresa)
+        db.session.flush()
+        hash_pw = hashear("pw")
+        for i in range(usuarios):
+            db.session.add(Usuario(
+                empresa_id=empresa.id, nombre=f"Usuario {i}", email=f"bench{i}@x.com",
+                username=f"bench{i}", password=hash_pw, rol="INSTALADOR",
+            ))
+        db.session.commit()
+
+
+def _medir(nombre, fn, total, threads):
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        codigos = list(pool.map(fn, range(total)))
+    duracion = time.perf_counter() - inicio
+    errores = sum(1 for c in codigos if c != 200)
+    print(f"{nombre:<28} {total / duracion:8.1f} req/s  {duracion * 1000 / total:7.2f} ms/req  errores={errores}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--usar-database-url", action="store_true")
+    args = parser.parse_args()
+
+    _preparar_entorno(args)
+    from app import app
+    from api.utils import passwords
+
+    _sembrar(app, args.usuarios)
+    client = app.test_client()
+
+    def login(i):
+        usuario = f"BENCH{i % args.usuarios}@x.com"
+        return client.post("/api/auth/login", json={"email": usuario, "password": "pw"}).status_code
+
+    for workers in (0, app.config["PASSWORD_HASH_WORKERS"] or os.cpu_count()):
+        app.config["PASSWORD_HASH_WORKERS"] = workers
+        passwords.init_passwords(app)
+        login(0)  # calentamiento (arranque del pool)
+        _medir(f"login (workers={workers})", login, args.requests, args.threads)
+
+    refresh_token = client.post(
+        "/api/auth/login", json={"email": "bench0", "password": "pw"}
+    ).get_json()["refresh_token"]
+    headers = {"Authorization": f"Bearer {refresh_token}"}
+
+    def refresh(i):
+        return client.post("/api/auth/refresh", headers=headers).status_code
+
+    _medir("refresh", refresh, args.requests, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark de la planificación de rutas (sin base de datos).
+
+    cd backend
+    python benchmarks/bench_rutas.py --paradas 100 300 1000 --tecnicos 4
+
+Compara el largo total de vecino más cercano contra vecino más cercano + 2-opt
+y mide el tiempo de la matriz de distancias y de la planificación completa.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.utils import rutas  # noqa: E402
+
+
+def _paradas(n, rng):
+    # Paradas repartidas en ~40 km alrededor de Montevideo
+    lat = -34.85 + rng.uniform(-0.2, 0.2, n)
+    lng = -56.15 + rng.uniform(-0.25, 0.25, n)
+    return [
+        {"instalacion_id": i, "cliente_id": i, "lat": float(a), "lng": float(b)}
+        for i, (a, b) in enumerate(zip(lat, lng))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paradas", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--tecnicos", type=int, default=4)
+    parser.add_argument("--tiempo-max-ms", type=int, default=rutas.TIEMPO_MAX_MS)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    tecnicos = [{"id": i, "nombre": f"Técnico {i}"} for i in range(args.tecnicos)]
+    origen = (-34.88, -56.17)
+
+    print(f"{'paradas':>8} {'matriz ms':>10} {'plan ms':>9} {'NN km':>10} {'2-opt km':>10} {'mejora':>7}")
+    for n in args.paradas:
+        paradas = _paradas(n, rng)
+        lat = [p["lat"] for p in paradas]
+        lng = [p["lng"] for p in paradas]
+
+        inicio = time.perf_counter()
+        rutas.matriz_distancias(lat, lng)
+        matriz_ms = (time.perf_counter() - inicio) * 1000
+
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            plan = rutas.planificar(paradas, tecnicos, origen, args.tiempo_max_ms)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        stats = plan["estadisticas"]
+        nn, final = stats["distancia_vecino_mas_cercano_km"], stats["distancia_km"]
+        mejora = (1 - final / nn) * 100 if nn else 0.0
+        print(f"{n:>8} {matriz_ms:>10.1f} {min(tiempos):>9.1f} {nn:>10.1f} {final:>10.1f} {mejora:>6.1f}%")
+
+
+if __name__ == "__main__":
+    main()
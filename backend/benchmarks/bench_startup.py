@@ -0,0 +1,104 @@
+"""
+Benchmark de arranque: import de app.py, create_app() y el primer request.
+
+    cd backend
+    python benchmarks/bench_startup.py --repeticiones 5
+
+Cada medición corre en un intérprete nuevo (como un worker de gunicorn
+recién levantado) contra una base SQLite temporal, con y sin el panel de
+Flask-Admin. Reporta la mediana de cada etapa.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Corre en el proceso hijo: imprime los tiempos (ms) como JSON
+HIJO = """
+import json, sys, time
+inicio = time.perf_counter()
+import app as modulo
+importado = time.perf_counter()
+app = modulo.create_app()
+creada = time.perf_counter()
+
+from flask_jwt_extended import create_access_token
+with app.app_context():
+    token = create_access_token(identity=1)
+client = app.test_client()
+antes = time.perf_counter()
+assert client.get("/ping").status_code == 200
+ping = time.perf_counter()
+respuesta = client.get("/api/clientes", headers={"Authorization": "Bearer " + token})
+assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
+api = time.perf_counter()
+
+print(json.dumps({
+    "import": (importado - inicio) * 1000,
+    "create_app": (creada - importado) * 1000,
+    "primer /ping": (ping - antes) * 1000,
+    "primer /api/clientes": (api - ping) * 1000,
+    "total": (api - inicio) * 1000 - (antes - creada) * 1000,
+}))
+"""
+
+
+def _preparar_base():
+    ruta = os.path.join(tempfile.mkdtemp(), "bench_startup.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{ruta}"
+
+    from app import create_app
+    from api.models import db, Empresa, Usuario
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        empresa = Empresa(nombre="Benchmark")
+        db.session.add(empresa)
+        db.session.flush()
+        db.session.add(Usuario(
+            empresa_id=empresa.id, nombre="Admin", email="bench@x.com",
+            username="bench", password="x", rol="ADMIN",
+        ))
+        db.session.commit()
+
+
+def _medir(entorno):
+    salida = subprocess.run(
+        [sys.executable, "-c", HIJO],
+        cwd=BACKEND,
+        env={**os.environ, **entorno},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    _preparar_base()
+    modos = {
+        "con admin": {"ADMIN_HABILITADO": "1"},
+        "sin admin": {"ADMIN_HABILITADO": "0"},
+    }
+    for nombre, entorno in modos.items():
+        _medir(entorno)  # calentamiento (cache de disco y .pyc)
+        tiempos = [_medir(entorno) for _ in range(args.repeticiones)]
+        etapas = "  ".join(
+            f"{etapa}={statistics.median(t[etapa] for t in tiempos):7.1f} ms" for etapa in tiempos[0]
+        )
+        print(f"{nombre:<10} {etapas}")
+
+
+if __name__ == "__main__":
+    main()
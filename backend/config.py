@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from dotenv import load_dotenv  # type: ignore
 
 load_dotenv()
@@ -8,15 +9,66 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY", "super-secret-key")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secret-key")
+    # Access token corto; la sesión se renueva con el refresh token (sin recalcular hashes)
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv("JWT_ACCESS_MINUTES", 60)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv("JWT_REFRESH_DAYS", 30)))
+    # Procesos para verificar/generar hashes de contraseña (0 = en el thread del request)
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
 
-    # ✅ Configuración del pool de SQLAlchemy
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        "pool_size": 5,
-        "max_overflow": 0,
-        "pool_recycle": 280,
-        "pool_timeout": 30,
-        "pool_pre_ping": True
-    }
+    # ✅ Configuración del pool de SQLAlchemy (las opciones del engine se arman en api/utils/pool.py)
+    #   fijo:    DB_POOL_SIZE + DB_MAX_OVERFLOW por worker
+    #   workers: reparte DB_MAX_CONEXIONES entre WEB_CONCURRENCY workers de GUNICORN_THREADS hilos
+    #   pooler:  PgBouncer / pooler de Supabase en modo transacción (NullPool)
+    DB_POOL_PERFIL = os.getenv("DB_POOL_PERFIL", "fijo")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 0))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 280))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() in ["true", "1", "yes"]
+    DB_MAX_CONEXIONES = int(os.getenv("DB_MAX_CONEXIONES", 60))
+    # Conexiones que quedan libres para migraciones, consola y el worker de emails
+    DB_CONEXIONES_RESERVADAS = int(os.getenv("DB_CONEXIONES_RESERVADAS", 5))
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+    GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", 1))
+    # Esperas por una conexión más largas que esto se loguean
+    DB_POOL_ESPERA_LENTA_MS = int(os.getenv("DB_POOL_ESPERA_LENTA_MS", 500))
+
+    # Panel de Flask-Admin (/admin). Los workers que solo sirven la API pueden
+    # apagarlo para arrancar más rápido
+    ADMIN_HABILITADO = os.getenv("ADMIN_HABILITADO", "True").lower() in ["true", "1", "yes"]
+
+    # Tests: lanzar excepción ante cualquier lazy load no planificado
+    SQLALCHEMY_RAISE_ON_LAZYLOAD = os.getenv("SQLALCHEMY_RAISE_ON_LAZYLOAD", "False").lower() in ["true", "1", "yes"]
+    # Tests: superar el máximo de queries de un endpoint (@max_queries) es un error
+    QUERY_BUDGET_ENFORCE = os.getenv("QUERY_BUDGET_ENFORCE", "False").lower() in ["true", "1", "yes"]
+
+    # Cache en memoria de datos de referencia
+    CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", 1024))
+    CACHE_TTL = int(os.getenv("CACHE_TTL", 300))
+    # Invalidación entre workers con LISTEN/NOTIFY (solo Postgres)
+    CACHE_LISTEN_NOTIFY = os.getenv("CACHE_LISTEN_NOTIFY", "False").lower() in ["true", "1", "yes"]
+
+    # Cache del usuario autenticado (rol, empresa, activo) por identidad del token.
+    # Sin LISTEN/NOTIFY un usuario desactivado o con otro rol sigue valiendo en
+    # los demás workers hasta que vence el TTL: por eso el default es corto
+    PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", 4096))
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 60 if CACHE_LISTEN_NOTIFY else 5))
+
+    # Serialización de las respuestas: "orjson" (rápido) o "estandar" (json de la stdlib)
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "orjson")
+    # gzip/brotli según Accept-Encoding para respuestas a partir de este tamaño.
+    # Desactivar si ya comprime el proxy (nginx, CDN)
+    COMPRESION_HABILITADA = os.getenv("COMPRESION_HABILITADA", "True").lower() in ["true", "1", "yes"]
+    COMPRESION_MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", 1024))
+    COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", 6))
+    COMPRESION_CALIDAD_BROTLI = int(os.getenv("COMPRESION_CALIDAD_BROTLI", 4))
+
+    # Feed de /cambios: las filas escritas en los últimos N segundos se vuelven
+    # a mandar (cubre transacciones que hacen commit después de su timestamp)
+    CAMBIOS_MARGEN_SEGUNDOS = int(os.getenv("CAMBIOS_MARGEN_SEGUNDOS", 30))
+    # Días que se guardan los borrados ("flask purgar-borrados"); un cursor
+    # más viejo obliga al cliente a resincronizar de cero
+    CAMBIOS_RETENCION_DIAS = int(os.getenv("CAMBIOS_RETENCION_DIAS", 30))
 
     # ✅ Configuración de correo desde variables de entorno
     MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com")
@@ -28,3 +80,5 @@ class Config:
         os.getenv("MAIL_DEFAULT_SENDER_NAME", "Nombre App"),
         os.getenv("MAIL_DEFAULT_SENDER_EMAIL", "tu_email@gmail.com")
     )
+    # Sender de la outbox en un thread de cada worker (si no se usa "flask enviar-emails --loop")
+    MAIL_OUTBOX_THREAD = os.getenv("MAIL_OUTBOX_THREAD", "False").lower() in ["true", "1", "yes"]
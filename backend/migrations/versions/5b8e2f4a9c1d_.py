@@ -0,0 +1,28 @@
+"""indice mantenimientos por instalacion y fecha
+
+Revision ID: 5b8e2f4a9c1d
+Revises: a3f1c9d2b7e4
+Create Date: 2026-10-18 11:02:47.551130
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2f4a9c1d'
+down_revision = 'a3f1c9d2b7e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('mantenimientos', schema=None) as batch_op:
+        batch_op.drop_index('idx_mantenimiento_instalacion')
+        batch_op.create_index('idx_mantenimiento_instalacion_fecha', ['instalacion_id', 'fecha'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('mantenimientos', schema=None) as batch_op:
+        batch_op.drop_index('idx_mantenimiento_instalacion_fecha')
+        batch_op.create_index('idx_mantenimiento_instalacion', ['instalacion_id'], unique=False)
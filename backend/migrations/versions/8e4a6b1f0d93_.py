@@ -0,0 +1,29 @@
+"""contadores de version por empresa y entidad
+
+Revision ID: 8e4a6b1f0d93
+Revises: d71c0e6a3f58
+Create Date: 2026-10-18 12:25:40.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4a6b1f0d93'
+down_revision = 'd71c0e6a3f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('versiones',
+    sa.Column('empresa_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('entidad', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('empresa_id', 'entidad')
+    )
+
+
+def downgrade():
+    op.drop_table('versiones')
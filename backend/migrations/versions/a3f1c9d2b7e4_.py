@@ -0,0 +1,58 @@
+"""indices compuestos por empresa
+
+Revision ID: a3f1c9d2b7e4
+Revises: eddc7f3ff02f
+Create Date: 2026-10-18 10:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2b7e4'
+down_revision = 'eddc7f3ff02f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('clientes', schema=None) as batch_op:
+        batch_op.create_index('idx_cliente_empresa_nombre', ['empresa_id', 'nombre'], unique=False)
+
+    with op.batch_alter_table('instalaciones', schema=None) as batch_op:
+        batch_op.create_index('idx_instalacion_empresa_proximo', ['empresa_id', 'proximo_mantenimiento'], unique=False)
+
+    with op.batch_alter_table('mantenimientos', schema=None) as batch_op:
+        batch_op.create_index('idx_mantenimiento_empresa_fecha', ['empresa_id', 'fecha'], unique=False)
+
+    with op.batch_alter_table('pendientes', schema=None) as batch_op:
+        batch_op.create_index('idx_pendiente_empresa_fecha', ['empresa_id', 'fecha'], unique=False)
+
+    with op.batch_alter_table('presupuestos', schema=None) as batch_op:
+        batch_op.create_index('idx_presupuesto_empresa', ['empresa_id'], unique=False)
+        batch_op.create_index('idx_presupuesto_empresa_estado', ['empresa_id', 'estado'], unique=False)
+
+    with op.batch_alter_table('componentes', schema=None) as batch_op:
+        batch_op.create_index('idx_componente_presupuesto', ['presupuesto_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('componentes', schema=None) as batch_op:
+        batch_op.drop_index('idx_componente_presupuesto')
+
+    with op.batch_alter_table('presupuestos', schema=None) as batch_op:
+        batch_op.drop_index('idx_presupuesto_empresa_estado')
+        batch_op.drop_index('idx_presupuesto_empresa')
+
+    with op.batch_alter_table('pendientes', schema=None) as batch_op:
+        batch_op.drop_index('idx_pendiente_empresa_fecha')
+
+    with op.batch_alter_table('mantenimientos', schema=None) as batch_op:
+        batch_op.drop_index('idx_mantenimiento_empresa_fecha')
+
+    with op.batch_alter_table('instalaciones', schema=None) as batch_op:
+        batch_op.drop_index('idx_instalacion_empresa_proximo')
+
+    with op.batch_alter_table('clientes', schema=None) as batch_op:
+        batch_op.drop_index('idx_cliente_empresa_nombre')
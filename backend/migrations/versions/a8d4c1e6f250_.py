@@ -0,0 +1,60 @@
+"""updated_at y tabla de borrados para el feed incremental de /cambios
+
+Revision ID: a8d4c1e6f250
+Revises: f3a7c2d9e815
+Create Date: 2026-10-18 19:12:05.384611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4c1e6f250'
+down_revision = 'f3a7c2d9e815'
+branch_labels = None
+depends_on = None
+
+# tabla -> (índice, columna con la que se inicializa updated_at)
+TABLAS = {
+    "clientes": ("idx_cliente_empresa_updated", "created_at"),
+    "instalaciones": ("idx_instalacion_empresa_updated", "created_at"),
+    "mantenimientos": ("idx_mantenimiento_empresa_updated", "created_at"),
+    "pendientes": ("idx_pendiente_empresa_updated", "created_at"),
+    "presupuestos": ("idx_presupuesto_empresa_updated", None),
+}
+
+
+def upgrade():
+    for tabla, (indice, origen) in TABLAS.items():
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+        valor = f"COALESCE({origen}, CURRENT_TIMESTAMP)" if origen else "CURRENT_TIMESTAMP"
+        op.execute(f"UPDATE {tabla} SET updated_at = {valor}")
+
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.create_index(indice, ['empresa_id', 'updated_at', 'id'], unique=False)
+
+    op.create_table(
+        'borrados',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('empresa_id', sa.Integer(), nullable=False),
+        sa.Column('entidad', sa.String(length=50), nullable=False),
+        sa.Column('entidad_id', sa.Integer(), nullable=False),
+        sa.Column('borrado_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('borrados', schema=None) as batch_op:
+        batch_op.create_index('idx_borrado_empresa_fecha', ['empresa_id', 'borrado_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('borrados', schema=None) as batch_op:
+        batch_op.drop_index('idx_borrado_empresa_fecha')
+    op.drop_table('borrados')
+
+    for tabla, (indice, _) in TABLAS.items():
+        with op.batch_alter_table(tabla, schema=None) as batch_op:
+            batch_op.drop_index(indice)
+            batch_op.drop_column('updated_at')
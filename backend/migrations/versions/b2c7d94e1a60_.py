@@ -0,0 +1,26 @@
+"""indices funcionales lower(email) / lower(username) para el login
+
+Revision ID: b2c7d94e1a60
+Revises: 8e4a6b1f0d93
+Create Date: 2026-10-18 13:05:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c7d94e1a60'
+down_revision = '8e4a6b1f0d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_usuario_email_lower', 'usuarios', [sa.text('lower(email)')], unique=False)
+    op.create_index('idx_usuario_username_lower', 'usuarios', [sa.text('lower(username)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_usuario_username_lower', table_name='usuarios')
+    op.drop_index('idx_usuario_email_lower', table_name='usuarios')
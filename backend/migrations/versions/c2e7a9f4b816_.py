@@ -0,0 +1,77 @@
+"""tabla FTS5 de búsqueda en SQLite
+
+Revision ID: c2e7a9f4b816
+Revises: a8d4c1e6f250
+Create Date: 2026-10-18 21:04:37.519208
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e7a9f4b816'
+down_revision = 'a8d4c1e6f250'
+branch_labels = None
+depends_on = None
+
+# Deben coincidir con ENTIDADES de api/utils/busqueda.py (mismas columnas y
+# mismo orden). La entidad de cada fila de busqueda_fts es el nombre de la tabla.
+TABLAS = {
+    "clientes": ("nombre", "telefono", "email", "direccion", "observaciones"),
+    "presupuestos": ("descripcion", "cliente_nombre", "cliente_telefono", "cliente_direccion", "tipo_sistema"),
+    "mantenimientos": ("notas",),
+    "pendientes": ("notas",),
+}
+
+
+def _texto(prefijo, columnas):
+    return " || ' ' || ".join(f"coalesce({prefijo}.{c}, '')" for c in columnas)
+
+
+def upgrade():
+    # En Postgres la búsqueda usa los índices GIN de e6b1f4c8a273
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    # Bases donde la tabla ya la había creado la búsqueda (antes era al primer uso)
+    existe = op.get_bind().exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'busqueda_fts'"
+    ).first()
+    if existe:
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE busqueda_fts USING fts5("
+        "entidad UNINDEXED, ref_id UNINDEXED, empresa_id UNINDEXED, texto, "
+        "tokenize = 'trigram case_sensitive 0')"
+    )
+    for tabla, columnas in TABLAS.items():
+        op.execute(
+            f"INSERT INTO busqueda_fts (entidad, ref_id, empresa_id, texto) "
+            f"SELECT '{tabla}', t.id, t.empresa_id, {_texto('t', columnas)} FROM {tabla} t"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_ai AFTER INSERT ON {tabla} BEGIN "
+            f"INSERT INTO busqueda_fts (entidad, ref_id, empresa_id, texto) "
+            f"VALUES ('{tabla}', new.id, new.empresa_id, {_texto('new', columnas)}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_ad AFTER DELETE ON {tabla} BEGIN "
+            f"DELETE FROM busqueda_fts WHERE entidad = '{tabla}' AND ref_id = old.id; END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS busqueda_{tabla}_au AFTER UPDATE ON {tabla} BEGIN "
+            f"DELETE FROM busqueda_fts WHERE entidad = '{tabla}' AND ref_id = old.id; "
+            f"INSERT INTO busqueda_fts (entidad, ref_id, empresa_id, texto) "
+            f"VALUES ('{tabla}', new.id, new.empresa_id, {_texto('new', columnas)}); END"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    for tabla in TABLAS:
+        for sufijo in ("ai", "ad", "au"):
+            op.execute(f"DROP TRIGGER IF EXISTS busqueda_{tabla}_{sufijo}")
+    op.execute("DROP TABLE IF EXISTS busqueda_fts")
@@ -0,0 +1,71 @@
+"""presupuestos: total y precios en Numeric, total mantenido desde los componentes
+
+Los presupuestos con total cargado a mano y sin componentes reciben una
+línea "Importe sin detalle" por ese total, para que a partir de acá el
+total sea siempre la suma de sus líneas.
+
+Revision ID: c4f0a8e3d215
+Revises: b2c7d94e1a60
+Create Date: 2026-10-18 14:10:37.551904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f0a8e3d215'
+down_revision = 'b2c7d94e1a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('componentes', schema=None) as batch_op:
+        batch_op.alter_column('precio',
+               existing_type=sa.Float(),
+               type_=sa.Numeric(precision=12, scale=2),
+               existing_nullable=False,
+               postgresql_using='round(precio::numeric, 2)')
+
+    with op.batch_alter_table('presupuestos', schema=None) as batch_op:
+        batch_op.alter_column('total',
+               existing_type=sa.Float(),
+               type_=sa.Numeric(precision=12, scale=2),
+               existing_nullable=True,
+               postgresql_using='round(total::numeric, 2)')
+
+    op.execute("""
+        INSERT INTO componentes (presupuesto_id, nombre, cantidad, precio)
+        SELECT p.id, 'Importe sin detalle', 1, p.total
+        FROM presupuestos p
+        WHERE p.total IS NOT NULL AND p.total <> 0
+          AND NOT EXISTS (SELECT 1 FROM componentes c WHERE c.presupuesto_id = p.id)
+    """)
+    op.execute("""
+        UPDATE presupuestos SET total = COALESCE(
+            (SELECT SUM(c.cantidad * c.precio) FROM componentes c WHERE c.presupuesto_id = presupuestos.id),
+            0
+        )
+    """)
+
+    with op.batch_alter_table('presupuestos', schema=None) as batch_op:
+        batch_op.alter_column('total',
+               existing_type=sa.Numeric(precision=12, scale=2),
+               nullable=False,
+               server_default='0')
+
+
+def downgrade():
+    with op.batch_alter_table('presupuestos', schema=None) as batch_op:
+        batch_op.alter_column('total',
+               existing_type=sa.Numeric(precision=12, scale=2),
+               type_=sa.Float(),
+               nullable=True,
+               server_default=None)
+
+    with op.batch_alter_table('componentes', schema=None) as batch_op:
+        batch_op.alter_column('precio',
+               existing_type=sa.Numeric(precision=12, scale=2),
+               type_=sa.Float(),
+               existing_nullable=False)
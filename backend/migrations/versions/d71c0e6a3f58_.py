@@ -0,0 +1,41 @@
+"""outbox de emails
+
+Revision ID: d71c0e6a3f58
+Revises: 5b8e2f4a9c1d
+Create Date: 2026-10-18 11:48:09.372615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd71c0e6a3f58'
+down_revision = '5b8e2f4a9c1d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('destinatario', sa.String(length=120), nullable=False),
+    sa.Column('asunto', sa.String(length=255), nullable=False),
+    sa.Column('cuerpo', sa.Text(), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('intentos', sa.Integer(), nullable=False),
+    sa.Column('proximo_intento', sa.DateTime(), nullable=False),
+    sa.Column('ultimo_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('enviado_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.create_index('idx_email_outbox_estado', ['estado', 'proximo_intento'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox', schema=None) as batch_op:
+        batch_op.drop_index('idx_email_outbox_estado')
+
+    op.drop_table('email_outbox')
@@ -0,0 +1,56 @@
+"""clientes.celda: celda de grilla geográfica para búsquedas por proximidad
+
+Revision ID: d9a3e5b7c042
+Revises: c4f0a8e3d215
+Create Date: 2026-10-18 15:02:44.871230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a3e5b7c042'
+down_revision = 'c4f0a8e3d215'
+branch_labels = None
+depends_on = None
+
+# Deben coincidir con api/utils/geo.py
+CELDA_GRADOS = 0.05
+COLUMNAS = 7200
+FILAS = 3600
+
+
+def _celda(lat, lng):
+    if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    fila = min(int((lat + 90) // CELDA_GRADOS), FILAS - 1)
+    columna = min(int((lng + 180) // CELDA_GRADOS), COLUMNAS - 1)
+    return fila * COLUMNAS + columna
+
+
+def upgrade():
+    with op.batch_alter_table('clientes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('celda', sa.BigInteger(), nullable=True))
+
+    conn = op.get_bind()
+    clientes = sa.table('clientes', sa.column('id'), sa.column('lat'), sa.column('lng'), sa.column('celda'))
+    filas = conn.execute(
+        sa.select(clientes.c.id, clientes.c.lat, clientes.c.lng)
+        .where(clientes.c.lat.isnot(None), clientes.c.lng.isnot(None))
+    ).all()
+    valores = [{"_id": id, "celda": _celda(lat, lng)} for id, lat, lng in filas]
+    if valores:
+        conn.execute(
+            clientes.update().where(clientes.c.id == sa.bindparam("_id")).values(celda=sa.bindparam("celda")),
+            valores,
+        )
+
+    with op.batch_alter_table('clientes', schema=None) as batch_op:
+        batch_op.create_index('idx_cliente_empresa_celda', ['empresa_id', 'celda'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('clientes', schema=None) as batch_op:
+        batch_op.drop_index('idx_cliente_empresa_celda')
+        batch_op.drop_column('celda')
@@ -0,0 +1,55 @@
+"""indices de búsqueda por texto (tsvector + pg_trgm)
+
+Revision ID: e6b1f4c8a273
+Revises: d9a3e5b7c042
+Create Date: 2026-10-18 16:20:11.402518
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b1f4c8a273'
+down_revision = 'd9a3e5b7c042'
+branch_labels = None
+depends_on = None
+
+# Deben coincidir con ENTIDADES de api/utils/busqueda.py (mismas columnas y
+# mismo orden) para que el planner use los índices de expresión.
+TABLAS = {
+    "clientes": ("nombre", "telefono", "email", "direccion", "observaciones"),
+    "presupuestos": ("descripcion", "cliente_nombre", "cliente_telefono", "cliente_direccion", "tipo_sistema"),
+    "mantenimientos": ("notas",),
+    "pendientes": ("notas",),
+}
+
+
+def _texto(columnas):
+    return " || ' ' || ".join(f"coalesce({c}, '')" for c in columnas)
+
+
+def upgrade():
+    # En SQLite la búsqueda usa una tabla FTS5 (migración c2e7a9f4b816)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for tabla, columnas in TABLAS.items():
+        texto = _texto(columnas)
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{tabla}_busqueda_tsv ON {tabla} "
+            f"USING gin (to_tsvector('simple', {texto}))"
+        )
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{tabla}_busqueda_trgm ON {tabla} "
+            f"USING gin (({texto}) gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for tabla in TABLAS:
+        op.execute(f"DROP INDEX IF EXISTS idx_{tabla}_busqueda_trgm")
+        op.execute(f"DROP INDEX IF EXISTS idx_{tabla}_busqueda_tsv")
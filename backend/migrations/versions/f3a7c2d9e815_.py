@@ -0,0 +1,45 @@
+"""indices trigram para las búsquedas del panel admin
+
+Revision ID: f3a7c2d9e815
+Revises: e6b1f4c8a273
+Create Date: 2026-10-18 17:41:27.113904
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c2d9e815'
+down_revision = 'e6b1f4c8a273'
+branch_labels = None
+depends_on = None
+
+# column_searchable_list de api/admin.py: Flask-Admin busca con ILIKE '%...%'
+COLUMNAS = {
+    "empresas": ("nombre",),
+    "usuarios": ("nombre", "email"),
+    "clientes": ("nombre", "telefono", "email"),
+    "presupuestos": ("cliente_nombre",),
+}
+
+
+def upgrade():
+    # pg_trgm lo crea la migración anterior; en SQLite no hay índices trigram
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for tabla, columnas in COLUMNAS.items():
+        for columna in columnas:
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{tabla}_{columna}_trgm ON {tabla} "
+                f"USING gin ({columna} gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    for tabla, columnas in COLUMNAS.items():
+        for columna in columnas:
+            op.execute(f"DROP INDEX IF EXISTS idx_{tabla}_{columna}_trgm")
@@ -0,0 +1,135 @@
+from datetime import date
+
+import pytest
+from flask_jwt_extended import create_access_token, create_refresh_token
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from config import Config
+from api.models import (
+    db, Empresa, Usuario, Cliente, Instalacion, Mantenimiento, Pendiente, Presupuesto, Componente,
+)
+from api.utils.cache import cache
+from api.utils.principal import principales
+
+
+class ConfigTests(Config):
+    TESTING = True
+    PASSWORD_HASH_WORKERS = 0
+    QUERY_BUDGET_ENFORCE = True
+    SQLALCHEMY_RAISE_ON_LAZYLOAD = True
+    ADMIN_HABILITADO = False
+    COMPRESION_HABILITADA = False
+    MAIL_OUTBOX_THREAD = False
+    CACHE_LISTEN_NOTIFY = False
+    PRINCIPAL_CACHE_TTL = 60
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Configuración de la app del test (los módulos la extienden redefiniendo este fixture)."""
+    class ConfigBase(ConfigTests):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'tests.db'}"
+
+    return ConfigBase
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+    # Las caches son del proceso: cada test arranca sin nada cacheado
+    cache.limpiar()
+    principales.limpiar()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _empresa(n):
+    """
+    Una empresa con el grafo completo que recorren las rutas y los cascades
+    de los DELETE: clientes con instalación, dos mantenimientos, un pendiente
+    y un presupuesto con componentes.
+    """
+    empresa = Empresa(nombre=f"Empresa {n}", plan="PRO", max_usuarios=10, activa=True)
+    admin = Usuario(
+        empresa=empresa, nombre=f"Admin {n}", username=f"admin{n}", email=f"admin{n}@test.com",
+        password=generate_password_hash("clave"), rol="ADMIN",
+    )
+    instalador = Usuario(
+        empresa=empresa, nombre=f"Instalador {n}", username=f"inst{n}", email=f"inst{n}@test.com",
+        password=generate_password_hash("clave"), rol="INSTALADOR",
+    )
+    db.session.add_all([empresa, admin, instalador])
+    db.session.flush()
+
+    for i in range(3):
+        cliente = Cliente(
+            empresa=empresa, nombre=f"Cliente {n}-{i}", telefono=f"09{n}{i:05d}",
+            direccion=f"Calle {i}", lat=-34.90 + i * 0.01, lng=-56.16 + i * 0.01,
+        )
+        instalacion = Instalacion(
+            empresa=empresa, cliente=cliente, instalador=instalador, tipo_sistema="CAMARAS",
+            fecha_instalacion=date(2025, 1, 10 + i), frecuencia_meses=6,
+        )
+        presupuesto = Presupuesto(
+            empresa=empresa, cliente=cliente, tipo_sistema="ALARMAS", descripcion="Kit alarma",
+            creado_por=admin.id, total=300,
+            componentes=[
+                Componente(nombre="Central", cantidad=1, precio=200),
+                Componente(nombre="Sensor", cantidad=2, precio=50),
+            ],
+        )
+        db.session.add_all([
+            cliente,
+            instalacion,
+            Mantenimiento(empresa=empresa, instalacion=instalacion, tecnico=instalador, fecha=date(2025, 3, 1 + i), notas="Revisión"),
+            Mantenimiento(empresa=empresa, instalacion=instalacion, tecnico=instalador, fecha=date(2025, 6, 1 + i)),
+            Pendiente(empresa=empresa, cliente=cliente, instalacion=instalacion, fecha=date(2025, 7, 1 + i), notas="Cambiar batería"),
+            presupuesto,
+        ])
+    db.session.flush()
+    return empresa, admin
+
+
+def _ids(model, empresa_id):
+    return db.session.scalars(
+        db.select(model.id).where(model.empresa_id == empresa_id).order_by(model.id)
+    ).all()
+
+
+@pytest.fixture
+def datos(app):
+    """Dos empresas con el mismo grafo. Los tests actúan como el admin de la primera."""
+    with app.app_context():
+        empresa, admin = _empresa(1)
+        otra, _ = _empresa(2)
+        db.session.commit()
+
+        ids = {
+            "empresa": empresa.id,
+            "otra_empresa": otra.id,
+            "admin": admin.id,
+            "token": create_access_token(identity=admin.id),
+            "refresh": create_refresh_token(identity=admin.id),
+        }
+        for model in (Usuario, Cliente, Instalacion, Mantenimiento, Pendiente, Presupuesto):
+            ids[model.__tablename__] = _ids(model, empresa.id)
+        ids["componentes"] = db.session.scalars(
+            db.select(Componente.id).join(Presupuesto)
+            .where(Presupuesto.empresa_id == empresa.id).order_by(Componente.id)
+        ).all()
+    return ids
+
+
+@pytest.fixture
+def headers(datos):
+    return {"Authorization": f"Bearer {datos['token']}"}
@@ -0,0 +1,22 @@
+"""Recálculo del próximo mantenimiento (api/utils/agenda.py) a través de la API."""
+
+
+def _instalacion(client, headers, id, cambios):
+    respuesta = client.put(f"/api/instalaciones/{id}", json=cambios, headers=headers)
+    assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
+    return respuesta.get_json()["instalacion"]
+
+
+def test_cambio_de_frecuencia_recalcula_desde_el_ultimo_mantenimiento(client, datos, headers):
+    # Último mantenimiento de la primera instalación: 2025-06-01
+    instalacion = _instalacion(client, headers, datos["instalaciones"][0], {"frecuencia_meses": 3})
+    assert instalacion["proximo_mantenimiento"] == "2025-09-01"
+
+
+def test_fecha_explicita_gana_sobre_el_recalculo(client, datos, headers):
+    instalacion = _instalacion(
+        client, headers, datos["instalaciones"][0],
+        {"frecuencia_meses": 3, "proximo_mantenimiento": "2027-01-01"},
+    )
+    assert instalacion["frecuencia_meses"] == 3
+    assert instalacion["proximo_mantenimiento"] == "2027-01-01"
@@ -0,0 +1,122 @@
+"""
+Outbox de emails (api/utils/email_utils.py) contra un servidor SMTP local
+(aiosmtpd): envío, rechazos con reintento y estado de la cola.
+"""
+import socket
+from datetime import timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from api.models import db, EmailOutbox
+from api.utils import email_utils
+from api.utils.email_utils import enviar_pendientes, send_email
+
+
+RECHAZADO = "rechazado@test.com"
+
+
+class Buzon:
+    """Handler de aiosmtpd: guarda los mensajes y rechaza un destinatario."""
+
+    def __init__(self):
+        self.mensajes = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == RECHAZADO:
+            return "550 Buzón inexistente"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.mensajes.append(envelope)
+        return "250 OK"
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    controller = Controller(Buzon(), hostname="127.0.0.1", port=_puerto_libre())
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+@pytest.fixture
+def config(config, smtp):
+    class ConfigSmtp(config):
+        MAIL_SERVER = smtp.hostname
+        MAIL_PORT = smtp.port
+        MAIL_USE_TLS = False
+        MAIL_USE_SSL = False
+        MAIL_USERNAME = None
+        MAIL_PASSWORD = None
+        # TESTING suprime los envíos de Flask-Mail
+        MAIL_SUPPRESS_SEND = False
+
+    return ConfigSmtp
+
+
+def _outbox():
+    return {e.destinatario: e for e in db.session.scalars(db.select(EmailOutbox))}
+
+
+def test_envia_la_outbox_por_una_conexion(app, smtp):
+    with app.app_context():
+        send_email("uno@test.com", "Hola", "Cuerpo 1")
+        send_email("dos@test.com", "Hola", "Cuerpo 2")
+
+        assert enviar_pendientes() == 2
+        outbox = _outbox()
+
+    assert sorted(m.rcpt_tos[0] for m in smtp.handler.mensajes) == ["dos@test.com", "uno@test.com"]
+    assert {e.estado for e in outbox.values()} == {"ENVIADO"}
+    for email in outbox.values():
+        # enviado_at y created_at salen del mismo reloj (el de la base)
+        assert timedelta(0) <= email.enviado_at - email.created_at < timedelta(minutes=1)
+    assert email_utils.ultimo_lote["enviados"] == 2
+    assert 0 <= email_utils.ultimo_lote["latencia_max"] < 60
+
+
+def test_rechazo_se_reintenta_con_backoff(app, smtp):
+    with app.app_context():
+        send_email("uno@test.com", "Hola", "Cuerpo")
+        send_email(RECHAZADO, "Hola", "Cuerpo")
+
+        assert enviar_pendientes() == 2
+        rechazado = _outbox()[RECHAZADO]
+        assert rechazado.estado == "PENDIENTE"
+        assert rechazado.intentos == 1
+        assert "550" in rechazado.ultimo_error
+        assert rechazado.proximo_intento - rechazado.created_at >= timedelta(seconds=email_utils.BACKOFF_BASE)
+
+        # Con el reloj de la base todavía no es hora del reintento
+        assert enviar_pendientes() == 0
+
+    assert [m.rcpt_tos for m in smtp.handler.mensajes] == [["uno@test.com"]]
+
+
+def test_sin_servidor_el_lote_queda_pendiente(app, monkeypatch):
+    monkeypatch.setattr(app.extensions["mail"], "port", _puerto_libre())
+    with app.app_context():
+        send_email("uno@test.com", "Hola", "Cuerpo")
+
+        assert enviar_pendientes() == 1
+        email = _outbox()["uno@test.com"]
+        assert (email.estado, email.intentos) == ("PENDIENTE", 1)
+
+
+def test_estado_de_la_outbox(app, client, datos, headers):
+    with app.app_context():
+        send_email("uno@test.com", "Hola", "Cuerpo")
+
+    respuesta = client.get("/api/emails/estado", headers=headers)
+    assert respuesta.status_code == 200
+    estado = respuesta.get_json()
+    assert estado["pendientes"] == 1
+    assert 0 <= estado["espera_max_segundos"] < 60
@@ -0,0 +1,23 @@
+"""Coordenadas de clientes y su celda (api/utils/geo.py)."""
+from api.models import db, Cliente
+from api.utils.geo import celda
+
+
+def test_celda_acepta_coordenadas_como_texto():
+    assert celda("-34.6", "-58.4") == celda(-34.6, -58.4)
+    assert celda("x", -58.4) is None
+    assert celda(None, -58.4) is None
+
+
+def test_alta_con_coordenadas_no_numericas_es_400(client, datos, headers):
+    respuesta = client.post("/api/clientes", json={"nombre": "Nuevo", "lat": "-34.6", "lng": -58.4}, headers=headers)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()["errores"] == {"lat": "debe ser numérico"}
+
+
+def test_alta_calcula_la_celda(app, client, datos, headers):
+    respuesta = client.post("/api/clientes", json={"nombre": "Nuevo", "lat": -34.6, "lng": -58.4}, headers=headers)
+    assert respuesta.status_code == 201, respuesta.get_data(as_text=True)
+    with app.app_context():
+        cliente = db.session.get(Cliente, respuesta.get_json()["cliente"]["id"])
+        assert cliente.celda == celda(-34.6, -58.4)
@@ -0,0 +1,45 @@
+"""POST /batch (api/utils/lote.py): filas creadas y borradas en el mismo lote."""
+from api.models import db, Cliente, Pendiente
+
+
+def _lote(client, headers, operaciones):
+    return client.post("/api/batch", json={"operaciones": operaciones}, headers=headers)
+
+
+def test_crear_y_borrar_en_el_mismo_lote_no_llega_a_la_base(app, client, datos, headers):
+    respuesta = _lote(client, headers, [
+        {"op": "create", "entidad": "clientes", "tmp_id": "x", "datos": {"nombre": "Efímero"}},
+        {"op": "delete", "entidad": "clientes", "id": "$x"},
+    ])
+    assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.query(Cliente).filter_by(nombre="Efímero").count() == 0
+
+
+def test_borrar_una_fila_temporal_referenciada_rechaza_el_lote(app, client, datos, headers):
+    respuesta = _lote(client, headers, [
+        {"op": "create", "entidad": "clientes", "tmp_id": "x", "datos": {"nombre": "Efímero"}},
+        {"op": "create", "entidad": "pendientes", "datos": {
+            "cliente_id": "$x", "instalacion_id": datos["instalaciones"][0], "fecha": "2025-06-01",
+        }},
+        {"op": "delete", "entidad": "clientes", "id": "$x"},
+    ])
+    assert respuesta.status_code == 400
+    errores = respuesta.get_json()["errores"]
+    assert [e["indice"] for e in errores] == [2]
+    assert "índices 1" in errores[0]["errores"]["id"]
+    with app.app_context():
+        pendientes = db.session.query(Pendiente).filter(Pendiente.empresa_id == datos["empresa"]).count()
+        assert pendientes == len(datos["pendientes"])
+
+
+def test_la_referencia_de_una_fila_ya_borrada_no_cuenta(client, datos, headers):
+    respuesta = _lote(client, headers, [
+        {"op": "create", "entidad": "clientes", "tmp_id": "x", "datos": {"nombre": "Efímero"}},
+        {"op": "create", "entidad": "pendientes", "tmp_id": "p", "datos": {
+            "cliente_id": "$x", "instalacion_id": datos["instalaciones"][0], "fecha": "2025-06-01",
+        }},
+        {"op": "delete", "entidad": "pendientes", "id": "$p"},
+        {"op": "delete", "entidad": "clientes", "id": "$x"},
+    ])
+    assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
@@ -0,0 +1,176 @@
+"""
+Presupuesto de queries de cada ruta (@max_queries) medido sobre el grafo de
+conftest.py: si una ruta pasa a hacer más consultas que las declaradas, el
+test falla con las sentencias ejecutadas. Toda ruta con @max_queries tiene
+que tener un caso acá (test_todas_las_rutas_tienen_caso).
+"""
+from collections import namedtuple
+
+import pytest
+
+from api.utils.query_stats import assert_max_queries
+
+
+# url y cuerpo reciben los ids del fixture `datos`
+Caso = namedtuple("Caso", "endpoint metodo url cuerpo status token", defaults=(None, 200, "token"))
+
+CASOS = [
+    # Salud y autenticación
+    Caso("hello", "GET", lambda d: "/api/hello"),
+    Caso("get_estado_emails", "GET", lambda d: "/api/emails/estado"),
+    Caso("setup", "POST", lambda d: "/api/auth/setup", lambda d: {"email": "x@test.com", "password": "x"}, 403),
+    Caso("login", "POST", lambda d: "/api/auth/login", lambda d: {"email": "admin1@test.com", "password": "clave"}),
+    Caso("refresh", "POST", lambda d: "/api/auth/refresh", token="refresh"),
+    Caso(
+        "change_password", "PUT", lambda d: f"/api/usuarios/{d['admin']}/password",
+        lambda d: {"current_password": "clave", "new_password": "clave2"},
+    ),
+    # Usuarios y empresas
+    Caso("get_usuarios", "GET", lambda d: "/api/usuarios?count=exact&sort=nombre"),
+    Caso(
+        "create_usuario", "POST", lambda d: "/api/usuarios",
+        lambda d: {"nombre": "Nuevo", "email": "nuevo@test.com", "password": "clave"}, 201,
+    ),
+    Caso("update_usuario", "PUT", lambda d: f"/api/usuarios/{d['usuarios'][1]}", lambda d: {"nombre": "Otro", "rol": "SUPERVISOR"}),
+    # El instalador tiene instalaciones y mantenimientos que quedan sin asignar
+    Caso("delete_usuario", "DELETE", lambda d: f"/api/usuarios/{d['usuarios'][1]}"),
+    Caso("get_empresas", "GET", lambda d: "/api/empresas"),
+    Caso("create_empresa", "POST", lambda d: "/api/empresas", lambda d: {"nombre": "Nueva"}, 201),
+    Caso(
+        "update_empresa", "PUT", lambda d: f"/api/empresas/{d['empresa']}",
+        lambda d: {"nombre": "Renombrada", "plan": "PRO", "max_usuarios": 5, "activa": True},
+    ),
+    # Cascade completo: usuarios, clientes, instalaciones, mantenimientos, pendientes, presupuestos
+    Caso("delete_empresa", "DELETE", lambda d: f"/api/empresas/{d['empresa']}"),
+    # Referencia y tableros
+    Caso("get_empresa_actual", "GET", lambda d: "/api/empresa"),
+    Caso("get_instaladores", "GET", lambda d: "/api/usuarios/instaladores"),
+    Caso("get_tipos_sistema", "GET", lambda d: "/api/catalogos/tipos-sistema"),
+    Caso("get_dashboard", "GET", lambda d: "/api/dashboard"),
+    Caso("get_estado_cache", "GET", lambda d: "/api/cache/estado"),
+    Caso("get_estado_pool", "GET", lambda d: "/api/pool/estado"),
+    Caso("buscar", "GET", lambda d: "/api/buscar?q=cliente"),
+    # Clientes
+    Caso(
+        "get_clientes", "GET",
+        lambda d: "/api/clientes?expand=instalaciones.mantenimientos,pendientes,presupuestos.componentes&count=exact",
+    ),
+    Caso("get_clientes_cercanos", "GET", lambda d: "/api/clientes/near?lat=-34.9&lng=-56.16&radius_km=10"),
+    Caso("get_clientes_en_zona", "GET", lambda d: "/api/clientes/bbox?min_lat=-35&min_lng=-57&max_lat=-34&max_lng=-56"),
+    Caso(
+        "create_cliente", "POST", lambda d: "/api/clientes",
+        lambda d: {"nombre": "Nuevo", "lat": -34.91, "lng": -56.17}, 201,
+    ),
+    Caso("update_cliente", "PATCH", lambda d: f"/api/clientes/{d['clientes'][0]}", lambda d: {"telefono": "099"}),
+    # Instalación, dos mantenimientos, pendiente y presupuesto con dos componentes
+    Caso("delete_cliente", "DELETE", lambda d: f"/api/clientes/{d['clientes'][0]}"),
+    # Instalaciones
+    Caso("get_instalaciones", "GET", lambda d: "/api/instalaciones?expand=mantenimientos.tecnico,cliente"),
+    Caso(
+        "create_instalacion", "POST", lambda d: "/api/instalaciones",
+        lambda d: {
+            "cliente_id": d["clientes"][0], "instalador_id": d["usuarios"][1], "tipo_sistema": "ALARMAS",
+            "fecha_instalacion": "2025-02-01", "frecuencia_meses": 12,
+        },
+        201,
+    ),
+    Caso(
+        "update_instalacion", "PATCH", lambda d: f"/api/instalaciones/{d['instalaciones'][0]}",
+        lambda d: {"frecuencia_meses": 3, "cliente_id": d["clientes"][1]},
+    ),
+    Caso("delete_instalacion", "DELETE", lambda d: f"/api/instalaciones/{d['instalaciones'][0]}"),
+    # Mantenimientos (recalculan el próximo de su instalación)
+    Caso("get_mantenimientos", "GET", lambda d: "/api/mantenimientos"),
+    Caso(
+        "create_mantenimiento", "POST", lambda d: "/api/mantenimientos",
+        lambda d: {"instalacion_id": d["instalaciones"][0], "realizado_por": d["usuarios"][1], "fecha": "2025-09-01"},
+        201,
+    ),
+    Caso(
+        "update_mantenimiento", "PATCH", lambda d: f"/api/mantenimientos/{d['mantenimientos'][0]}",
+        lambda d: {"fecha": "2025-09-02", "instalacion_id": d["instalaciones"][1]},
+    ),
+    Caso("delete_mantenimiento", "DELETE", lambda d: f"/api/mantenimientos/{d['mantenimientos'][1]}"),
+    Caso("get_agenda", "GET", lambda d: "/api/agenda?from=2025-01-01&to=2026-12-31"),
+    Caso("planificar_rutas", "POST", lambda d: "/api/rutas/planificar", lambda d: {"fecha": "2025-09-10", "tiempo_max_ms": 50}),
+    # Pendientes
+    Caso("get_pendientes", "GET", lambda d: "/api/pendientes"),
+    Caso(
+        "create_pendiente", "POST", lambda d: "/api/pendientes",
+        lambda d: {"cliente_id": d["clientes"][0], "instalacion_id": d["instalaciones"][0], "fecha": "2025-08-01"},
+        201,
+    ),
+    Caso("update_pendiente", "PATCH", lambda d: f"/api/pendientes/{d['pendientes'][0]}", lambda d: {"notas": "Urgente"}),
+    Caso("delete_pendiente", "DELETE", lambda d: f"/api/pendientes/{d['pendientes'][0]}"),
+    # Presupuestos y componentes
+    Caso("get_presupuestos", "GET", lambda d: "/api/presupuestos?expand=componentes"),
+    Caso("get_presupuesto_detalle", "GET", lambda d: f"/api/presupuestos/{d['presupuestos'][0]}"),
+    Caso(
+        "create_presupuesto", "POST", lambda d: "/api/presupuestos",
+        lambda d: {
+            "cliente_id": d["clientes"][0], "tipo_sistema": "CAMARAS", "descripcion": "Kit cámaras",
+            "creado_por": d["admin"],
+            "componentes": [{"nombre": "DVR", "cantidad": 1, "precio": 150}, {"nombre": "Cámara", "cantidad": 4, "precio": 40}],
+        },
+        201,
+    ),
+    Caso(
+        "update_presupuesto", "PUT", lambda d: f"/api/presupuestos/{d['presupuestos'][0]}",
+        lambda d: {"descripcion": "Kit ampliado", "estado": "aprobado", "total": 300},
+    ),
+    Caso("delete_presupuesto", "DELETE", lambda d: f"/api/presupuestos/{d['presupuestos'][0]}"),
+    Caso(
+        "reemplazar_componentes_presupuesto", "PUT", lambda d: f"/api/presupuestos/{d['presupuestos'][0]}/componentes",
+        lambda d: {"componentes": [
+            {"id": d["componentes"][0], "nombre": "Central", "cantidad": 1, "precio": 220},
+            {"nombre": "Sirena", "cantidad": 1, "precio": 30},
+        ]},
+    ),
+    Caso("get_componentes", "GET", lambda d: f"/api/componentes?presupuesto_id={d['presupuestos'][0]}"),
+    Caso(
+        "create_componente", "POST", lambda d: "/api/componentes",
+        lambda d: {"presupuesto_id": d["presupuestos"][0], "nombre": "Sirena", "cantidad": 1, "precio": 30},
+        201,
+    ),
+    Caso("update_componente", "PATCH", lambda d: f"/api/componentes/{d['componentes'][0]}", lambda d: {"cantidad": 3}),
+    Caso("delete_componente", "DELETE", lambda d: f"/api/componentes/{d['componentes'][0]}"),
+    # Sincronización offline
+    Caso(
+        "batch", "POST", lambda d: "/api/batch",
+        lambda d: {"operaciones": [
+            {"op": "create", "entidad": "clientes", "tmp_id": "c1", "datos": {"nombre": "Offline"}},
+            {"op": "create", "entidad": "instalaciones", "tmp_id": "i1", "datos": {
+                "cliente_id": "$c1", "instalador_id": d["usuarios"][1], "tipo_sistema": "CAMARAS",
+                "fecha_instalacion": "2025-05-01",
+            }},
+            {"op": "create", "entidad": "pendientes", "datos": {"cliente_id": "$c1", "instalacion_id": "$i1", "fecha": "2025-06-01"}},
+            {"op": "update", "entidad": "clientes", "id": d["clientes"][1], "datos": {"telefono": "098"}},
+            {"op": "delete", "entidad": "pendientes", "id": d["pendientes"][1]},
+        ]},
+    ),
+    Caso("listar_cambios", "GET", lambda d: "/api/cambios"),
+]
+
+
+def _ejecutar(client, datos, caso):
+    cuerpo = caso.cuerpo(datos) if caso.cuerpo else None
+    headers = {"Authorization": f"Bearer {datos[caso.token]}"}
+    return client.open(caso.url(datos), method=caso.metodo, json=cuerpo, headers=headers)
+
+
+@pytest.mark.parametrize("caso", CASOS, ids=[c.endpoint for c in CASOS])
+def test_presupuesto_de_queries(app, client, datos, caso):
+    maximo = app.view_functions[f"api.{caso.endpoint}"].max_queries
+    with assert_max_queries(maximo) as contador:
+        respuesta = _ejecutar(client, datos, caso)
+    assert respuesta.status_code == caso.status, respuesta.get_data(as_text=True)
+    assert contador.cantidad > 0
+
+
+def test_todas_las_rutas_tienen_caso(app):
+    con_presupuesto = {
+        nombre.split(".", 1)[1]
+        for nombre, vista in app.view_functions.items()
+        if hasattr(vista, "max_queries")
+    }
+    assert con_presupuesto - {c.endpoint for c in CASOS} == set()
@@ -113,8 +113,7 @@ export default function AddPresupuestoForm() {
     }
 
     try {
-      /* 1️⃣ Presupuesto */
-      const presupuesto = await postData(
+      await postData(
         "/presupuestos",
         {
           empresa_id: usuario.empresa_id,
@@ -132,28 +131,18 @@ export default function AddPresupuestoForm() {
 
           tipo_sistema: tipoSistema,
           descripcion,
-          total,
           estado: "pendiente",
           creado_por: usuario.id,
+          // Las líneas van en el mismo request; el total lo calcula el servidor
+          componentes: componentes.map((c) => ({
+            nombre: c.nombre,
+            cantidad: c.cantidad,
+            precio: c.precio,
+          })),
         },
         token
       );
 
-      /* 2️⃣ Componentes */
-      for (const c of componentes) {
-        await postData(
-          "/componentes",
-          {
-            presupuesto_id: presupuesto.id,
-            nombre: c.nombre,
-            cantidad: c.cantidad,
-            precio_unitario: c.precio,
-            subtotal: c.cantidad * c.precio,
-          },
-          token
-        );
-      }
-
       navigate("/presupuestos");
     } catch (error) {
       console.error(error);
@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { Plus, Trash2, Save } from "lucide-react";
-import { getData, postData, putData, deleteData } from "../utils/api";
+import { fetchData, putData } from "../utils/api";
 import { useAppContext } from "../context/AppContext";
 
 export default function EditPresupuestoForm({ presupuestoId }) {
@@ -10,18 +10,18 @@ export default function EditPresupuestoForm({ presupuestoId }) {
   const [componentes, setComponentes] = useState([]);
 
   useEffect(() => {
-    const fetchData = async () => {
-      const p = await getData(`/presupuestos/${presupuestoId}`, token);
-      const c = await getData(`/componentes?presupuesto_id=${presupuestoId}`, token);
-
-      setPresupuesto(p);
-      setComponentes(c);
+    const cargar = async () => {
+      // El detalle ya trae los componentes expandidos
+      const res = await fetchData(`/presupuestos/${presupuestoId}`, token);
+      if (!res) return;
+      setPresupuesto(res.presupuesto);
+      setComponentes(res.presupuesto.componentes || []);
     };
-    fetchData();
-  }, []);
+    cargar();
+  }, [presupuestoId, token]);
 
   const total = componentes.reduce(
-    (acc, c) => acc + c.cantidad * c.precio_unitario,
+    (acc, c) => acc + c.cantidad * c.precio,
     0
   );
 
@@ -34,41 +34,30 @@ export default function EditPresupuestoForm({ presupuestoId }) {
   const agregar = () => {
     setComponentes([
       ...componentes,
-      { nombre: "", cantidad: 1, precio_unitario: 0, nuevo: true },
+      { nombre: "", cantidad: 1, precio: 0 },
     ]);
   };
 
-  const eliminar = async (i) => {
-    const c = componentes[i];
-    if (c.id) await deleteData(`/componentes/${c.id}`, token);
+  const eliminar = (i) => {
     setComponentes(componentes.filter((_, index) => index !== i));
   };
 
   const guardar = async () => {
-    await putData(
-      `/presupuestos/${presupuestoId}`,
-      { total },
+    // Un solo request: el servidor inserta, actualiza y borra líneas y recalcula el total
+    const res = await putData(
+      `/presupuestos/${presupuestoId}/componentes`,
+      {
+        componentes: componentes.map(({ id, nombre, cantidad, precio }) => ({
+          id,
+          nombre,
+          cantidad,
+          precio,
+        })),
+      },
       token
     );
-
-    for (const c of componentes) {
-      if (c.nuevo) {
-        await postData("/componentes", {
-          presupuesto_id: presupuestoId,
-          nombre: c.nombre,
-          cantidad: c.cantidad,
-          precio_unitario: c.precio_unitario,
-          subtotal: c.cantidad * c.precio_unitario,
-        }, token);
-      } else {
-        await putData(`/componentes/${c.id}`, {
-          nombre: c.nombre,
-          cantidad: c.cantidad,
-          precio_unitario: c.precio_unitario,
-          subtotal: c.cantidad * c.precio_unitario,
-        }, token);
-      }
-    }
+    setComponentes(res.componentes);
+    setPresupuesto({ ...presupuesto, total: res.presupuesto.total });
 
     alert("Presupuesto actualizado");
   };
@@ -98,9 +87,9 @@ export default function EditPresupuestoForm({ presupuestoId }) {
           <input
             type="number"
             className="col-span-3 border p-2 rounded"
-            value={c.precio_unitario}
+            value={c.precio}
             min={0}
-            onChange={(e) => handleChange(i, "precio_unitario", e.target.value)}
+            onChange={(e) => handleChange(i, "precio", e.target.value)}
           />
           <button onClick={() => eliminar(i)} className="text-red-500">
             <Trash2 />
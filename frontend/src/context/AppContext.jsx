@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from "react";
-import { fetchData } from "../utils/api";
+import { fetchTodos, EVENTO_TOKEN_RENOVADO } from "../utils/api";
 
 const AppContext = createContext();
 
@@ -11,37 +11,43 @@ export const AppProvider = ({ children }) => {
   const [pendientes, setPendientes] = useState([]);
   const [presupuestos, setPresupuestos] = useState([]);
 
-  
+  // api.js renovó el access token (401 + refresh token)
   useEffect(() => {
+    const alRenovar = (e) => setToken(e.detail);
+    window.addEventListener(EVENTO_TOKEN_RENOVADO, alRenovar);
+    return () => window.removeEventListener(EVENTO_TOKEN_RENOVADO, alRenovar);
+  }, []);
+
+  useEffect(() => {
+    if (!token) return;
     const loadClientes = async () => {
       try {
-        const res = await fetchData("/clientes");
-        setClientes(res.clientes);
+        const clientes = await fetchTodos("/clientes?expand=instalaciones.mantenimientos", "clientes", token);
+        if (clientes) setClientes(clientes);
       } catch (err) {
         console.error("Error cargando usuario:", err);
       }
     };
     const loadInstalaciones = async () => {
       try {
-        const res = await fetchData("/instalaciones");
-        setInstalaciones(res.instalaciones);
+        const instalaciones = await fetchTodos("/instalaciones", "instalaciones", token);
+        if (instalaciones) setInstalaciones(instalaciones);
       } catch (err) {
         console.error("Error cargando usuario:", err);
       }
     };
     const loadPendientes = async () => {
       try {
-        const res = await fetchData("/pendientes");
-        setPendientes(res.pendientes);
+        const pendientes = await fetchTodos("/pendientes", "pendientes", token);
+        if (pendientes) setPendientes(pendientes);
       } catch (err) {
         console.error("Error cargando usuario:", err);
       }
     };
     const loadPresupuestos = async () => {
       try {
-        const res = await fetchData("/presupuestos");
-        setPresupuestos(res.presupuestos);
-        console.log(res.presupuestos);
+        const presupuestos = await fetchTodos("/presupuestos", "presupuestos", token);
+        if (presupuestos) setPresupuestos(presupuestos);
       } catch (err) {
         console.error("Error cargando usuario:", err);
       }
@@ -50,13 +56,13 @@ export const AppProvider = ({ children }) => {
     loadInstalaciones();
     loadPendientes();
     loadPresupuestos();
-  }, []);
+  }, [token]);
 
 
   const reLoadClientes = async () => {
     try {
-      const res = await fetchData("/clientes");
-      setClientes(res.clientes);
+      const clientes = await fetchTodos("/clientes?expand=instalaciones.mantenimientos", "clientes", token);
+      if (clientes) setClientes(clientes);
     } catch (err) {
       console.error("Error cargando usuario:", err);
     }
@@ -64,8 +70,8 @@ export const AppProvider = ({ children }) => {
 
   const reLoadInstalaciones = async () => {
     try {
-      const res = await fetchData("/instalaciones");
-      setInstalaciones(res.instalaciones);
+      const instalaciones = await fetchTodos("/instalaciones", "instalaciones", token);
+      if (instalaciones) setInstalaciones(instalaciones);
     } catch (err) {
       console.error("Error cargando usuario:", err);
     }
@@ -73,8 +79,8 @@ export const AppProvider = ({ children }) => {
 
   const reLoadPendientes = async () => {
     try {
-      const res = await fetchData("/pendientes");
-      setPendientes(res.pendientes);
+      const pendientes = await fetchTodos("/pendientes", "pendientes", token);
+      if (pendientes) setPendientes(pendientes);
     } catch (err) {
       console.error("Error cargando usuario:", err);
     }
@@ -82,8 +88,8 @@ export const AppProvider = ({ children }) => {
 
   const reLoadPresupuestos = async () => {
     try {
-      const res = await fetchData("/presupuestos");
-      setPresupuestos(res.presupuestos);
+      const presupuestos = await fetchTodos("/presupuestos", "presupuestos", token);
+      if (presupuestos) setPresupuestos(presupuestos);
     } catch (err) {
       console.error("Error cargando usuario:", err);
     }
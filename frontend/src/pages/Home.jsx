@@ -1,4 +1,4 @@
-import React from "react";
+import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import {
   Wrench,
@@ -8,6 +8,7 @@ import {
   List,
 } from "lucide-react";
 import { useAppContext } from "../context/AppContext";
+import { fetchData } from "../utils/api";
 import MapView from "../components/MapView";
 import Logo from "../assets/logo.png";
 import Logo2 from "../assets/logo-2.png";
@@ -15,7 +16,17 @@ import BottomNavbar from "../components/BottomNavbar";
 
 const Home = () => {
   const navigate = useNavigate();
-  const { clientes, instalaciones, pendientes } = useAppContext();
+  const { clientes, instalaciones, pendientes, token } = useAppContext();
+
+  /* ======================
+     RESUMEN (contado en el servidor)
+  ====================== */
+  const [resumen, setResumen] = useState(null);
+
+  useEffect(() => {
+    if (!token) return;
+    fetchData("/dashboard", token).then(setResumen);
+  }, [token]);
 
   /* ======================
      FECHAS
@@ -53,8 +64,9 @@ const Home = () => {
     return entraEnRango(inst.proximo_mantenimiento);
   });
 
-  const totalPendientes =
-    serviciosEnRango.length + mantenimientosEnRango.length;
+  const totalPendientes = resumen
+    ? resumen.servicios_pendientes
+    : serviciosEnRango.length + mantenimientosEnRango.length;
 
   return (
     <div
@@ -135,7 +147,7 @@ const Home = () => {
           <SummaryCard
             icon={Building2}
             label="Clientes"
-            value={clientes.length}
+            value={resumen ? resumen.clientes : clientes.length}
             color="text-indigo-600"
           />
         </button>
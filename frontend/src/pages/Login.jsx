@@ -44,6 +44,9 @@ const LoginSetup = () => {
       setUsuario(data.usuario || null);
 
       localStorage.setItem("token", data.access_token || data.token);
+      if (data.refresh_token) {
+        localStorage.setItem("refresh_token", data.refresh_token);
+      }
       if (data.usuario) {
         localStorage.setItem("usuario", JSON.stringify(data.usuario));
       }
@@ -9,7 +9,7 @@ import {
   XCircle,
 } from "lucide-react";
 import { useAppContext } from "../context/AppContext";
-import { fetchData, postData, putData, deleteData } from "../utils/api";
+import { fetchData, putData } from "../utils/api";
 
 export default function PresupuestoDetalle() {
   const { id } = useParams();
@@ -25,14 +25,12 @@ export default function PresupuestoDetalle() {
   useEffect(() => {
     const cargar = async () => {
       try {
-        const p = await fetchData(`/presupuestos/${id}`, token);
-        const c = await fetchData(
-          `/componentes?presupuesto_id=${id}`,
-          token
-        );
+        // El detalle ya trae los componentes expandidos
+        const res = await fetchData(`/presupuestos/${id}`, token);
+        if (!res) throw new Error("Presupuesto no encontrado");
 
-        setPresupuesto(p);
-        setComponentes(Array.isArray(c) ? c : []); // ✅ blindaje
+        setPresupuesto(res.presupuesto);
+        setComponentes(res.presupuesto.componentes || []);
       } catch (err) {
         console.error(err);
         alert("Error al cargar el presupuesto");
@@ -52,7 +50,7 @@ export default function PresupuestoDetalle() {
     (acc, c) =>
       acc +
       (Number(c.cantidad) || 0) *
-      (Number(c.precio_unitario) || 0),
+      (Number(c.precio) || 0),
     0
   );
 
@@ -62,7 +60,7 @@ export default function PresupuestoDetalle() {
       copia[index] = {
         ...copia[index],
         [field]:
-          field === "cantidad" || field === "precio_unitario"
+          field === "cantidad" || field === "precio"
             ? Number(value)
             : value,
       };
@@ -73,24 +71,15 @@ export default function PresupuestoDetalle() {
   const agregarComponente = () => {
     setComponentes((prev) => [
       ...prev,
-      { nombre: "", cantidad: 1, precio_unitario: 0 },
+      { nombre: "", cantidad: 1, precio: 0 },
     ]);
   };
 
-  const eliminarComponente = async (index) => {
-    const c = componentes[index];
-
-    try {
-      if (c?.id) {
-        await deleteData(`/componentes/${c.id}`, token);
-      }
-
-      setComponentes((prev) =>
-        prev.filter((_, i) => i !== index)
-      );
-    } catch (err) {
-      alert("Error al eliminar componente");
-    }
+  // Se borra al guardar: las líneas que no se mandan en el PUT se eliminan
+  const eliminarComponente = (index) => {
+    setComponentes((prev) =>
+      prev.filter((_, i) => i !== index)
+    );
   };
 
   /* ======================
@@ -103,26 +92,23 @@ export default function PresupuestoDetalle() {
         {
           tipo_sistema: presupuesto.tipo_sistema,
           descripcion: presupuesto.descripcion,
-          total,
         },
         token
       );
 
-      for (const c of componentes) {
-        const payload = {
-          presupuesto_id: id,
-          nombre: c.nombre,
-          cantidad: c.cantidad,
-          precio_unitario: c.precio_unitario,
-          subtotal: c.cantidad * c.precio_unitario,
-        };
-
-        if (c.id) {
-          await putData(`/componentes/${c.id}`, payload, token);
-        } else {
-          await postData("/componentes", payload, token);
-        }
-      }
+      // Un solo request: el servidor inserta, actualiza y borra líneas y recalcula el total
+      await putData(
+        `/presupuestos/${id}/componentes`,
+        {
+          componentes: componentes.map(({ id, nombre, cantidad, precio }) => ({
+            id,
+            nombre,
+            cantidad,
+            precio,
+          })),
+        },
+        token
+      );
 
       alert("Presupuesto actualizado");
       navigate("/presupuestos");
@@ -232,11 +218,11 @@ export default function PresupuestoDetalle() {
               <input
                 type="number"
                 className="col-span-3 border p-2 rounded"
-                value={c.precio_unitario}
+                value={c.precio}
                 onChange={(e) =>
                   handleComponenteChange(
                     i,
-                    "precio_unitario",
+                    "precio",
                     e.target.value
                   )
                 }
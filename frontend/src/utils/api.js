@@ -4,10 +4,47 @@ const buildUrl = (endpoint) => {
   return `${BASE_URL.replace(/\/+$/, "")}/${endpoint.replace(/^\/+/, "")}`;
 };
 
-export const fetchData = async (endpoint) => {
+// Access token vencido (401): se renueva una sola vez con el refresh token
+// guardado (aunque fallen varios requests a la vez) y se reintenta el request.
+// El nuevo token queda en localStorage y se avisa al contexto con un evento
+export const EVENTO_TOKEN_RENOVADO = "token-renovado";
+let renovacion = null;
+
+const renovarToken = () => {
+  const refresh = localStorage.getItem("refresh_token");
+  if (!refresh) return Promise.resolve(null);
+  if (!renovacion) {
+    renovacion = refreshToken(refresh)
+      .then((nuevo) => {
+        localStorage.setItem("token", nuevo);
+        window.dispatchEvent(new CustomEvent(EVENTO_TOKEN_RENOVADO, { detail: nuevo }));
+        return nuevo;
+      })
+      .catch(() => null)
+      .finally(() => {
+        renovacion = null;
+      });
+  }
+  return renovacion;
+};
+
+const conToken = (headers, token) => ({
+  ...headers,
+  ...(token && { Authorization: `Bearer ${token}` }),
+});
+
+const fetchConRenovacion = async (url, opciones, token) => {
+  const res = await fetch(url, { ...opciones, headers: conToken(opciones.headers, token) });
+  if (res.status !== 401 || !token) return res;
+  const nuevo = await renovarToken();
+  if (!nuevo) return res;
+  return fetch(url, { ...opciones, headers: conToken(opciones.headers, nuevo) });
+};
+
+export const fetchData = async (endpoint, token) => {
   const url = buildUrl(endpoint);
   try {
-    const res = await fetch(url);
+    const res = await fetchConRenovacion(url, {}, token);
 
     if (!res.ok) {
       const text = await res.text();
@@ -20,21 +57,38 @@ export const fetchData = async (endpoint) => {
   }
 };
 
+// Listados paginados ({<clave>: [...], next_cursor}): sigue el cursor hasta
+// traer todas las filas, en páginas del máximo que acepta la API
+const LIMITE_PAGINA = 500;
+
+export const fetchTodos = async (endpoint, clave, token) => {
+  const separador = endpoint.includes("?") ? "&" : "?";
+  let items = [];
+  let cursor = null;
+  do {
+    const after = cursor == null ? "" : `&after=${cursor}`;
+    const res = await fetchData(`${endpoint}${separador}limit=${LIMITE_PAGINA}${after}`, token);
+    if (!res) return null;
+    items = items.concat(res[clave] || []);
+    cursor = res.next_cursor;
+  } while (cursor != null);
+  return items;
+};
+
 export const postData = async (endpoint, payload, token, extraHeaders = {}) => {
   const url = buildUrl(endpoint);
   const headers = {
     "Content-Type": "application/json",
-    ...(token && { Authorization: `Bearer ${token}` }),
     ...extraHeaders,
   };
   try {
-    const res = await fetch(url, {
+    const res = await fetchConRenovacion(url, {
       method: "POST",
       headers,
       body: JSON.stringify(payload),
       mode: "cors",
       credentials: "include",
-    });
+    }, token);
     const data = await res.json();
     if (!res.ok) {
       throw new Error(data.error || `POST ${url} → ${res.status}`);
@@ -49,17 +103,16 @@ export const putData = async (endpoint, payload, token, extraHeaders = {}) => {
   const url = buildUrl(endpoint);
   const headers = {
     "Content-Type": "application/json",
-    ...(token && { Authorization: `Bearer ${token}` }),
     ...extraHeaders,
   };
   try {
-    const res = await fetch(url, {
+    const res = await fetchConRenovacion(url, {
       method: "PUT",
       headers,
       body: JSON.stringify(payload),
       mode: "cors",
       credentials: "include",
-    });
+    }, token);
     const data = await res.json();
     if (!res.ok) {
       throw new Error(data.error || `PUT ${url} → ${res.status}`);
@@ -72,16 +125,12 @@ export const putData = async (endpoint, payload, token, extraHeaders = {}) => {
 
 export const deleteData = async (endpoint, token) => {
   const url = buildUrl(endpoint);
-  const headers = {
-    ...(token && { Authorization: `Bearer ${token}` }),
-  };
   try {
-    const res = await fetch(url, {
+    const res = await fetchConRenovacion(url, {
       method: "DELETE",
-      headers,
       mode: "cors",
       credentials: "include",
-    });
+    }, token);
     if (!res.ok) {
       const text = await res.text();
       throw new Error(`DELETE ${url} → ${res.status} | Respuesta: ${text}`);
@@ -115,3 +164,19 @@ export const loginUser = async (email, password) => {
     throw err;
   }
 };
+
+// Renueva el access token sin volver a pedir la contraseña
+export const refreshToken = async (refresh) => {
+  const url = buildUrl("auth/refresh");
+  const res = await fetch(url, {
+    method: "POST",
+    headers: { Authorization: `Bearer ${refresh}` },
+    mode: "cors",
+    credentials: "include",
+  });
+  const data = await res.json();
+  if (!res.ok) {
+    throw new Error(data.error || `POST ${url} → ${res.status}`);
+  }
+  return data.token;
+};